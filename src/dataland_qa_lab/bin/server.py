@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from contextlib import asynccontextmanager
 from datetime import datetime
@@ -11,10 +10,10 @@ from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.utils import BadDsn
 
 from dataland_qa_lab.bin import models
-from dataland_qa_lab.data_point_flow import dataland, review
+from dataland_qa_lab.data_point_flow import admission, dataland, planner, rasterizer, review
 from dataland_qa_lab.data_point_flow import models as datapoint_flow_models
 from dataland_qa_lab.data_point_flow import scheduler as data_point_scheduler
-from dataland_qa_lab.database.database_engine import create_tables, verify_database_connection
+from dataland_qa_lab.database.database_engine import create_tables, dispose_async_engine, verify_database_connection
 from dataland_qa_lab.dataland import scheduled_job, scheduled_processor
 from dataland_qa_lab.review import dataset_reviewer, exceptions
 from dataland_qa_lab.utils import config, console_logger
@@ -53,7 +52,7 @@ def init_sentry() -> None:
 
 
 @asynccontextmanager
-async def lifespan(_: FastAPI):  # noqa: ANN201, RUF029
+async def lifespan(_: FastAPI):  # noqa: ANN201
     """Ensures that the scheduler shuts down correctly."""
     logger.info("Server startup initiated. Configuring scheduler.")
     init_sentry()
@@ -66,10 +65,12 @@ async def lifespan(_: FastAPI):  # noqa: ANN201, RUF029
         logger.info("Local environment detected. Not starting any scheduler.")
     elif conf.is_dev_environment:
         logger.info("Development environment detected. Using new scheduler.")
+        # The workers drain the work queue continuously, the scheduled job only adds newly pending datasets to it.
+        scheduler.add_job(data_point_scheduler.run_queue_workers, next_run_time=datetime.now())  # noqa: DTZ005
         scheduler.add_job(
             scheduled_job.run_scheduled_processing_job,
             trigger,
-            args=(data_point_scheduler.run_scheduled_processing,),
+            args=(data_point_scheduler.enqueue_pending_datasets,),
             next_run_time=datetime.now(),  # noqa: DTZ005
         )
     else:
@@ -89,7 +90,10 @@ async def lifespan(_: FastAPI):  # noqa: ANN201, RUF029
 
     if scheduler.running:
         logger.info("Shutting down scheduler.")
+        data_point_scheduler.stop_queue_workers()
         scheduler.shutdown()
+    rasterizer.shutdown_process_pool()
+    await dispose_async_engine()
 
 
 dataland_qa_lab = FastAPI(lifespan=lifespan)
@@ -101,6 +105,12 @@ def health_check() -> dict:
     return {"status": "ok", "timestamp": get_german_time_as_string()}
 
 
+@dataland_qa_lab.get("/data-point-flow/admission")
+def admission_stats() -> list[datapoint_flow_models.AdmissionStats]:
+    """Report the in-flight and queued AI requests per model."""
+    return admission.controller.stats()
+
+
 @dataland_qa_lab.post("/review/{data_id}", response_model=models.ReviewResponse)
 def review_dataset_post_endpoint(data_id: str, data: models.ReviewRequest) -> models.ReviewResponse:
     """Review a single dataset via API call (configurable)."""
@@ -160,13 +170,10 @@ async def review_data_point_dataset_id(
             detail=f"Error fetching data points from Dataland: {e}",
         ) from e
 
-    keys = list(data_points.keys())
-    tasks = [
-        review.validate_datapoint(
-            data_points[k], use_ocr=data.use_ocr, ai_model=data.ai_model, override=data.override, dataset_id=data_id
+    try:
+        return await planner.validate_dataset(
+            data_id, data_points, use_ocr=data.use_ocr, ai_model=data.ai_model, override=data.override
         )
-        for k in keys
-    ]
-
-    results_list = await asyncio.gather(*tasks)
-    return dict(zip(keys, results_list, strict=True))
+    except planner.DependencyCycleError as e:
+        logger.exception("Cannot plan the review of dataset %s", data_id)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)) from e
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from dataland_qa_lab.data_point_flow import models
+from dataland_qa_lab.utils import config
+
+logger = logging.getLogger(__name__)
+conf = config.get_config()
+
+
+@dataclass
+class _Waiter:
+    """A request waiting for admission, woken up on the event loop it is waiting on."""
+
+    tokens: int
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future[None]
+    granted: bool = False
+
+
+@dataclass
+class _Budget:
+    """The in-flight requests and tokens of one model and the requests waiting for them."""
+
+    requests: int = 0
+    tokens: int = 0
+    waiters: deque[_Waiter] = field(default_factory=deque)
+
+
+class AdmissionController:
+    """Process-wide budget of in-flight AI requests and tokens per model.
+
+    Requests over budget wait in first-in-first-out order instead of being sent and failing with rate limit errors.
+    The controller is shared by all event loops of the process, so the server and the scheduler draw from the same
+    budget.
+
+    Attributes:
+        max_requests (int): The maximum number of in-flight requests per model.
+        max_tokens (int): The maximum number of estimated tokens of in-flight requests per model.
+    """
+
+    max_requests: int
+    max_tokens: int
+
+    def __init__(self, max_requests: int, max_tokens: int) -> None:
+        """Create a new admission controller.
+
+        Args:
+            max_requests: The maximum number of in-flight requests per model.
+            max_tokens: The maximum number of estimated tokens of in-flight requests per model. A single request
+                larger than this is admitted once no other request of its model is in flight.
+        """
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self._budgets: dict[str, _Budget] = {}
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def admit(self, model: str, tokens: int) -> AsyncIterator[None]:
+        """Wait until the request fits into the budget of the model and hold its share while the block runs."""
+        tokens = min(tokens, self.max_tokens)
+        with self._lock:
+            budget = self._budgets.setdefault(model, _Budget())
+            waiter = None
+            if not budget.waiters and self._fits(budget, tokens):
+                budget.requests += 1
+                budget.tokens += tokens
+            else:
+                loop = asyncio.get_running_loop()
+                waiter = _Waiter(tokens=tokens, loop=loop, future=loop.create_future())
+                budget.waiters.append(waiter)
+                logger.debug("Queued request for %s, %d requests waiting.", model, len(budget.waiters))
+
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if not waiter.granted:
+                        budget.waiters.remove(waiter)
+                        self._wake_waiters(budget)
+                        raise
+                self._release(model, tokens)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(model, tokens)
+
+    def stats(self) -> list[models.AdmissionStats]:
+        """Return the current load of every model that has been used so far."""
+        with self._lock:
+            return [
+                models.AdmissionStats(
+                    model=model,
+                    in_flight_requests=budget.requests,
+                    in_flight_tokens=budget.tokens,
+                    queued_requests=len(budget.waiters),
+                    queued_tokens=sum(waiter.tokens for waiter in budget.waiters),
+                    max_requests=self.max_requests,
+                    max_tokens=self.max_tokens,
+                )
+                for model, budget in self._budgets.items()
+            ]
+
+    def _fits(self, budget: _Budget, tokens: int) -> bool:
+        """Check if a request with the given tokens fits into the remaining budget."""
+        return budget.requests < self.max_requests and budget.tokens + tokens <= self.max_tokens
+
+    def _release(self, model: str, tokens: int) -> None:
+        """Return the share of a finished request to the budget and admit the waiting requests that now fit."""
+        with self._lock:
+            budget = self._budgets[model]
+            budget.requests -= 1
+            budget.tokens -= tokens
+            self._wake_waiters(budget)
+
+    def _wake_waiters(self, budget: _Budget) -> None:
+        """Admit waiting requests in order for as long as they fit. Must be called with the lock held."""
+        while budget.waiters and self._fits(budget, budget.waiters[0].tokens):
+            waiter = budget.waiters.popleft()
+            try:
+                waiter.loop.call_soon_threadsafe(_set_granted, waiter.future)
+            except RuntimeError:
+                # The loop of the waiter is closed, so nobody is left to use the admission.
+                continue
+            waiter.granted = True
+            budget.requests += 1
+            budget.tokens += waiter.tokens
+
+
+def _set_granted(future: asyncio.Future[None]) -> None:
+    """Wake up an admitted waiter unless it stopped waiting in the meantime."""
+    if not future.done():
+        future.set_result(None)
+
+
+controller = AdmissionController(max_requests=conf.ai_max_concurrent_requests, max_tokens=conf.ai_max_in_flight_tokens)
@@ -1,11 +1,14 @@
 import asyncio
+import hashlib
 import json
 import logging
 
 from openai import AsyncAzureOpenAI
+from openai.types.chat import ChatCompletion
 
-from dataland_qa_lab.data_point_flow import models
+from dataland_qa_lab.data_point_flow import admission, models, rate_limiter
 from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 conf = config.get_config()
@@ -14,19 +17,63 @@ client = AsyncAzureOpenAI(
     api_key=conf.azure_openai_api_key,
     api_version="2024-07-01-preview",
     azure_endpoint=conf.azure_openai_endpoint,
+    # Retries are handled by execute_prompt, which shares the rate limit state across all requests.
+    max_retries=0,
 )
 
+# Rough estimates used to budget requests before sending them: about four characters per text token, and the cost
+# of a high detail page image of 768x1086 pixels, which is six 512px tiles of 170 tokens plus 85 base tokens.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 6 * 170 + 85
 
-async def execute_prompt(
+_prompts: SingleFlight[models.AIResponse] = SingleFlight()
+
+
+def estimate_tokens(texts: list[str], image_count: int) -> int:
+    """Estimate the number of prompt tokens of a request with the given texts and images."""
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN + image_count * TOKENS_PER_IMAGE
+
+
+async def execute_prompt(  # noqa: PLR0913
     prompt: str,
     previous_answer: str,
     ai_model: str | None = None,
     retries: int = 3,
     images: list[str] | None = None,
+    *,
+    image_format: str = "jpeg",
 ) -> models.AIResponse:
-    """Executes a prompt with strict JSON enforcement and automatic retries."""
+    """Executes a prompt with strict JSON enforcement and automatic retries.
+
+    Concurrent calls with the same prompt, answer, model and images share one request.
+    """
     ai_model = ai_model or conf.ai_model
+    digest = hashlib.sha256()
+    for part in (prompt, previous_answer, image_format, *(images or [])):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return await _prompts.run(
+        (ai_model, digest.hexdigest()),
+        _execute_prompt,
+        prompt,
+        previous_answer,
+        ai_model,
+        retries,
+        images,
+        image_format=image_format,
+    )
+
 
+async def _execute_prompt(  # noqa: PLR0913
+    prompt: str,
+    previous_answer: str,
+    ai_model: str,
+    retries: int,
+    images: list[str] | None,
+    *,
+    image_format: str,
+) -> models.AIResponse:
+    """Send the prompt to the AI model, retrying failed requests within the rate limits."""
     system_message = (
         "You are an AI assistant performing answer validation.\n"
         'EXPECTED JSON FORMAT: {"predicted_answer": <val>, "confidence": <float>, "reasoning": <str>, "qa_status": <str>}\n\n'  # noqa: E501
@@ -50,43 +97,54 @@ async def execute_prompt(
     if images:
         content.extend(
             [
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}", "detail": "high"}}
+                {"type": "image_url", "image_url": {"url": f"data:image/{image_format};base64,{img}", "detail": "high"}}
                 for img in images
             ]
         )
 
-    try:
-        response = await client.chat.completions.create(
-            model=ai_model,
-            messages=[{"role": "system", "content": system_message}, {"role": "user", "content": content}],
-            response_format={"type": "json_object"},
-            temperature=1 if "gpt-5" in ai_model else 0,
-            timeout=200 if images else None,
-        )
-
-        raw_content = response.choices[0].message.content
-        if not raw_content:
-            msg = "Empty response from AI"
-            raise ValueError(msg)  # noqa: TRY301
+    tokens = estimate_tokens([system_message, user_text], len(images or []))
+
+    last_error: Exception | None = None
+    for attempt in range(retries + 1):
+        await rate_limiter.limiter.acquire(ai_model, tokens)
+        try:
+            async with admission.controller.admit(ai_model, tokens):
+                response = await client.chat.completions.create(
+                    model=ai_model,
+                    messages=[{"role": "system", "content": system_message}, {"role": "user", "content": content}],
+                    response_format={"type": "json_object"},
+                    temperature=1 if "gpt-5" in ai_model else 0,
+                    timeout=200 if images else None,
+                )
+            return parse_response(response)
+        except Exception as e:  # noqa: BLE001
+            last_error = e
+            retry_after = rate_limiter.get_retry_after(e)
+            if retry_after is not None:
+                rate_limiter.limiter.pause(ai_model, retry_after)
+            if attempt < retries:
+                delay = retry_after if retry_after is not None else rate_limiter.backoff_delay(attempt)
+                logger.warning("Retry %d/%d in %.2fs after error: %s", attempt + 1, retries, delay, e)
+                await asyncio.sleep(delay)
+
+    return models.AIResponse(
+        predicted_answer=None,
+        confidence=0.0,
+        reasoning=f"Failed after retries. Last error: {last_error}",
+        qa_status="QaInconclusive",
+    )
 
-        data = json.loads(raw_content)
 
-        valid_keys = {"predicted_answer", "confidence", "reasoning", "qa_status"}
-        filtered_data = {k: v for k, v in data.items() if k in valid_keys}
+def parse_response(response: ChatCompletion) -> models.AIResponse:
+    """Parse the JSON answer of the AI model into an AIResponse."""
+    raw_content = response.choices[0].message.content
+    if not raw_content:
+        msg = "Empty response from AI"
+        raise ValueError(msg)
 
-        return models.AIResponse(**filtered_data)
+    data = json.loads(raw_content)
 
-    except Exception as e:  # noqa: BLE001
-        logger.warning("Retry %d/3 after error: %s", retries, e)
-        if retries > 0:
-            await asyncio.sleep(1.5 * (4 - retries))
-            return await execute_prompt(
-                prompt=prompt, previous_answer=previous_answer, ai_model=ai_model, retries=retries - 1, images=images
-            )
+    valid_keys = {"predicted_answer", "confidence", "reasoning", "qa_status"}
+    filtered_data = {k: v for k, v in data.items() if k in valid_keys}
 
-        return models.AIResponse(
-            predicted_answer=None,
-            confidence=0.0,
-            reasoning=f"Failed after retries. Last error: {e}",
-            qa_status="QaInconclusive",
-        )
+    return models.AIResponse(**filtered_data)
@@ -2,18 +2,24 @@ import asyncio
 import io
 import json
 import logging
+from typing import Any
 
 import async_lru
 
-from dataland_qa_lab.data_point_flow import models, prompts
+from dataland_qa_lab.data_point_flow import models
 from dataland_qa_lab.data_point_flow.pdf_handler import extract_single_page
+from dataland_qa_lab.dataland import document_provider
 from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils.single_flight import SingleFlight
+from dataland_qa_lab.utils.sized_lru_cache import SizedLRUCache
 
 config = config.get_config()
 
 
 logger = logging.getLogger(__name__)
-validation_prompts = prompts.get_prompts()
+
+document_cache: SizedLRUCache[str, bytes | memoryview] = SizedLRUCache(max_size=config.document_cache_max_bytes)
+_document_downloads: SingleFlight[bytes | memoryview] = SingleFlight()
 
 
 @async_lru.alru_cache
@@ -50,27 +56,37 @@ async def get_data_point(data_point_id: str) -> models.DataPoint:
     )
 
 
-@async_lru.alru_cache
+async def get_document_bytes(reference_id: str) -> bytes | memoryview:
+    """Return the full PDF for the given file reference, downloading it only if it is not cached yet."""
+    full_pdf_bytes = document_cache.get(reference_id)
+    if full_pdf_bytes is not None:
+        return full_pdf_bytes
+
+    return await _document_downloads.run(reference_id, _download_document, reference_id)
+
+
+async def _download_document(reference_id: str) -> bytes | memoryview:
+    """Load the full PDF for the given file reference from the document store and add it to the document cache."""
+    full_pdf_bytes = await asyncio.to_thread(document_provider.get_document, reference_id)
+    document_cache.put(reference_id, full_pdf_bytes)
+    return full_pdf_bytes
+
+
 async def get_document(reference_id: str, page_num: int) -> io.BytesIO:
     """Return a PDF document stream for specific pages."""
-    logger.info("Downloading document with reference ID: %s", reference_id)
-    full_pdf_bytes = await asyncio.to_thread(
-        config.dataland_client.documents_api.get_document, document_id=reference_id
-    )
+    full_pdf_bytes = await get_document_bytes(reference_id)
 
     return await asyncio.to_thread(extract_single_page, full_pdf_bytes=full_pdf_bytes, page_number=page_num)
 
 
-async def override_dataland_qa(
-    data_point_id: str,
+def build_qa_report_data(
     comment: str,
     qa_status: str,
     predicted_answer: any,  # type: ignore
     data_source: dict,
-) -> None:
-    """Override Dataland QA status for the given data point ID."""
-    logger.info("Overriding Dataland QA status for data point ID: %s to %s", data_point_id, qa_status)
-    report_data = {
+) -> dict:
+    """Return the QA report overriding the Dataland QA status of a data point."""
+    return {
         "comment": comment,
         "verdict": str(qa_status),
         "correctedData": json.dumps(
@@ -82,6 +98,10 @@ async def override_dataland_qa(
             }
         ),
     }
+
+
+async def post_qa_report(data_point_id: str, report_data: dict) -> Any:  # noqa: ANN401
+    """Post the QA report of the data point through the shared, pooled QA API client."""
     return await asyncio.to_thread(
         config.dataland_client.datapoint_qa_controller_api.post_qa_report,
         data_point_id=data_point_id,
@@ -1,8 +1,15 @@
 import asyncio
 import logging
 import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any
 
-from dataland_qa_lab.data_point_flow import models, prompts
+from sqlalchemy import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+from dataland_qa_lab.data_point_flow import models
 from dataland_qa_lab.database import database_engine, database_tables
 from dataland_qa_lab.utils import config
 
@@ -10,68 +17,142 @@ conf = config.get_config()
 
 
 logger = logging.getLogger(__name__)
-validation_prompts = prompts.get_prompts()
 
 
-async def store_data_point_in_db(data: models.ValidatedDatapoint | models.CannotValidateDatapoint) -> None:
-    """Store the validated data point in the database."""
-    logger.info("Storing validated data point ID: %s in the database.", data.data_point_id)
+_pending_writes: ContextVar[dict[str, models.ValidatedDatapoint | models.CannotValidateDatapoint] | None] = ContextVar(
+    "pending_writes", default=None
+)
+
+
+def to_validated_data_point_row(data: models.ValidatedDatapoint | models.CannotValidateDatapoint) -> dict[str, Any]:
+    """Return the validated_data_point row of the validation result."""
     if isinstance(data, models.CannotValidateDatapoint):
-        model = database_tables.ValidatedDataPoint(
-            data_point_id=data.data_point_id,
-            data_point_type=data.data_point_type,
-            previous_answer=None,
-            predicted_answer=None,
-            confidence=0.0,
-            reasoning=data.reasoning,
-            qa_status="QaNotAttempted",
-            timestamp=int(time.time()),
-            ai_model=data.ai_model,
-            use_ocr=data.use_ocr,
-            override=data.override,
-            file_reference=None,
-            file_name=None,
-            _prompt=data._prompt,
-            page=None,
-        )
-    else:
-        model = database_tables.ValidatedDataPoint(
-            data_point_id=data.data_point_id,
-            data_point_type=data.data_point_type,
-            previous_answer=data.previous_answer,
-            predicted_answer=data.predicted_answer,
-            confidence=data.confidence,
-            reasoning=data.reasoning,
-            qa_status=data.qa_status,
-            timestamp=data.timestamp,
-            ai_model=data.ai_model,
-            use_ocr=data.use_ocr,
-            override=data.override,
-            file_reference=data.file_reference,
-            file_name=data.file_name,
-            _prompt=data._prompt,
-            page=data.page,
-        )
-    if database_engine.get_entity(database_tables.ValidatedDataPoint, data_point_id=data.data_point_id):
-        await delete_existing_entry(data.data_point_id)
-    await asyncio.to_thread(database_engine.add_entity, entity=model)
+        return {
+            "data_point_id": data.data_point_id,
+            "data_point_type": data.data_point_type,
+            "previous_answer": None,
+            "predicted_answer": None,
+            "confidence": 0.0,
+            "reasoning": data.reasoning,
+            "qa_status": "QaNotAttempted",
+            "timestamp": int(time.time()),
+            "ai_model": data.ai_model,
+            "use_ocr": data.use_ocr,
+            "override": data.override,
+            "file_reference": None,
+            "file_name": None,
+            "page": None,
+            "qa_report_id": None,
+            "_prompt": data._prompt,
+        }
+    return {
+        "data_point_id": data.data_point_id,
+        "data_point_type": data.data_point_type,
+        "previous_answer": data.previous_answer,
+        "predicted_answer": data.predicted_answer,
+        "confidence": data.confidence,
+        "reasoning": data.reasoning,
+        "qa_status": data.qa_status,
+        "timestamp": data.timestamp,
+        "ai_model": data.ai_model,
+        "use_ocr": data.use_ocr,
+        "override": data.override,
+        "file_reference": data.file_reference,
+        "file_name": data.file_name,
+        "page": data.page,
+        "qa_report_id": data.qa_report_id,
+        "_prompt": data._prompt,
+    }
+
+
+async def store_data_point_in_db(data: models.ValidatedDatapoint | models.CannotValidateDatapoint) -> None:
+    """Store the validated data point in the database, replacing an earlier result.
+
+    Within batched_writes, the result is buffered and stored when the batch ends.
+    """
+    pending = _pending_writes.get()
+    if pending is not None:
+        pending[data.data_point_id] = data
+        return
+    await store_data_points_in_db([data])
+
+
+async def store_data_points_in_db(data: list[models.ValidatedDatapoint | models.CannotValidateDatapoint]) -> None:
+    """Store the validated data points in the database with one upsert statement and transaction."""
+    if not data:
+        return
+    logger.info("Storing %d validated data points in the database.", len(data))
+    await database_engine.upsert_entities_async(
+        database_tables.ValidatedDataPoint,
+        [to_validated_data_point_row(item) for item in data],
+        conflict_columns=["data_point_id"],
+    )
+
+
+@asynccontextmanager
+async def batched_writes() -> AsyncIterator[None]:
+    """Buffer the results stored within the block, e.g. of one dataset, and store them together at its end.
+
+    Buffered results are visible to check_if_already_validated in the same context. Nested batches join the
+    outermost one.
+    """
+    if _pending_writes.get() is not None:
+        yield
+        return
+
+    pending: dict[str, models.ValidatedDatapoint | models.CannotValidateDatapoint] = {}
+    token = _pending_writes.set(pending)
+    try:
+        yield
+    finally:
+        _pending_writes.reset(token)
+        await store_data_points_in_db(list(pending.values()))
+
+
+def is_batching_writes() -> bool:
+    """Return whether the results stored in the current context are buffered by batched_writes."""
+    return _pending_writes.get() is not None
 
 
 async def check_if_already_validated(
     data_point_id: str,
 ) -> models.CannotValidateDatapoint | models.ValidatedDatapoint | None:
     """Check if the data point has already been validated."""
-    existing_validation = await asyncio.to_thread(
-        database_engine.get_entity,
-        entity_class=database_tables.ValidatedDataPoint,
-        data_point_id=data_point_id,
+    pending = _pending_writes.get()
+    if pending is not None and data_point_id in pending:
+        return pending[data_point_id]
+
+    existing_validation = await database_engine.get_entity_async(
+        database_tables.ValidatedDataPoint, data_point_id=data_point_id
     )
     if not existing_validation:
         return None
     logger.info("Data point ID: %s has already been validated.", data_point_id)
+    return to_validation_result(existing_validation)
+
+
+async def get_validated_data_points(
+    data_point_ids: list[str],
+) -> dict[str, models.CannotValidateDatapoint | models.ValidatedDatapoint]:
+    """Return the existing validation results of the data points, looked up in one query."""
+    pending = _pending_writes.get() or {}
+    results = {data_point_id: pending[data_point_id] for data_point_id in data_point_ids if data_point_id in pending}
+    rows = await database_engine.get_entities_async(
+        database_tables.ValidatedDataPoint,
+        "data_point_id",
+        [data_point_id for data_point_id in data_point_ids if data_point_id not in results],
+    )
+    results.update((row.data_point_id, to_validation_result(row)) for row in rows)
+    return results
+
+
+def to_validation_result(
+    existing_validation: database_tables.ValidatedDataPoint,
+) -> models.CannotValidateDatapoint | models.ValidatedDatapoint:
+    """Return the validation result stored in the validated_data_point row."""
     if existing_validation.predicted_answer is None:
         return models.CannotValidateDatapoint(
-            data_point_id=data_point_id,
+            data_point_id=existing_validation.data_point_id,
             data_point_type=existing_validation.data_point_type or None,
             reasoning=existing_validation.reasoning,
             ai_model=existing_validation.ai_model,
@@ -101,11 +182,44 @@ async def check_if_already_validated(
     )
 
 
-async def delete_existing_entry(data_point_id: str) -> None:
-    """Delete existing validated data point entry from the database."""
-    logger.info("Deleting existing validated entry for data point ID: %s", data_point_id)
-    await asyncio.to_thread(
-        database_engine.delete_entity,
-        entity_id=data_point_id,
-        entity_class=database_tables.ValidatedDataPoint,
-    )
+@asynccontextmanager
+async def advisory_lock(name: str, poll_interval: float = 0.5) -> AsyncIterator[bool]:
+    """Hold the advisory lock with the given name while the block runs, so that only one replica runs it at a time.
+
+    Like database_engine.advisory_lock, but waits for the lock without blocking the event loop or a thread.
+
+    Yields:
+        Whether the lock was acquired. Without it, the block runs anyway after the configured timeout.
+    """
+    deadline = time.monotonic() + conf.advisory_lock_timeout_seconds
+    connection = None
+    try:
+        # Advisory locks held by other database sessions cannot be awaited, only polled.
+        while (connection := await _try_advisory_lock(name)) is None and time.monotonic() < deadline:  # noqa: ASYNC110
+            await asyncio.sleep(poll_interval)
+    except SQLAlchemyError as e:
+        logger.exception("Error acquiring advisory lock %s", name, exc_info=e)
+
+    if connection is None:
+        logger.warning("Proceeding without advisory lock %s.", name)
+    try:
+        yield connection is not None
+    finally:
+        if connection is not None:
+            await asyncio.to_thread(database_engine.release_advisory_lock, connection, name)
+
+
+async def _try_advisory_lock(name: str) -> Connection | None:
+    """Try once to take the advisory lock, releasing it again if the caller is cancelled meanwhile."""
+    attempt = asyncio.ensure_future(asyncio.to_thread(database_engine.try_advisory_lock, name))
+    try:
+        return await asyncio.shield(attempt)
+    except asyncio.CancelledError:
+        attempt.add_done_callback(lambda _: _release_abandoned_lock(attempt, name))
+        raise
+
+
+def _release_abandoned_lock(attempt: asyncio.Future[Connection | None], name: str) -> None:
+    """Release the lock taken by an attempt whose caller was cancelled."""
+    if not attempt.cancelled() and attempt.exception() is None and attempt.result() is not None:
+        database_engine.release_advisory_lock(attempt.result(), name)
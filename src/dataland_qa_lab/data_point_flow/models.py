@@ -71,3 +71,26 @@ class AIResponse:
     confidence: float
     reasoning: str
     qa_status: str
+
+
+@dataclass
+class AdmissionStats:
+    """Current load of the AI admission controller for one model."""
+
+    model: str
+    in_flight_requests: int
+    in_flight_tokens: int
+    queued_requests: int
+    queued_tokens: int
+    max_requests: int
+    max_tokens: int
+
+
+@dataclass
+class EncodedImage:
+    """Data structure for a rendered page image, encoded for the vision model."""
+
+    data: bytes
+    image_format: str
+    width: int
+    height: int
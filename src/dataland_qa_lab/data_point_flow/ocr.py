@@ -1,75 +1,67 @@
 import asyncio
 import io
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-import async_lru
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import DocumentContentFormat
-from azure.core.credentials import AzureKeyCredential
-
-from dataland_qa_lab.data_point_flow import ocr
+from dataland_qa_lab.data_point_flow import db, ocr
 from dataland_qa_lab.database import database_engine, database_tables
-from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils import config, document_intelligence
+from dataland_qa_lab.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 config = config.get_config()
 
-_lock_map = {}
-_lock_map_lock = asyncio.Lock()
-
-
-def get_lock_for(key):  # noqa: ANN001, ANN201
-    """Return a per-key lock, creating it if needed."""
-
-    async def _get():  # noqa: ANN202
-        async with _lock_map_lock:
-            if key not in _lock_map:
-                _lock_map[key] = asyncio.Lock()
-            return _lock_map[key]
+# Document Intelligence jobs block a thread until their poller completes, so they get their own pool instead of
+# competing with the short blocking calls in the default executor.
+_ocr_executor = ThreadPoolExecutor(max_workers=config.ocr_max_workers, thread_name_prefix="ocr")
 
-    return _get()
+_ocr_jobs: SingleFlight[str] = SingleFlight()
 
 
-@async_lru.alru_cache
 async def run_ocr_on_document(file_name: str, file_reference: str, page: int, document: io.BytesIO) -> str:
-    """Run OCR on the given PDF document and return the extracted text."""
-    logger.info("Running OCR on document with reference ID: %s, page: %d", file_reference, page)
-
-    key = (file_name, file_reference, page)
-    lock = await get_lock_for(key)
-
-    async with lock:
-        cached_document = database_engine.get_entity(
-            database_tables.CachedDocument, file_reference=file_reference, page=page
+    """Run OCR on the given PDF document and return the extracted text.
+
+    Concurrent calls for the same page share one OCR job, and only one replica at a time OCRs a page.
+    Finished results are cached in the database.
+    """
+    return await _ocr_jobs.run((file_name, file_reference, page), _run_ocr, file_name, file_reference, page, document)
+
+
+async def _run_ocr(file_name: str, file_reference: str, page: int, document: io.BytesIO) -> str:
+    """Return the cached OCR output of the page, or run OCR on the document and cache its output."""
+    cached_output = await _get_cached_ocr_output(file_reference, page)
+    if cached_output is not None:
+        return cached_output
+
+    # Other replicas may OCR the same page, so the page is locked cluster-wide on a cache miss and the cache is
+    # checked again once the lock is held.
+    async with db.advisory_lock(f"ocr:{file_reference}:{page}"):
+        cached_output = await _get_cached_ocr_output(file_reference, page)
+        if cached_output is not None:
+            return cached_output
+
+        logger.info("Running OCR on document with reference ID: %s, page: %d", file_reference, page)
+        markdown = await asyncio.get_running_loop().run_in_executor(_ocr_executor, ocr.extract_pdf, document)
+
+        await database_engine.upsert_entities_async(
+            database_tables.CachedDocument,
+            [{"file_name": file_name, "file_reference": file_reference, "ocr_output": markdown, "page": page}],
+            conflict_columns=["file_reference", "page"],
         )
+        return markdown
 
-        if cached_document:
-            logger.info("Found cached OCR output for document with reference ID: %s, page: %d", file_reference, page)
-            return cached_document.ocr_output
-
-        markdown = ocr.extract_pdf(document)
 
-        database_engine.add_entity(
-            database_tables.CachedDocument(
-                file_name=file_name,
-                file_reference=file_reference,
-                ocr_output=markdown,
-                page=page,
-            )
-        )
-        return markdown
+async def _get_cached_ocr_output(file_reference: str, page: int) -> str | None:
+    """Return the OCR output of the page cached in the database, if any."""
+    cached_document = await database_engine.get_entity_async(
+        database_tables.CachedDocument, file_reference=file_reference, page=page
+    )
+    if not cached_document:
+        return None
+    logger.info("Found cached OCR output for document with reference ID: %s, page: %d", file_reference, page)
+    return cached_document.ocr_output
 
 
 def extract_pdf(pdf) -> str:  # noqa: ANN001
     """Use Azure Document Intelligence to make text readable for azure open ai."""
-    docintel_cred = AzureKeyCredential(config.azure_docintel_api_key)
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=config.azure_docintel_endpoint, credential=docintel_cred
-    )
-    poller = document_intelligence_client.begin_analyze_document(
-        "prebuilt-layout",
-        body=pdf,
-        content_type="application/octet-stream",
-        output_content_format=DocumentContentFormat.MARKDOWN,
-    )
-    return poller.result().content
+    return document_intelligence.extract_markdown(pdf)
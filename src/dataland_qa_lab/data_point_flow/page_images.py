@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from io import BytesIO
+from pathlib import Path
+
+from dataland_qa_lab.data_point_flow import rasterizer
+from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils.document_store import DocumentStore
+from dataland_qa_lab.utils.single_flight import SingleFlight
+from dataland_qa_lab.utils.sized_lru_cache import SizedLRUCache
+
+logger = logging.getLogger(__name__)
+conf = config.get_config()
+
+type PageImageKey = tuple[str, int, int, str, int, int, int]
+
+page_image_cache: SizedLRUCache[PageImageKey, list[str]] = SizedLRUCache(
+    max_size=conf.page_image_cache_max_bytes, size_of=lambda images: sum(len(image) for image in images)
+)
+page_image_store = (
+    DocumentStore(root=Path(conf.page_image_cache_dir), max_bytes=conf.page_image_cache_max_disk_bytes)
+    if conf.page_image_cache_dir
+    else None
+)
+_renders: SingleFlight[list[str]] = SingleFlight()
+
+
+def get_page_image_key(file_reference: str, page: int) -> PageImageKey:
+    """Return the cache key of the page, including all settings that change the rendered images."""
+    return (
+        file_reference,
+        page,
+        conf.vision_dpi,
+        conf.vision_image_format,
+        conf.vision_image_quality,
+        conf.vision_max_long_side,
+        conf.vision_max_short_side,
+    )
+
+
+async def get_page_images(file_reference: str, page: int, document: BytesIO) -> list[str]:
+    """Return the base64-encoded images of the page, rendering the document only if they are not cached yet.
+
+    Args:
+        file_reference: The file reference of the full document.
+        page: The page number within the full document.
+        document: The PDF containing only this page, rendered on a cache miss.
+
+    Returns:
+        The base64-encoded images in the configured vision image format.
+    """
+    key = get_page_image_key(file_reference, page)
+    images = page_image_cache.get(key)
+    if images is not None:
+        return images
+
+    return await _renders.run(key, _load_page_images, key, document)
+
+
+async def _load_page_images(key: PageImageKey, document: BytesIO) -> list[str]:
+    """Load the page images from the disk cache or render them, and add them to the memory cache."""
+    images = await asyncio.to_thread(_read_from_store, key)
+    if images is None:
+        logger.debug("Rendering page %d of %s for vision validation.", key[1], key[0])
+        images = await rasterizer.render_page_images(
+            document,
+            dpi=conf.vision_dpi,
+            image_format=conf.vision_image_format,
+            quality=conf.vision_image_quality,
+            max_long_side=conf.vision_max_long_side,
+            max_short_side=conf.vision_max_short_side,
+        )
+        await asyncio.to_thread(_write_to_store, key, images)
+
+    page_image_cache.put(key, images)
+    return images
+
+
+def _read_from_store(key: PageImageKey) -> list[str] | None:
+    """Return the page images from the disk cache, or None if it is disabled or does not contain them."""
+    if page_image_store is None:
+        return None
+    content = page_image_store.get(repr(key))
+    if content is None:
+        return None
+    with content:
+        # Base64 contains no whitespace, so the images are stored one per line.
+        return bytes(content).decode("ascii").split()
+
+
+def _write_to_store(key: PageImageKey, images: list[str]) -> None:
+    """Add the page images to the disk cache, if it is enabled."""
+    if page_image_store is not None and images:
+        page_image_store.put(repr(key), "\n".join(images).encode("ascii"))
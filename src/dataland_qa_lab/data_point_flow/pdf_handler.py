@@ -1,12 +1,19 @@
 import io
 import logging
+from multiprocessing import shared_memory
+from typing import Any, Literal
 
 import fitz
 from PIL import Image
 
+from dataland_qa_lab.data_point_flow import models
+
 logger = logging.getLogger(__name__)
 
 
+VisionImageFormat = Literal["jpeg", "webp"]
+
+
 def _raise_value_error(message: str) -> None:
     """Helper function to raise ValueError with a given message."""
     raise ValueError(message)
@@ -17,7 +24,7 @@ def _raise_runtime_error(message: str) -> None:
     raise RuntimeError(message)
 
 
-def extract_single_page(full_pdf_bytes: bytes, page_number: int) -> io.BytesIO:
+def extract_single_page(full_pdf_bytes: bytes | memoryview, page_number: int) -> io.BytesIO:
     """Extracts a single page from a PDF and returns it as a BytesIO stream."""
     if not full_pdf_bytes:
         msg = "Full PDF bytes cannot be empty."
@@ -58,8 +65,41 @@ def extract_single_page(full_pdf_bytes: bytes, page_number: int) -> io.BytesIO:
         raise RuntimeError(msg) from e
 
 
-def render_pdf_to_image(pdf_stream: io.BytesIO, dpi: int = 300) -> list[Image.Image]:
-    """Render PDF pages to PIL Images."""
+def get_render_zoom(page_rect: fitz.Rect, dpi: int, max_long_side: int, max_short_side: int) -> float:
+    """Return the zoom rendering the page at the given DPI, but no larger than the maximum side lengths."""
+    long_side = max(page_rect.width, page_rect.height)
+    short_side = min(page_rect.width, page_rect.height)
+    if long_side <= 0 or short_side <= 0:
+        msg = f"Page has no area: {page_rect}."
+        raise ValueError(msg)
+    return min(dpi / 72.0, max_long_side / long_side, max_short_side / short_side)
+
+
+def encode_pixmap(pix: fitz.Pixmap, image_format: VisionImageFormat, quality: int) -> bytes:
+    """Encode an RGB pixmap directly to JPEG or WEBP."""
+    if image_format == "jpeg":
+        return pix.tobytes("jpg", jpg_quality=quality)
+
+    image = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+    with io.BytesIO() as buffer:
+        image.save(buffer, format="WEBP", quality=quality)
+        return buffer.getvalue()
+
+
+def render_pdf_to_encoded_images(  # noqa: PLR0913
+    pdf_stream: io.BytesIO,
+    *,
+    dpi: int = 300,
+    image_format: VisionImageFormat = "jpeg",
+    quality: int = 85,
+    max_long_side: int = 2048,
+    max_short_side: int = 768,
+) -> list[models.EncodedImage]:
+    """Render PDF pages straight to encoded images, sized to what the vision model can resolve.
+
+    The vision model scales high detail images to fit 2048x2048 pixels and then to 768 pixels on the short side,
+    so rendering any larger only costs time and memory.
+    """
     if pdf_stream is None:
         msg = "PDF stream cannot be None."
         raise ValueError(msg)
@@ -68,10 +108,9 @@ def render_pdf_to_image(pdf_stream: io.BytesIO, dpi: int = 300) -> list[Image.Im
         msg = f"DPI must be a positive integer, got {dpi}."
         raise ValueError(msg)
 
-    images: list[Image.Image] = []
+    images: list[models.EncodedImage] = []
     try:
-        pdf_stream.seek(0)
-        stream_content = pdf_stream.read()
+        stream_content = pdf_stream.getbuffer()
         if not stream_content:
             msg = "PDF stream is empty."
             _raise_value_error(msg)
@@ -81,15 +120,19 @@ def render_pdf_to_image(pdf_stream: io.BytesIO, dpi: int = 300) -> list[Image.Im
                 msg = "PDF document contains no pages."
                 _raise_value_error(msg)
 
-            zoom = dpi / 72.0
-            mat = fitz.Matrix(zoom, zoom)
-
             for page_number, page in enumerate(doc, start=1):
                 try:
-                    pix = page.get_pixmap(matrix=mat)
-                    img = Image.open(io.BytesIO(pix.tobytes("png")))
-                    images.append(img)
-                    logger.debug("Rendered page %d/%d (%dx%d)", page_number, len(doc), img.width, img.height)
+                    zoom = get_render_zoom(page.rect, dpi, max_long_side, max_short_side)
+                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+                    images.append(
+                        models.EncodedImage(
+                            data=encode_pixmap(pix, image_format, quality),
+                            image_format=image_format,
+                            width=pix.width,
+                            height=pix.height,
+                        )
+                    )
+                    logger.debug("Rendered page %d/%d (%dx%d)", page_number, len(doc), pix.width, pix.height)
                 except Exception:
                     logger.exception("Failed to render page %d", page_number)
                     continue
@@ -97,7 +140,7 @@ def render_pdf_to_image(pdf_stream: io.BytesIO, dpi: int = 300) -> list[Image.Im
             msg = "Failed to render any images from the PDF document."
             _raise_runtime_error(msg)
 
-        logger.info("Successfully rendered PDF to %d images at %d DPI.", len(images), dpi)
+        logger.info("Successfully rendered PDF to %d %s images.", len(images), image_format)
 
     except ValueError:
         raise
@@ -106,3 +149,26 @@ def render_pdf_to_image(pdf_stream: io.BytesIO, dpi: int = 300) -> list[Image.Im
         msg = f"Failed to render PDF to images: {e}"
         raise RuntimeError(msg) from e
     return images
+
+
+def render_pdf_to_shared_memory(pdf_bytes: bytes, **render_options: Any) -> list[tuple[str, int]]:  # noqa: ANN401
+    """Render PDF pages to encoded images in shared memory blocks, for a caller in another process.
+
+    Returns:
+        The name and size of the shared memory block of each image. The caller must unlink the blocks.
+    """
+    images = render_pdf_to_encoded_images(io.BytesIO(pdf_bytes), **render_options)
+    blocks = []
+    try:
+        for image in images:
+            block = shared_memory.SharedMemory(create=True, size=max(1, len(image.data)))
+            blocks.append(block)
+            block.buf[: len(image.data)] = image.data
+            block.close()
+    except BaseException:
+        # Without the names of the blocks, the caller could not free them.
+        for block in blocks:
+            block.close()
+            block.unlink()
+        raise
+    return [(block.name, len(image.data)) for block, image in zip(blocks, images, strict=True)]
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+
+from dataland_qa_lab.data_point_flow import db, models, prompts, qa_reports, review
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyCycleError(ValueError):
+    """Raised when the depends_on lists of the prompts form a cycle between data point types."""
+
+
+def build_dependency_graph(data_point_types: list[str]) -> dict[str, set[str]]:
+    """Return for each data point type the types it depends on, limited to the given types."""
+    available = set(data_point_types)
+    graph = {}
+    for data_point_type in data_point_types:
+        prompt = prompts.registry.get(data_point_type)
+        depends_on = prompt.depends_on if prompt else []
+        graph[data_point_type] = {dependency for dependency in depends_on if dependency in available}
+    return graph
+
+
+def plan_waves(graph: dict[str, set[str]]) -> list[list[str]]:
+    """Order the data point types into waves, so that every type only depends on types of earlier waves.
+
+    Raises:
+        DependencyCycleError: If some types depend on each other in a cycle.
+    """
+    remaining = {node: set(dependencies) for node, dependencies in graph.items()}
+    waves = []
+    while remaining:
+        wave = [node for node, dependencies in remaining.items() if not dependencies]
+        if not wave:
+            msg = f"Circular dependencies between data point types: {sorted(remaining)}"
+            raise DependencyCycleError(msg)
+        for node in wave:
+            del remaining[node]
+        for dependencies in remaining.values():
+            dependencies.difference_update(wave)
+        waves.append(wave)
+    return waves
+
+
+async def validate_dataset(
+    dataset_id: str, data_points: dict[str, str], use_ocr: bool, ai_model: str, override: bool
+) -> dict[str, models.ValidatedDatapoint | models.CannotValidateDatapoint]:
+    """Validate all data points of a dataset once, running each wave of independent data points concurrently.
+
+    Unless override is set, data points that have been validated before are looked up together and skipped.
+
+    Args:
+        dataset_id: The ID of the dataset.
+        data_points: The data point IDs of the dataset by data point type.
+        use_ocr: Whether to validate using OCR instead of vision.
+        ai_model: The AI model to use.
+        override: Whether to replace existing validations.
+
+    Returns:
+        The validation results by data point type, in the order of data_points.
+
+    Raises:
+        DependencyCycleError: If the prompts of the data point types depend on each other in a cycle.
+    """
+    graph = build_dependency_graph(list(data_points))
+    waves = plan_waves(graph)
+    logger.info("Validating dataset %s in %d waves.", dataset_id, len(waves))
+
+    existing = {} if override else await db.get_validated_data_points(list(data_points.values()))
+    if existing:
+        logger.info("Skipping %d already validated data points of dataset %s.", len(existing), dataset_id)
+
+    results: dict[str, models.ValidatedDatapoint | models.CannotValidateDatapoint] = {
+        data_point_type: existing[data_point_id]
+        for data_point_type, data_point_id in data_points.items()
+        if data_point_id in existing
+    }
+    # The results of the whole dataset are written to the database in one transaction at the end, after their
+    # QA reports have been posted to Dataland.
+    async with db.batched_writes(), qa_reports.batched_reports():
+        for wave in waves:
+            pending = [data_point_type for data_point_type in wave if data_point_type not in results]
+            wave_results = await asyncio.gather(
+                *[
+                    review.validate_datapoint(
+                        data_points[data_point_type],
+                        use_ocr=use_ocr,
+                        ai_model=ai_model,
+                        override=override,
+                        dataset_id=dataset_id,
+                        dependency_results={dependency: results[dependency] for dependency in graph[data_point_type]},
+                        skip_existing_check=True,
+                    )
+                    for data_point_type in pending
+                ]
+            )
+            results.update(zip(pending, wave_results, strict=True))
+
+    return {data_point_type: results[data_point_type] for data_point_type in data_points}
@@ -1,4 +1,8 @@
+import functools
 import json
+import string
+import threading
+import time
 from logging import getLogger
 from pathlib import Path
 
@@ -10,6 +14,23 @@ logger = getLogger(__name__)
 
 default_prompts_dir = Path(__file__).parent.parent / "prompts"
 
+# Placeholders filled in by review.build_prompt_text.
+template_fields = frozenset(
+    {
+        "context",
+        "depends_on",
+        "data_point_id",
+        "data_point_type",
+        "data_source",
+        "page",
+        "file_reference",
+        "file_name",
+        "value",
+        "comment",
+        "quality",
+    }
+)
+
 
 def get_prompts(prompts_dir: Path = default_prompts_dir) -> dict:
     """Return all prompts from the prompts directory."""
@@ -31,14 +52,150 @@ def get_prompts(prompts_dir: Path = default_prompts_dir) -> dict:
     return combined
 
 
+@functools.lru_cache(maxsize=1024)
+def compile_template(template: str) -> tuple[tuple[str, str | None, str | None, str | None], ...]:
+    """Parse the prompt template once into its literal text and replacement fields."""
+    return tuple(string.Formatter().parse(template))
+
+
+def format_template(template: str, **fields: object) -> str:
+    """Fill in the prompt template like str.format, without parsing the template again."""
+    formatter = string.Formatter()
+    parts = []
+    for literal_text, field_name, format_spec, conversion in compile_template(template):
+        parts.append(literal_text)
+        if field_name is None:
+            continue
+        value, _ = formatter.get_field(field_name, (), fields)
+        value = formatter.convert_field(value, conversion)
+        spec = format_spec.format(**fields) if format_spec and "{" in format_spec else format_spec or ""
+        parts.append(formatter.format_field(value, spec))
+    return "".join(parts)
+
+
+def get_template_fields(template: str) -> set[str]:
+    """Return the names of the placeholders used in the prompt template."""
+    return {
+        field_name.split(".")[0].split("[")[0]
+        for _, field_name, _, _ in compile_template(template)
+        if field_name is not None
+    }
+
+
+class PromptRegistry:
+    """In-memory index of the prompts by data point type, reloaded only when a prompt file changes.
+
+    The prompt files are checked for changes at most once per reload interval, or on an explicit reload().
+    Prompt templates are checked and compiled once when the files are loaded, so that broken templates are
+    reported at load time instead of failing the validation of every data point of their type.
+    """
+
+    def __init__(self, prompts_dir: Path = default_prompts_dir, reload_interval_seconds: float | None = None) -> None:
+        """Create a new registry for the given prompts directory. The files are loaded on first use."""
+        self.prompts_dir = prompts_dir
+        self.reload_interval_seconds = (
+            conf.prompt_reload_interval_seconds if reload_interval_seconds is None else reload_interval_seconds
+        )
+        self._prompts: dict[str, models.DataPointPrompt] = {}
+        self._transitive_dependencies: dict[str, frozenset[str]] = {}
+        self._file_state: tuple[tuple[str, int, int], ...] | None = None
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+
+    def reload(self) -> None:
+        """Check the prompt files for changes now, instead of waiting for the reload interval."""
+        self._checked_at = None
+        self._get_prompts()
+
+    def get(self, data_point_type: str) -> models.DataPointPrompt | None:
+        """Return the prompt for the data point type, or None if there is none."""
+        return self._get_prompts().get(data_point_type)
+
+    def get_transitive_dependencies(self, data_point_type: str) -> frozenset[str]:
+        """Return all data point types the given type depends on, directly or through other dependencies."""
+        prompts = self._get_prompts()
+        dependencies = self._transitive_dependencies.get(data_point_type)
+        if dependencies is None:
+            found: set[str] = set()
+            pending = [data_point_type]
+            while pending:
+                prompt = prompts.get(pending.pop())
+                for dependency in prompt.depends_on if prompt else []:
+                    if dependency not in found:
+                        found.add(dependency)
+                        pending.append(dependency)
+            dependencies = frozenset(found)
+            self._transitive_dependencies[data_point_type] = dependencies
+        return dependencies
+
+    def _get_prompts(self) -> dict[str, models.DataPointPrompt]:
+        """Return the indexed prompts, reloading them first if the reload interval passed and a prompt file changed."""
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.reload_interval_seconds:
+            return self._prompts
+        with self._lock:
+            if self._checked_at != checked_at:
+                return self._prompts
+            file_state = self._get_file_state()
+            if file_state != self._file_state:
+                self._prompts = self._load()
+                self._transitive_dependencies = {}
+                self._file_state = file_state
+            self._checked_at = time.monotonic()
+        return self._prompts
+
+    def _get_file_state(self) -> tuple[tuple[str, int, int], ...]:
+        """Return name, modification time and size of all prompt files."""
+        state = []
+        for file in self.prompts_dir.glob("*.json"):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            state.append((file.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(state))
+
+    def _load(self) -> dict[str, models.DataPointPrompt]:
+        """Parse all prompt files and index the valid prompts by data point type."""
+        logger.info("Loading prompts from %s", self.prompts_dir)
+        index = {}
+        for data_point_type, prompt_data in get_prompts(self.prompts_dir).items():
+            if not isinstance(prompt_data, dict):
+                continue
+            template = prompt_data.get("prompt")
+            if not isinstance(template, str):
+                logger.error("Prompt for %s has no prompt template.", data_point_type)
+                continue
+            try:
+                unknown_fields = get_template_fields(template) - template_fields
+            except ValueError:
+                logger.exception("Prompt template for %s is malformed.", data_point_type)
+                continue
+            if unknown_fields:
+                logger.error("Prompt template for %s uses unknown fields: %s", data_point_type, sorted(unknown_fields))
+                continue
+            index[data_point_type] = models.DataPointPrompt(
+                prompt=template, depends_on=prompt_data.get("depends_on", [])
+            )
+        return index
+
+
+registry = PromptRegistry()
+
+
 def get_prompt_config(data_point_type: str) -> models.DataPointPrompt | None:
     """Retrieve the validation prompt or return None if not found."""
     logger.info("Retrieving prompt for: %s", data_point_type)
 
-    prompt_data = get_prompts().get(data_point_type)
+    prompt = registry.get(data_point_type)
 
-    if not prompt_data:
+    if not prompt:
         logger.warning("No prompt found for %s. Skipping...", data_point_type)
         return None
 
-    return models.DataPointPrompt(prompt=prompt_data.get("prompt"), depends_on=prompt_data.get("depends_on", []))
+    return prompt
+
+
+def is_circular_dependency(data_point_type: str, dependency_type: str) -> bool:
+    """Check if the dependency depends on the data point type itself, directly or indirectly."""
+    return data_point_type in registry.get_transitive_dependencies(dependency_type)
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from itertools import starmap
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from dataland_qa_lab.data_point_flow import dataland, db, models
+from dataland_qa_lab.database import database_engine, database_tables
+from dataland_qa_lab.utils import config
+
+conf = config.get_config()
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_LOCK = "qa_report_outbox"
+
+_pending_reports: ContextVar[dict[str, tuple[models.ValidatedDatapoint, dict]] | None] = ContextVar(
+    "pending_reports", default=None
+)
+
+
+async def submit(result: models.ValidatedDatapoint, report_data: dict) -> None:
+    """Post the QA report of the validated data point to Dataland and set its qa_report_id.
+
+    Within batched_reports, the report is posted when the batch ends. Reports that cannot be posted are kept in
+    the outbox and retried by retry_failed_reports.
+    """
+    pending = _pending_reports.get()
+    if pending is not None:
+        pending[result.data_point_id] = (result, report_data)
+        return
+    await flush({result.data_point_id: (result, report_data)})
+
+
+@asynccontextmanager
+async def batched_reports() -> AsyncIterator[None]:
+    """Collect the reports submitted within the block, e.g. of one dataset, and post them together at its end.
+
+    The results stored within the block receive their qa_report_id once the batch is posted, so a batch must be
+    nested inside db.batched_writes to store the IDs along with the results. Nested batches join the outermost one.
+    """
+    if _pending_reports.get() is not None:
+        yield
+        return
+
+    pending: dict[str, tuple[models.ValidatedDatapoint, dict]] = {}
+    token = _pending_reports.set(pending)
+    try:
+        yield
+    finally:
+        _pending_reports.reset(token)
+        posted = await flush(pending)
+        if not db.is_batching_writes():
+            # The results have been stored already, without their qa_report_id.
+            await db.store_data_points_in_db(posted)
+
+
+async def flush(reports: dict[str, tuple[models.ValidatedDatapoint, dict]]) -> list[models.ValidatedDatapoint]:
+    """Post the reports with bounded concurrency, and move the ones that fail to the outbox.
+
+    Returns:
+        The results whose report was posted, with their qa_report_id set.
+    """
+    if not reports:
+        return []
+    logger.info("Posting %d QA reports to Dataland.", len(reports))
+    report_ids = await _post_all({data_point_id: report_data for data_point_id, (_, report_data) in reports.items()})
+
+    posted = []
+    failed = []
+    for data_point_id, (result, report_data) in reports.items():
+        report_id = report_ids[data_point_id]
+        if isinstance(report_id, Exception):
+            failed.append(to_outbox_row(data_point_id, report_data, report_id))
+        else:
+            result.qa_report_id = report_id
+            posted.append(result)
+
+    # Older reports of the data points in the outbox must not override the ones just posted.
+    await database_engine.delete_entities_async(
+        database_tables.QaReportOutbox, "data_point_id", [result.data_point_id for result in posted]
+    )
+    await store_in_outbox(failed)
+    return posted
+
+
+async def retry_failed_reports(limit: int = conf.qa_report_retry_batch_size) -> int:
+    """Post the reports of the outbox that are due again, and store the report IDs of the ones that succeed.
+
+    Reports are retried in the order they are due, so reports that keep failing wait longer and longer and do not
+    hold back newer ones. Only one replica retries at a time, the others skip the outbox.
+
+    Returns:
+        The number of reports posted.
+    """
+    try:
+        connection = await asyncio.to_thread(database_engine.try_advisory_lock, OUTBOX_LOCK)
+    except SQLAlchemyError as e:
+        logger.exception("Error acquiring advisory lock %s", OUTBOX_LOCK, exc_info=e)
+        return 0
+    if connection is None:
+        return 0
+    try:
+        outbox = database_tables.QaReportOutbox
+        entries = await database_engine.list_entities_async(
+            outbox,
+            "next_attempt_at",
+            limit,
+            outbox.status == "pending",
+            outbox.next_attempt_at <= int(time.time()),
+        )
+        if not entries:
+            return 0
+        logger.info("Retrying %d QA reports from the outbox.", len(entries))
+        reports = {entry.data_point_id: json.loads(entry.report_data) for entry in entries}
+        report_ids = await _post_all(reports)
+
+        posted = {
+            data_point_id: report_id
+            for data_point_id, report_id in report_ids.items()
+            if not isinstance(report_id, Exception)
+        }
+        await store_in_outbox(
+            [
+                to_outbox_row(entry.data_point_id, reports[entry.data_point_id], report_ids[entry.data_point_id], entry)
+                for entry in entries
+                if entry.data_point_id not in posted
+            ]
+        )
+        await _store_report_ids(posted)
+        return len(posted)
+    finally:
+        await asyncio.to_thread(database_engine.release_advisory_lock, connection, OUTBOX_LOCK)
+
+
+async def _post_all(reports: dict[str, dict]) -> dict[str, str | Exception | None]:
+    """Post the reports by data point ID, at most qa_report_max_concurrent_posts at a time.
+
+    Returns:
+        The ID of each posted report, or the error it failed with.
+    """
+    slots = asyncio.Semaphore(conf.qa_report_max_concurrent_posts)
+
+    async def post(data_point_id: str, report_data: dict) -> str | None:
+        async with slots:
+            qa_report = await dataland.post_qa_report(data_point_id, report_data)
+            return qa_report.qa_report_id
+
+    outcomes = await asyncio.gather(*starmap(post, reports.items()), return_exceptions=True)
+    for data_point_id, outcome in zip(reports, outcomes, strict=True):
+        if isinstance(outcome, Exception):
+            logger.warning("Posting the QA report of data point ID: %s failed: %s", data_point_id, outcome)
+    return dict(zip(reports, outcomes, strict=True))
+
+
+def to_outbox_row(
+    data_point_id: str,
+    report_data: dict,
+    error: BaseException,
+    entry: database_tables.QaReportOutbox | None = None,
+) -> dict:
+    """Return the qa_report_outbox row of a report that failed, counting the attempts of an earlier entry.
+
+    The report is retried after a delay growing with its attempts, and given up on once they run out.
+    """
+    now = int(time.time())
+    attempts = (entry.attempts if entry else 0) + 1
+    dead = attempts >= conf.qa_report_max_attempts
+    if dead:
+        logger.error("Giving up on the QA report of data point ID: %s after %d attempts.", data_point_id, attempts)
+    return {
+        "data_point_id": data_point_id,
+        "report_data": json.dumps(report_data),
+        "attempts": attempts,
+        "last_error": str(error),
+        "created_at": entry.created_at if entry else now,
+        "status": "dead" if dead else "pending",
+        "next_attempt_at": now + int(conf.qa_report_retry_delay_seconds) * attempts,
+    }
+
+
+async def store_in_outbox(rows: list[dict]) -> None:
+    """Store the failed reports in the outbox, replacing earlier reports of the same data points."""
+    if not rows:
+        return
+    logger.warning("Keeping %d QA reports in the outbox to retry them later.", len(rows))
+    await database_engine.upsert_entities_async(
+        database_tables.QaReportOutbox, rows, conflict_columns=["data_point_id"]
+    )
+
+
+async def _store_report_ids(report_ids: dict[str, str | None]) -> None:
+    """Store the report IDs of retried reports with the validation results and remove them from the outbox."""
+    if not report_ids:
+        return
+    rows = await database_engine.get_entities_async(
+        database_tables.ValidatedDataPoint, "data_point_id", list(report_ids)
+    )
+    results = [db.to_validation_result(row) for row in rows]
+    results = [result for result in results if isinstance(result, models.ValidatedDatapoint)]
+    for result in results:
+        result.qa_report_id = report_ids[result.data_point_id]
+    await db.store_data_points_in_db(results)
+    await database_engine.delete_entities_async(database_tables.QaReportOutbox, "data_point_id", list(report_ids))
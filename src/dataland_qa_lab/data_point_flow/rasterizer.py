@@ -0,0 +1,104 @@
+import asyncio
+import base64
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import cache
+from io import BytesIO
+from multiprocessing import shared_memory
+from typing import Any
+
+from dataland_qa_lab.data_point_flow import pdf_handler
+from dataland_qa_lab.utils import config
+
+logger = logging.getLogger(__name__)
+conf = config.get_config()
+
+
+@cache
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the process pool rendering pages, sized to the number of cores unless configured otherwise."""
+    max_workers = conf.vision_render_workers or os.cpu_count() or 1
+    logger.info("Starting process pool with %d workers for page rendering.", max_workers)
+    # Workers are spawned instead of forked, as forking a process running several threads is unsafe.
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown_process_pool() -> None:
+    """Shut down the process pool, if it was started."""
+    if get_process_pool.cache_info().currsize:
+        get_process_pool().shutdown(cancel_futures=True)
+        get_process_pool.cache_clear()
+
+
+async def render_page_images(document: BytesIO, **render_options: Any) -> list[str]:  # noqa: ANN401
+    """Render the PDF to base64-encoded images on the configured backend.
+
+    The thread backend renders on the default executor. The process backend renders in a pool of worker
+    processes, which hand the encoded images back through shared memory instead of pickling them.
+
+    Args:
+        document: The PDF to render.
+        render_options: The keyword arguments of pdf_handler.render_pdf_to_encoded_images.
+
+    Returns:
+        The base64-encoded image of each page.
+    """
+    if conf.vision_render_backend == "process":
+        render = get_process_pool().submit(_render_in_process, document.getvalue(), render_options)
+        try:
+            blocks = await asyncio.wrap_future(render)
+        except asyncio.CancelledError:
+            # Renders that have started run to completion, so their shared memory is freed once they finish.
+            render.add_done_callback(_free_abandoned_render)
+            raise
+        return _read_all_shared_memory(blocks)
+
+    images = await asyncio.to_thread(pdf_handler.render_pdf_to_encoded_images, document, **render_options)
+    return [base64.b64encode(image.data).decode("ascii") for image in images]
+
+
+def _render_in_process(pdf_bytes: bytes, render_options: dict[str, Any]) -> list[tuple[str, int]]:
+    """Entry point of the worker processes, which only accept picklable positional arguments."""
+    return pdf_handler.render_pdf_to_shared_memory(pdf_bytes, **render_options)
+
+
+def _read_all_shared_memory(blocks: list[tuple[str, int]]) -> list[str]:
+    """Base64-encode the images in the shared memory blocks, freeing every block even if reading one fails."""
+    images = []
+    try:
+        for name, size in blocks:
+            images.append(_read_shared_memory(name, size))
+    finally:
+        # The block that failed, if any, has been freed by _read_shared_memory already.
+        _free_shared_memory(blocks[len(images) + 1 :])
+    return images
+
+
+def _free_abandoned_render(render: Future[list[tuple[str, int]]]) -> None:
+    """Free the shared memory of a render whose caller was cancelled."""
+    if not render.cancelled() and render.exception() is None:
+        _free_shared_memory(render.result())
+
+
+def _free_shared_memory(blocks: list[tuple[str, int]]) -> None:
+    """Unlink the shared memory blocks, skipping the ones that are gone already."""
+    for name, _ in blocks:
+        try:
+            block = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        block.close()
+        block.unlink()
+
+
+def _read_shared_memory(name: str, size: int) -> str:
+    """Base64-encode the image in the shared memory block directly from the mapped buffer and free the block."""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        with block.buf[:size] as data:
+            return base64.b64encode(data).decode("ascii")
+    finally:
+        block.close()
+        block.unlink()
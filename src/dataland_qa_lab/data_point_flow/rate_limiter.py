@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from dataland_qa_lab.utils import config
+
+logger = logging.getLogger(__name__)
+conf = config.get_config()
+
+
+class TokenBucket:
+    """Bucket refilling continuously up to its capacity, from which callers reserve amounts ahead of time.
+
+    Reservations may overdraw the bucket. The caller then waits until the bucket has refilled the overdrawn amount,
+    so concurrent callers are served in the order of their reservations.
+
+    Attributes:
+        capacity (float): The maximum level of the bucket.
+        refill_per_second (float): The amount added to the bucket per second.
+    """
+
+    capacity: float
+    refill_per_second: float
+
+    def __init__(self, capacity: float, refill_per_second: float) -> None:
+        """Create a new, full bucket."""
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self._updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """Add the amount refilled since the last update."""
+        if now > self._updated_at:
+            self.level = min(self.capacity, self.level + (now - self._updated_at) * self.refill_per_second)
+            self._updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take the amount from the bucket and return the seconds to wait until it is covered."""
+        self.refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.refill_per_second)
+
+    def saturation(self, now: float) -> float:
+        """Return how much of the capacity is used, from 0 for a full bucket to 1 for an empty or overdrawn one."""
+        self.refill(now)
+        return min(1.0, max(0.0, 1 - self.level / self.capacity))
+
+
+class RateLimiter:
+    """Requests and tokens per minute budgets per deployment, shared by all event loops of the process.
+
+    Attributes:
+        requests_per_minute (int): The requests allowed per deployment and minute.
+        tokens_per_minute (int): The tokens allowed per deployment and minute.
+    """
+
+    requests_per_minute: int
+    tokens_per_minute: int
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        """Create a new rate limiter with the given per deployment limits."""
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._buckets: dict[str, tuple[TokenBucket, TokenBucket]] = {}
+        self._paused_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def acquire(self, deployment: str, tokens: int) -> None:
+        """Reserve one request and the tokens for the deployment, waiting until the budget covers them."""
+        with self._lock:
+            now = time.monotonic()
+            requests_bucket, tokens_bucket = self._get_buckets(deployment)
+            wait = max(
+                requests_bucket.reserve(1, now),
+                tokens_bucket.reserve(tokens, now),
+                self._paused_until.get(deployment, now) - now,
+            )
+        if wait > 0:
+            logger.debug("Rate limit of %s reached, waiting %.2fs.", deployment, wait)
+            await asyncio.sleep(wait)
+
+    def pause(self, deployment: str, seconds: float) -> None:
+        """Hold back all requests to the deployment for the given time, e.g. as requested by a retry-after header."""
+        with self._lock:
+            paused_until = time.monotonic() + seconds
+            self._paused_until[deployment] = max(self._paused_until.get(deployment, 0.0), paused_until)
+        logger.info("Pausing requests to %s for %.2fs.", deployment, seconds)
+
+    def saturation(self, deployment: str) -> float:
+        """Return how much of the budget of the deployment is used, from 0 for idle to 1 for exhausted or paused."""
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until.get(deployment, 0.0) > now:
+                return 1.0
+            requests_bucket, tokens_bucket = self._get_buckets(deployment)
+            return max(requests_bucket.saturation(now), tokens_bucket.saturation(now))
+
+    async def wait_for_capacity(self, deployment: str, max_saturation: float, poll_interval: float = 1.0) -> None:
+        """Wait until the saturation of the deployment drops to the given level, to slow down intake of new work."""
+        # Saturation recovers with the passing of time, not through an event that could be awaited.
+        while self.saturation(deployment) > max_saturation:  # noqa: ASYNC110
+            await asyncio.sleep(poll_interval)
+
+    def _get_buckets(self, deployment: str) -> tuple[TokenBucket, TokenBucket]:
+        """Return the request and token buckets of the deployment. Must be called with the lock held."""
+        buckets = self._buckets.get(deployment)
+        if buckets is None:
+            buckets = (
+                TokenBucket(self.requests_per_minute, self.requests_per_minute / 60),
+                TokenBucket(self.tokens_per_minute, self.tokens_per_minute / 60),
+            )
+            self._buckets[deployment] = buckets
+        return buckets
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """Return the seconds to wait as requested by the retry-after headers of a failed API call, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header, seconds_per_unit in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * seconds_per_unit
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Return a random delay before the retry after the given attempt, growing exponentially up to the cap."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+limiter = RateLimiter(requests_per_minute=conf.ai_requests_per_minute, tokens_per_minute=conf.ai_tokens_per_minute)
@@ -6,16 +6,21 @@ from dataclasses import asdict
 from io import BytesIO
 from types import SimpleNamespace
 
-from dataland_qa_lab.data_point_flow import ai, dataland, db, models, ocr, pdf_handler, prompts
-from dataland_qa_lab.utils import image_helper
+from dataland_qa_lab.data_point_flow import ai, dataland, db, models, ocr, page_images, prompts, qa_reports
+from dataland_qa_lab.data_point_flow.prompts import format_template
+from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
-validation_prompts = prompts.get_prompts()
+conf = config.get_config()
+
+_validations: SingleFlight[models.CannotValidateDatapoint | models.ValidatedDatapoint] = SingleFlight()
 
 
 def build_prompt_text(prompt_template: str, context: str, depends_on: str, data_point: models.DataPoint) -> str:
     """Returns the formatted prompt text."""
-    return prompt_template.format(
+    return format_template(
+        prompt_template,
         context=context,
         depends_on=depends_on,
         data_point_id=data_point.data_point_id,
@@ -59,13 +64,11 @@ async def run_vision_validation(
     data_point: models.DataPoint, document: BytesIO, prompt: models.DataPointPrompt, depends_on: str, ai_model: str
 ) -> tuple[models.AIResponse, str]:
     """Run Vision AI validation on the given data point."""
-    images = await asyncio.to_thread(pdf_handler.render_pdf_to_image, document)
-    if not images:
+    encoded_images = await page_images.get_page_images(data_point.file_reference, data_point.page, document)
+    if not encoded_images:
         msg = "No images rendered from PDF"
         raise RuntimeError(msg)
 
-    encoded_images = [image_helper.encode_image_to_base64(img) for img in images]
-
     prompt_text = build_prompt_text(
         prompt.prompt,
         context="{Please analyze the attached image of the report page}.",
@@ -78,6 +81,7 @@ async def run_vision_validation(
         previous_answer=data_point.value,
         ai_model=ai_model,
         images=encoded_images,
+        image_format=conf.vision_image_format,
     ), prompt_text
 
 
@@ -106,41 +110,116 @@ async def store_failure(  # noqa: PLR0913, PLR0917
 
 
 async def fetch_dependency_datapoints(dataset_id: str, depends_on: list, use_ocr: bool, ai_model: str) -> str:
-    """Fetch dependency datapoint - to be implemented."""
-    additional_context = ""
+    """Validate the dependency datapoints concurrently and return their results as additional context."""
     data_points = await dataland.get_contained_data_points(dataset_id)
+    dependencies = [(i, data_points[i]) for i in depends_on if data_points.get(i)]
 
-    for i in depends_on:
-        datapoint_id = data_points.get(i)
-        if datapoint_id:
-            additional_context += f"This is the validated output for the data point of type {i}:\n"
-            additional_context += json.dumps(
-                asdict(
-                    await validate_datapoint(
-                        data_point_id=datapoint_id,
-                        use_ocr=use_ocr,
-                        ai_model=ai_model,
-                        override=False,
-                        dataset_id=dataset_id,
-                    )
-                )
+    results = await asyncio.gather(
+        *[
+            validate_datapoint(
+                data_point_id=datapoint_id,
+                use_ocr=use_ocr,
+                ai_model=ai_model,
+                override=False,
+                dataset_id=dataset_id,
             )
-            additional_context += "\n"
+            for _, datapoint_id in dependencies
+        ]
+    )
+
+    return build_dependency_context([(i, result) for (i, _), result in zip(dependencies, results, strict=True)])
+
+
+def build_dependency_context(
+    dependency_results: list[tuple[str, models.CannotValidateDatapoint | models.ValidatedDatapoint]],
+) -> str:
+    """Return the validated outputs of the dependencies as additional context for the prompt."""
+    additional_context = ""
+    for i, result in dependency_results:
+        additional_context += f"This is the validated output for the data point of type {i}:\n"
+        additional_context += json.dumps(asdict(result))
+        additional_context += "\n"
 
     return additional_context
 
 
-async def validate_datapoint(
-    data_point_id: str, use_ocr: bool, ai_model: str, override: bool, dataset_id: str | None = None
+async def get_dependency_context(  # noqa: PLR0913, PLR0917
+    data_point_type: str,
+    depends_on: list[str],
+    dataset_id: str | None,
+    use_ocr: bool,
+    ai_model: str,
+    dependency_results: dict[str, models.CannotValidateDatapoint | models.ValidatedDatapoint] | None,
+) -> str:
+    """Return the validated outputs of the dependencies, validating them first unless their results are given."""
+    if not depends_on:
+        return ""
+    if dependency_results is not None:
+        return build_dependency_context(
+            [
+                (dependency_type, dependency_results[dependency_type])
+                for dependency_type in depends_on
+                if dependency_type in dependency_results
+            ]
+        )
+    if not dataset_id:
+        return ""
+
+    dependency_types = []
+    for dependency_type in depends_on:
+        # Validations of the same data point are shared, so waiting on a circular dependency would never return.
+        if prompts.is_circular_dependency(data_point_type, dependency_type):
+            logger.warning("Skipping circular dependency %s of %s.", dependency_type, data_point_type)
+        else:
+            dependency_types.append(dependency_type)
+    return await fetch_dependency_datapoints(dataset_id, dependency_types, use_ocr, ai_model)
+
+
+async def validate_datapoint(  # noqa: PLR0913, PLR0917
+    data_point_id: str,
+    use_ocr: bool,
+    ai_model: str,
+    override: bool,
+    dataset_id: str | None = None,
+    dependency_results: dict[str, models.CannotValidateDatapoint | models.ValidatedDatapoint] | None = None,
+    skip_existing_check: bool = False,
+) -> models.CannotValidateDatapoint | models.ValidatedDatapoint:
+    """Validate a single data point, or join the validation already running for the same arguments.
+
+    If dependency_results is given, it must hold the results of the data point's dependencies by data point type,
+    which are then used as context instead of validating the dependencies again. If skip_existing_check is set,
+    the caller has looked up the existing validations already, e.g. of a whole dataset in one query.
+    """
+    return await _validations.run(
+        (data_point_id, use_ocr, ai_model, override, dataset_id),
+        _validate_datapoint,
+        data_point_id=data_point_id,
+        use_ocr=use_ocr,
+        ai_model=ai_model,
+        override=override,
+        dataset_id=dataset_id,
+        dependency_results=dependency_results,
+        skip_existing_check=skip_existing_check,
+    )
+
+
+async def _validate_datapoint(  # noqa: PLR0913, PLR0917
+    data_point_id: str,
+    use_ocr: bool,
+    ai_model: str,
+    override: bool,
+    dataset_id: str | None = None,
+    dependency_results: dict[str, models.CannotValidateDatapoint | models.ValidatedDatapoint] | None = None,
+    skip_existing_check: bool = False,
 ) -> models.CannotValidateDatapoint | models.ValidatedDatapoint:
     """Validate a single data point."""
     logger.info("Validating datapoint %s", data_point_id)
 
-    existing = await db.check_if_already_validated(data_point_id)
-    if existing and not override:
-        return existing
-    if existing and override:
-        await db.delete_existing_entry(data_point_id)
+    # With override, the existing result is replaced by the upsert of the new one.
+    if not override and not skip_existing_check:
+        existing = await db.check_if_already_validated(data_point_id)
+        if existing:
+            return existing
 
     try:
         data_point = await dataland.get_data_point(data_point_id)
@@ -163,9 +242,9 @@ async def validate_datapoint(
             override=override,
         )
 
-    depends_on = ""
-    if prompt.depends_on and dataset_id:
-        depends_on = await fetch_dependency_datapoints(dataset_id, prompt.depends_on, use_ocr, ai_model)
+    depends_on = await get_dependency_context(
+        data_point.data_point_type, prompt.depends_on, dataset_id, use_ocr, ai_model, dependency_results
+    )
 
     document = await dataland.get_document(
         reference_id=data_point.file_reference,
@@ -187,19 +266,6 @@ async def validate_datapoint(
             override=override,
         )
 
-    qa_report_id = None
-    try:
-        qa_report = await dataland.override_dataland_qa(
-            data_point_id=data_point.data_point_id,
-            comment="Reviewed by QaLab: " + ai_response.reasoning,
-            qa_status=ai_response.qa_status,
-            predicted_answer=ai_response.predicted_answer,
-            data_source=data_point.data_source,
-        )
-        qa_report_id = qa_report.qa_report_id
-    except Exception:  # noqa: BLE001
-        pass
-
     res = models.ValidatedDatapoint(
         data_point_id=data_point.data_point_id,
         data_point_type=data_point.data_point_type,
@@ -214,9 +280,18 @@ async def validate_datapoint(
         file_reference=data_point.file_reference,
         page=data_point.page,
         override=override,
-        qa_report_id=qa_report_id,
+        qa_report_id=None,
         _prompt=prompt_text,
         timestamp=int(time.time()),
     )
+    await qa_reports.submit(
+        res,
+        dataland.build_qa_report_data(
+            comment="Reviewed by QaLab: " + ai_response.reasoning,
+            qa_status=ai_response.qa_status,
+            predicted_answer=ai_response.predicted_answer,
+            data_source=data_point.data_source,
+        ),
+    )
     await db.store_data_point_in_db(res)
     return res
@@ -1,42 +1,35 @@
 import asyncio
 import logging
+import os
+import socket
+import threading
 import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
 
-from dataland_qa.models.qa_status import QaStatus
-
-from dataland_qa_lab.data_point_flow import review
+from dataland_qa_lab.data_point_flow import db, qa_reports, rate_limiter, review, work_queue
 from dataland_qa_lab.database import database_engine, database_tables
+from dataland_qa_lab.dataland import unreviewed_datasets
 from dataland_qa_lab.utils import config, slack
 
 logger = logging.getLogger(__name__)
 config = config.get_config()
-lock_ttl_seconds = 15 * 60
+lock_ttl_seconds = config.datapoint_lock_ttl_seconds
 validation_timeout_seconds = 5 * 60
+DATA_TYPES = ["sfdr"]
+# Identifies the locks held by this process, which it alone extends and releases.
+worker_id = f"{socket.gethostname()}:{os.getpid()}"
+_stop_workers = threading.Event()
 
 
-def try_acquire_lock(data_point_id: str) -> bool:
-    """Returns True if the lock was acquired, False if datapoint should be skipped."""
-    existing_lock = database_engine.get_entity(
-        entity_class=database_tables.DatapointInReview,
-        data_point_id=data_point_id,
-    )
-
-    if existing_lock:
-        age = int(time.time()) - existing_lock.locked_at
-        if age < lock_ttl_seconds:
-            logger.info("Datapoint %s is already in review (age=%ss). Skipping.", data_point_id, age)
-            return False
-
-        logger.warning("Datapoint %s lock is stale (age=%ss). Proceeding to review.", data_point_id, age)
-
-    acquired = database_engine.acquire_or_refresh_datapoint_lock(
-        data_point_id=data_point_id, lock_ttl_seconds=lock_ttl_seconds
+def acquire_locks(data_point_ids: list[str]) -> set[str]:
+    """Acquires the review locks of the datapoints at once. Returns the IDs of the datapoints that may be reviewed."""
+    acquired = database_engine.acquire_datapoint_locks(
+        data_point_ids, lock_ttl_seconds=lock_ttl_seconds, locked_by=worker_id
     )
-    if not acquired:
-        logger.info("Datapoint %s already being processed. Skipping.", data_point_id)
-        return False
-
-    return True
+    if skipped := len(set(data_point_ids) - acquired):
+        logger.info("%d datapoints are already in review. Skipping them.", skipped)
+    return acquired
 
 
 def bucket_validator_result(
@@ -58,82 +51,286 @@ def bucket_validator_result(
         not_attempted.append(validator_result.data_point_id)
 
 
-def run_scheduled_processing() -> None:
-    """Continuously processes unreviewed datasets at scheduled intervals."""
-    logger.info("Scheduled processing started.")
+def release_locks(data_point_ids: list[str]) -> None:
+    """Releases the review locks of the datapoints at once."""
+    if not database_engine.release_datapoint_locks(data_point_ids, locked_by=worker_id):
+        logger.warning(
+            "Failed to release the locks of %d datapoints. They may remain until TTL expires (%s seconds).",
+            len(data_point_ids),
+            lock_ttl_seconds,
+        )
 
-    number_of_pending_datasets = config.dataland_client.qa_api.get_number_of_pending_datasets()
 
-    unreviewed_datasets = config.dataland_client.qa_api.get_info_on_datasets(
-        qa_status=QaStatus.PENDING, chunk_size=number_of_pending_datasets, data_types=["sfdr"]
-    )
+async def extend_locks_periodically(data_point_ids: list[str], lease: work_queue.Lease | None = None) -> None:
+    """Extends the held review locks of the datapoints and the lease of their dataset at every heartbeat.
+
+    This way, the locks outlive the lock TTL and the lease outlives the visibility timeout of the work queue.
+    """
+    while data_point_ids or lease is not None:
+        await asyncio.sleep(config.datapoint_lock_heartbeat_seconds)
+        if lease is not None and not await asyncio.to_thread(work_queue.extend_lease, work_queue.DATASET, lease):
+            logger.warning("Lost the lease of dataset ID: %s, which may be processed twice.", lease.item_id)
+            lease = None
+        if not data_point_ids:
+            continue
+        extended = await asyncio.to_thread(database_engine.extend_datapoint_locks, data_point_ids, worker_id)
+        if extended is None:
+            continue
+        if lost := set(data_point_ids) - extended:
+            logger.warning("Lost the locks of %d datapoints, which may be reviewed twice: %s", len(lost), sorted(lost))
+            data_point_ids = [data_point_id for data_point_id in data_point_ids if data_point_id in extended]
+
+
+@asynccontextmanager
+async def hold_locks(data_point_ids: list[str], lease: work_queue.Lease | None = None) -> AsyncIterator[list[str]]:
+    """Acquires the review locks of the datapoints, keeps them alive while the block runs and releases them after.
 
-    dataset_ids = [i.data_id for i in unreviewed_datasets]
+    The lease of the dataset, if given, is kept alive on the same heartbeat.
 
-    if len(unreviewed_datasets) > 0:
-        logger.info("Found %d unreviewed datasets. Starting processing.", len(unreviewed_datasets))
+    Yields:
+        The IDs of the datapoints whose lock was acquired, in the given order.
+    """
+    acquired = await asyncio.to_thread(acquire_locks, data_point_ids)
+    locked_ids = [data_point_id for data_point_id in data_point_ids if data_point_id in acquired]
+    heartbeat = asyncio.create_task(extend_locks_periodically(locked_ids, lease))
+    try:
+        yield locked_ids
+    finally:
+        heartbeat.cancel()
+        with suppress(asyncio.CancelledError):
+            await heartbeat
+        await asyncio.to_thread(release_locks, locked_ids)
 
-    for dataset_id in reversed(dataset_ids):
-        start_time = int(time.time())
-        if database_engine.get_entity(database_tables.ReviewedDataset, data_id=dataset_id):
-            logger.info("Dataset ID: %s has already been processed. Skipping.", dataset_id)
+
+async def validate_data_point_in_pool(
+    data_point_id: str, data_point_slots: asyncio.Semaphore
+) -> review.models.ValidatedDatapoint | review.models.CannotValidateDatapoint:
+    """Validates a datapoint, whose review lock is held, once a worker slot is free."""
+    async with data_point_slots:
+        await rate_limiter.limiter.wait_for_capacity(config.ai_model, config.scheduler_max_ai_saturation)
+        try:
+            return await asyncio.wait_for(
+                review.validate_datapoint(
+                    data_point_id=data_point_id,
+                    ai_model=config.ai_model,
+                    use_ocr=config.use_ocr,
+                    override=False,
+                    skip_existing_check=True,
+                ),
+                timeout=validation_timeout_seconds,
+            )
+        except TimeoutError:
+            logger.warning(
+                "Validation timed out for datapoint ID: %s after %s seconds", data_point_id, validation_timeout_seconds
+            )
+            raise
+        except Exception:
+            logger.exception("Error occurred while validating datapoint ID: %s", data_point_id)
+            raise
+
+
+async def process_dataset(
+    dataset_id: str, data_point_slots: asyncio.Semaphore, lease: work_queue.Lease | None = None
+) -> None:
+    """Validates all datapoints of a dataset concurrently and records the dataset as reviewed.
+
+    The lease of the dataset in the work queue, if given, is extended while its datapoints are validated.
+    """
+    start_time = int(time.time())
+    if await asyncio.to_thread(database_engine.get_entity, database_tables.ReviewedDataset, data_id=dataset_id):
+        logger.info("Dataset ID: %s has already been processed. Skipping.", dataset_id)
+        return
+
+    logger.info("Processing dataset ID: %s", dataset_id)
+    data_points = await asyncio.to_thread(config.dataland_client.meta_api.get_contained_data_points, dataset_id)
+    data_point_ids = list(data_points.values())
+
+    existing = await db.get_validated_data_points(data_point_ids)
+    pending_ids = [data_point_id for data_point_id in data_point_ids if data_point_id not in existing]
+    if existing:
+        logger.info("Skipping %d already validated datapoints of dataset ID: %s", len(existing), dataset_id)
+
+    # The results are stored together with the IDs of their QA reports once these have been posted, so that a
+    # result is never stored without its report being posted or kept in the outbox.
+    async with hold_locks(pending_ids, lease) as locked_ids, db.batched_writes(), qa_reports.batched_reports():
+        # Another replica may have validated some datapoints between the lookup above and taking their locks.
+        existing.update(await db.get_validated_data_points(locked_ids))
+        to_validate = [data_point_id for data_point_id in locked_ids if data_point_id not in existing]
+        locked_outcomes = await asyncio.gather(
+            *(validate_data_point_in_pool(v, data_point_slots) for v in to_validate), return_exceptions=True
+        )
+    # Datapoints locked elsewhere have no outcome and are left out of the summary.
+    outcomes_by_id = {**existing, **dict(zip(to_validate, locked_outcomes, strict=True))}
+    outcomes = [outcomes_by_id.get(data_point_id) for data_point_id in data_point_ids]
+
+    accepted_ids = []
+    rejected_ids = []
+    inconclusive = []
+    not_attempted = []
+
+    for data_point_id, outcome in zip(data_point_ids, outcomes, strict=True):
+        if outcome is None:
+            continue
+        if isinstance(outcome, BaseException):
+            not_attempted.append(data_point_id)
             continue
+        bucket_validator_result(outcome, accepted_ids, rejected_ids, inconclusive, not_attempted)
+
+    await asyncio.to_thread(
+        database_engine.add_entity,
+        database_tables.ReviewedDataset(
+            data_id=dataset_id,
+            review_start_time=str(start_time),
+            review_end_time=str(time.time()),
+            review_completed=True,
+            report_id=None,
+        ),
+    )
+
+    await asyncio.to_thread(
+        slack.send_slack_message,
+        f"Dataset ID: {dataset_id} processed. ✅ Accepted: {len(accepted_ids)}, ❌ Rejected: {len(rejected_ids)}, ⚠️ Inconclusive: {len(inconclusive)}, ⚠️ Not validated: {len(not_attempted)}",  # noqa: E501
+    )
+
+
+async def process_work_queue(stop: threading.Event | None = None) -> None:
+    """Processes the queued datasets on a bounded pool of dataset and datapoint workers.
+
+    Args:
+        stop: Keeps the workers polling for new datasets, and retrying the QA reports of the outbox, until the
+            event is set. Without it, they return as soon as no dataset can be leased anymore.
+
+    Raises:
+        Exception: The first error a dataset failed with, once the queue is drained. Only raised without stop.
+    """
+    data_point_slots = asyncio.Semaphore(config.scheduler_max_concurrent_data_points)
+    # Long-running workers only log the errors, which would otherwise pile up until the workers are stopped.
+    failures: list[Exception] | None = [] if stop is None else None
+    workers = [run_worker(data_point_slots, failures, stop) for _ in range(config.scheduler_max_concurrent_datasets)]
+
+    try:
+        if stop is None:
+            await qa_reports.retry_failed_reports()
+        else:
+            workers.append(retry_reports_periodically(stop))
+        await asyncio.gather(*workers)
+    finally:
+        # The event loop of this run is closed afterwards, together with the connections it opened.
+        await database_engine.dispose_async_engine()
+
+    if failures:
+        raise failures[0]
 
-        logger.info("Processing dataset ID: %s", dataset_id)
-        data_points = config.dataland_client.meta_api.get_contained_data_points(dataset_id)
 
-        accepted_ids = []
-        rejected_ids = []
-        inconclusive = []
-        not_attempted = []
+async def run_worker(
+    data_point_slots: asyncio.Semaphore, failures: list[Exception] | None, stop: threading.Event | None = None
+) -> None:
+    """Leases and processes queued datasets one at a time, until the queue is drained or stop is set.
 
-        for _k, v in data_points.items():  # noqa: PERF102
-            if not try_acquire_lock(v):
+    With stop, unexpected errors are logged and the worker carries on after the poll interval, as nothing would
+    restart it.
+    """
+    while stop is None or not stop.is_set():
+        try:
+            leases = await asyncio.to_thread(work_queue.lease, work_queue.DATASET)
+            if leases:
+                await process_leased_dataset(leases[0], data_point_slots, failures)
                 continue
+        except Exception:
+            if stop is None:
+                raise
+            logger.exception("Unexpected error in a work queue worker.")
+        if stop is None:
+            return
+        await asyncio.sleep(config.work_queue_poll_interval_seconds)
+
+
+async def process_leased_dataset(
+    lease: work_queue.Lease, data_point_slots: asyncio.Semaphore, failures: list[Exception] | None
+) -> None:
+    """Processes a leased dataset and completes it, or releases it for a later retry and records its error."""
+    try:
+        await process_dataset(lease.item_id, data_point_slots, lease)
+    except Exception as e:
+        logger.exception("Error occurred while processing dataset ID: %s", lease.item_id)
+        await asyncio.to_thread(work_queue.fail, work_queue.DATASET, lease, str(e))
+        if failures is not None:
+            failures.append(e)
+    else:
+        await asyncio.to_thread(work_queue.complete, work_queue.DATASET, lease)
 
+
+async def retry_reports_periodically(stop: threading.Event) -> None:
+    """Retries the QA reports of the outbox every qa_report_retry_interval_seconds, until stop is set."""
+    next_retry = 0.0
+    while not stop.is_set():
+        if time.monotonic() >= next_retry:
+            next_retry = time.monotonic() + config.qa_report_retry_interval_seconds
             try:
-                validator_result = asyncio.run(
-                    asyncio.wait_for(
-                        review.validate_datapoint(
-                            data_point_id=v,
-                            ai_model=config.ai_model,
-                            use_ocr=config.use_ocr,
-                            override=False,
-                        ),
-                        timeout=validation_timeout_seconds,
-                    )
-                )
-            except TimeoutError:
-                logger.warning(
-                    "Validation timed out for datapoint ID: %s after %s seconds", v, validation_timeout_seconds
-                )
-                not_attempted.append(v)
-                continue
+                await qa_reports.retry_failed_reports()
             except Exception:
-                logger.exception("Error occurred while validating datapoint ID: %s", v)
-                not_attempted.append(v)
-                continue
-            finally:
-                deleted = database_engine.delete_entity(entity_id=v, entity_class=database_tables.DatapointInReview)
-                if not deleted:
-                    logger.warning(
-                        "Failed to release lock for datapoint ID: %s. Lock may remain until TTL expires (%s seconds).",
-                        v,
-                        lock_ttl_seconds,
-                    )
-
-            bucket_validator_result(validator_result, accepted_ids, rejected_ids, inconclusive, not_attempted)
-
-        database_engine.add_entity(
-            database_tables.ReviewedDataset(
-                data_id=dataset_id,
-                review_start_time=str(start_time),
-                review_end_time=str(time.time()),
-                review_completed=True,
-                report_id=None,
-            )
-        )
+                logger.exception("Error occurred while retrying the QA reports of the outbox.")
+        # Waking up at the poll interval lets the workers be stopped without waiting for the retry interval.
+        await asyncio.sleep(config.work_queue_poll_interval_seconds)
 
-        slack.send_slack_message(
-            f"Dataset ID: {dataset_id} processed. ✅ Accepted: {len(accepted_ids)}, ❌ Rejected: {len(rejected_ids)}, ⚠️ Inconclusive: {len(inconclusive)}, ⚠️ Not validated: {len(not_attempted)}"  # noqa: E501
-        )
+
+def enqueue_pending_datasets() -> int:
+    """Adds the datasets that became pending since the last run to the work queue, one page at a time.
+
+    The pending datasets are listed newest first, so reading stops at the first dataset not newer than the high-water
+    mark of the last run. All pending datasets are read again once per discovery_full_scan_interval_seconds, to
+    catch datasets older than the high-water mark that were missing from the listing when it was set. Each dataset
+    is queued at most once, so datasets that are pending again after having been processed are not queued again.
+    If a page cannot be queued, the high-water mark is kept, so that the next run reads the page again.
+
+    Returns:
+        The number of datasets added to the work queue.
+    """
+    cursor_name = f"pending_datasets:{','.join(DATA_TYPES)}"
+    cursor = work_queue.get_discovery_cursor(cursor_name)
+    now = int(time.time())
+    full_scan = cursor is None or now - cursor.last_full_scan_at >= config.discovery_full_scan_interval_seconds
+    high_water_mark = None if full_scan else cursor.high_water_mark
+    newest = cursor.high_water_mark if cursor else None
+
+    number_of_pending_datasets = config.dataland_client.qa_api.get_number_of_pending_datasets()
+    queued = 0
+    for page in unreviewed_datasets.get_pending_dataset_pages(
+        config.dataland_client, DATA_TYPES, number_of_pending_datasets, config.discovery_page_size
+    ):
+        new_datasets = [d for d in page if high_water_mark is None or d.timestamp > high_water_mark]
+        added = work_queue.enqueue(work_queue.DATASET, [d.data_id for d in reversed(new_datasets)])
+        if added is None:
+            # The pages are read newest first, so advancing the high-water mark would skip this page for good.
+            logger.warning("Failed to queue pending datasets. Reading them again in the next run.")
+            return queued
+        queued += added
+        for dataset in new_datasets:
+            if newest is None or dataset.timestamp > newest:
+                newest = dataset.timestamp
+        if len(new_datasets) < len(page):
+            break
+
+    if queued:
+        logger.info("Added %d newly pending datasets to the work queue.", queued)
+    work_queue.save_discovery_cursor(cursor_name, newest, now if full_scan else cursor.last_full_scan_at)
+    return queued
+
+
+def run_scheduled_processing() -> None:
+    """Queues the unreviewed datasets and processes the work queue until it is drained."""
+    logger.info("Scheduled processing started.")
+    enqueue_pending_datasets()
+    asyncio.run(process_work_queue())
+
+
+def run_queue_workers() -> None:
+    """Processes queued datasets continuously, until stop_queue_workers is called."""
+    logger.info("Work queue workers started.")
+    _stop_workers.clear()
+    asyncio.run(process_work_queue(_stop_workers))
+
+
+def stop_queue_workers() -> None:
+    """Lets the workers of run_queue_workers return after the datasets they are processing."""
+    _stop_workers.set()
@@ -0,0 +1,225 @@
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from dataland_qa_lab.database import database_engine, database_tables
+from dataland_qa_lab.utils import config
+
+conf = config.get_config()
+
+
+logger = logging.getLogger(__name__)
+
+DATASET = "dataset"
+
+
+def enqueue(kind: str, item_ids: list[str]) -> int | None:
+    """Add the items of the given kind to the queue, skipping items that have been queued before.
+
+    Returns:
+        The number of items added, or None if they could not be added.
+    """
+    if not item_ids:
+        return 0
+    now = int(time.time())
+    session = database_engine.SessionLocal()
+    try:
+        result = session.execute(
+            insert(database_tables.WorkItem)
+            .values(
+                [
+                    {"kind": kind, "item_id": item_id, "status": "pending", "available_at": now, "created_at": now}
+                    for item_id in dict.fromkeys(item_ids)
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["kind", "item_id"])
+            .returning(database_tables.WorkItem.id)
+        )
+        added = len(result.all())
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.exception("Error enqueueing %s items", kind, exc_info=e)
+        return None
+    finally:
+        session.close()
+
+    logger.info("Queued %d of %d %s items.", added, len(item_ids), kind)
+    return added
+
+
+@dataclass(frozen=True)
+class Lease:
+    """A leased item, identified together with the token of its lease.
+
+    Attributes:
+        item_id (str): The ID of the leased item.
+        token (str): Identifies the lease, so that only its holder can extend, complete or fail it.
+    """
+
+    item_id: str
+    token: str
+
+
+def lease(kind: str, limit: int = 1) -> list[Lease]:
+    """Lease the next available items of the given kind for the visibility timeout.
+
+    Items leased by other workers are skipped rather than waited for. An item whose lease expires without being
+    completed or failed, e.g. because its worker crashed, becomes available again, until its attempts run out.
+    Expired items without attempts left are marked as failed.
+
+    Returns:
+        The leases of the items, at most limit.
+    """
+    now = int(time.time())
+    token = uuid.uuid4().hex
+    session = database_engine.SessionLocal()
+    try:
+        session.execute(
+            text(
+                """
+                UPDATE work_queue
+                   SET status = 'failed', lease_token = NULL,
+                       last_error = COALESCE(last_error, 'Lease expired after the last attempt')
+                 WHERE kind = :kind AND status = 'leased' AND available_at <= :now AND attempts >= :max_attempts
+                """
+            ),
+            {"kind": kind, "now": now, "max_attempts": conf.work_queue_max_attempts},
+        )
+        result = session.execute(
+            text(
+                """
+                WITH next_items AS (
+                    SELECT id FROM work_queue
+                    WHERE kind = :kind
+                      AND status IN ('pending', 'leased')
+                      AND available_at <= :now
+                      AND attempts < :max_attempts
+                    ORDER BY available_at, id
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE work_queue
+                   SET status = 'leased', attempts = work_queue.attempts + 1, available_at = :leased_until,
+                       lease_token = :token
+                  FROM next_items
+                 WHERE work_queue.id = next_items.id
+                RETURNING work_queue.item_id
+                """
+            ),
+            {
+                "kind": kind,
+                "now": now,
+                "max_attempts": conf.work_queue_max_attempts,
+                "limit": limit,
+                "leased_until": now + int(conf.work_queue_visibility_timeout_seconds),
+                "token": token,
+            },
+        )
+        item_ids = list(result.scalars().all())
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.exception("Error leasing %s items", kind, exc_info=e)
+        return []
+    finally:
+        session.close()
+    return [Lease(item_id=item_id, token=token) for item_id in item_ids]
+
+
+def extend_lease(kind: str, leased: Lease) -> bool:
+    """Extend the lease of the item by the visibility timeout, unless it has expired and been taken over.
+
+    Returns:
+        Whether the lease is still held.
+    """
+    return _finish(
+        """
+        UPDATE work_queue SET available_at = :leased_until
+         WHERE kind = :kind AND item_id = :item_id AND status = 'leased' AND lease_token = :token
+        """,
+        {
+            "kind": kind,
+            "item_id": leased.item_id,
+            "token": leased.token,
+            "leased_until": int(time.time()) + int(conf.work_queue_visibility_timeout_seconds),
+        },
+    )
+
+
+def complete(kind: str, leased: Lease) -> bool:
+    """Mark the leased item as done, so that it is neither leased nor queued again."""
+    return _finish(
+        """
+        UPDATE work_queue SET status = 'done', last_error = NULL, lease_token = NULL
+         WHERE kind = :kind AND item_id = :item_id AND status = 'leased' AND lease_token = :token
+        """,
+        {"kind": kind, "item_id": leased.item_id, "token": leased.token},
+    )
+
+
+def fail(kind: str, leased: Lease, error: str) -> bool:
+    """Release the leased item to be retried after a delay growing with its attempts, or give up on it for good."""
+    return _finish(
+        """
+        UPDATE work_queue
+           SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+               available_at = :now + :retry_delay * attempts,
+               last_error = :error,
+               lease_token = NULL
+         WHERE kind = :kind AND item_id = :item_id AND status = 'leased' AND lease_token = :token
+        """,
+        {
+            "kind": kind,
+            "item_id": leased.item_id,
+            "token": leased.token,
+            "error": error,
+            "now": int(time.time()),
+            "max_attempts": conf.work_queue_max_attempts,
+            "retry_delay": int(conf.work_queue_retry_delay_seconds),
+        },
+    )
+
+
+def get_discovery_cursor(name: str) -> database_tables.DiscoveryCursor | None:
+    """Return the cursor of the discovery with the given name, or None if it has not run yet."""
+    return database_engine.get_entity(database_tables.DiscoveryCursor, name=name)
+
+
+def save_discovery_cursor(name: str, high_water_mark: int | None, last_full_scan_at: int) -> bool:
+    """Store the newest dataset timestamp seen by the discovery and when it last read all pending datasets."""
+    return database_engine.upsert_entities(
+        database_tables.DiscoveryCursor,
+        [
+            {
+                "name": name,
+                "high_water_mark": high_water_mark,
+                "last_full_scan_at": last_full_scan_at,
+                "updated_at": int(time.time()),
+            }
+        ],
+        conflict_columns=["name"],
+    )
+
+
+def _finish(statement: str, params: dict) -> bool:
+    """Run the statement updating the lease of an item. Returns False if the lease is no longer held."""
+    session = database_engine.SessionLocal()
+    try:
+        updated = session.execute(text(statement), params).rowcount
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.exception("Error updating %s item %s in the work queue", params["kind"], params["item_id"], exc_info=e)
+        return False
+    finally:
+        session.close()
+    if not updated:
+        logger.warning("The lease of %s item %s has expired and been taken over.", params["kind"], params["item_id"])
+        return False
+    return True
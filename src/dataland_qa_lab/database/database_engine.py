@@ -1,23 +1,99 @@
+import asyncio
+import hashlib
 import logging
 import sys
+import threading
 import time
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import Any
 
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import (
+    ARRAY,
+    URL,
+    ColumnElement,
+    Connection,
+    Insert,
+    String,
+    bindparam,
+    create_engine,
+    delete,
+    inspect,
+    make_url,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from dataland_qa_lab.database.database_tables import Base
+from dataland_qa_lab.database.database_tables import Base, CachedDocument
 from dataland_qa_lab.utils import config
 
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = config.get_config().database_connection_string
+conf = config.get_config()
 
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = conf.database_connection_string
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=conf.database_pool_size,
+    max_overflow=conf.database_max_overflow,
+    pool_timeout=conf.database_pool_timeout_seconds,
+    pool_pre_ping=True,
+)
+
+# Advisory locks keep their connection checked out while the locked block runs, e.g. for a whole OCR job. They get
+# a small pool of their own, so that they cannot starve the other queries of connections.
+lock_engine = create_engine(DATABASE_URL, pool_size=conf.advisory_lock_max_held, max_overflow=0, pool_pre_ping=True)
+_held_advisory_locks = threading.BoundedSemaphore(conf.advisory_lock_max_held)
 
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 
+# asyncpg connections belong to the event loop that opened them. The server and every scheduler run have their own
+# loop, so each loop gets its own engine, which is dropped together with the loop.
+_async_engines: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncEngine] = weakref.WeakKeyDictionary()
+
+
+def get_async_database_url(database_url: str) -> URL:
+    """Return the connection URL for the asyncpg driver, based on the configured connection string."""
+    url = make_url(database_url).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(query=query)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Return the async engine of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    async_engine = _async_engines.get(loop)
+    if async_engine is None:
+        async_engine = create_async_engine(
+            get_async_database_url(DATABASE_URL),
+            pool_size=conf.database_pool_size,
+            max_overflow=conf.database_max_overflow,
+            pool_timeout=conf.database_pool_timeout_seconds,
+            pool_pre_ping=True,
+        )
+        _async_engines[loop] = async_engine
+    return async_engine
+
+
+def get_async_session() -> AsyncSession:
+    """Return a new async session bound to the engine of the running event loop."""
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+async def dispose_async_engine() -> None:
+    """Close the connections of the async engine of the running event loop, e.g. before the loop is closed."""
+    async_engine = _async_engines.pop(asyncio.get_running_loop(), None)
+    if async_engine is not None:
+        await async_engine.dispose()
+
 
 def verify_database_connection() -> None:
     """Verify the database connection. If failed, log critical error and exit."""
@@ -31,16 +107,61 @@ def verify_database_connection() -> None:
 
 
 def create_tables() -> bool:
-    """Create all tables."""
+    """Create all tables, and the columns and indexes added to existing tables since they were created."""
     try:
         Base.metadata.create_all(bind=engine)
         logger.info("Creating tables in database")
+        with engine.begin() as connection:
+            add_missing_columns(connection)
+            remove_duplicate_cached_documents(connection)
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(bind=connection, checkfirst=True)
     except Exception as e:
         logger.exception(msg="Error while creating tables in database", exc_info=e)
         return False
     return True
 
 
+def add_missing_columns(connection: Connection) -> None:
+    """Add the nullable columns that were added to the models of existing tables, e.g. datapoint_in_review.locked_by."""
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            logger.info("Adding column %s to table %s", column.name, table.name)
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(f"ALTER TABLE {quote(table.name)} ADD COLUMN IF NOT EXISTS {quote(column.name)} {column_type}")
+            )
+
+
+def remove_duplicate_cached_documents(connection: Connection) -> None:
+    """Keep only the oldest OCR output per page, so that the unique index on cached_documents can be created.
+
+    Once the index exists, there are no duplicates left and the table is not scanned again.
+    """
+    existing_indexes = {index["name"] for index in inspect(connection).get_indexes(CachedDocument.__tablename__)}
+    if "ux_cached_documents_file_reference_page" in existing_indexes:
+        return
+    result = connection.execute(
+        text(
+            """
+            DELETE FROM cached_documents AS duplicate
+            USING cached_documents AS original
+            WHERE duplicate.file_reference = original.file_reference
+              AND duplicate.page = original.page
+              AND duplicate.id > original.id
+            """
+        )
+    )
+    if result.rowcount:
+        logger.info("Removed %d duplicate cached documents.", result.rowcount)
+
+
 def add_entity(entity: Any) -> bool:  # noqa: ANN401
     """Generic method to add an entity to the database."""
     session = SessionLocal()
@@ -58,6 +179,38 @@ def add_entity(entity: Any) -> bool:  # noqa: ANN401
     return True
 
 
+def upsert_entities(entity_class: type[Any], rows: list[dict[str, Any]], conflict_columns: list[str]) -> bool:
+    """Generic method to insert rows, or update the existing rows with the same values in the conflict columns.
+
+    The conflict columns must be covered by a unique index or the primary key. All rows are written in one
+    statement and transaction.
+    """
+    if not rows:
+        return True
+
+    session = SessionLocal()
+    try:
+        session.execute(build_upsert(entity_class, rows, conflict_columns))
+        session.commit()
+    except SQLAlchemyError as e:
+        logger.exception(msg="Error while upserting entities to database", exc_info=e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+    return True
+
+
+def build_upsert(entity_class: type[Any], rows: list[dict[str, Any]], conflict_columns: list[str]) -> Insert:
+    """Return the statement inserting the rows and updating the other columns of rows that already exist."""
+    statement = insert(entity_class).values(rows)
+    update_columns = {column: statement.excluded[column] for column in rows[0] if column not in conflict_columns}
+    if not update_columns:
+        return statement.on_conflict_do_nothing(index_elements=conflict_columns)
+    return statement.on_conflict_do_update(index_elements=conflict_columns, set_=update_columns)
+
+
 def get_entity(entity_class: Any, **filters) -> Any:  # noqa: ANN003, ANN401
     """Generic method to get an entity from the database by its ID."""
     session = SessionLocal()
@@ -115,8 +268,18 @@ def delete_entity(entity_id: str, entity_class: type[Any]) -> bool:
     return True
 
 
-def acquire_or_refresh_datapoint_lock(data_point_id: str, lock_ttl_seconds: int) -> bool:
-    """Acquire or refresh a lock for a data point (atomic upsert)."""
+def acquire_datapoint_locks(data_point_ids: list[str], lock_ttl_seconds: int, locked_by: str) -> set[str]:
+    """Acquire the locks of all data points that are not locked or whose lock is stale, in one atomic upsert.
+
+    The locks are recorded as held by locked_by, so that only their owner extends and releases them.
+
+    Returns:
+        The IDs of the data points whose lock was acquired.
+    """
+    data_point_ids = list(dict.fromkeys(data_point_ids))
+    if not data_point_ids:
+        return set()
+
     session = SessionLocal()
     now_ts = int(time.time())
     stale_before = now_ts - lock_ttl_seconds
@@ -125,22 +288,276 @@ def acquire_or_refresh_datapoint_lock(data_point_id: str, lock_ttl_seconds: int)
         result = session.execute(
             text(
                 """
-                INSERT INTO datapoint_in_review (data_point_id, locked_at)
-                VALUES (:id, :now_ts)
+                INSERT INTO datapoint_in_review (data_point_id, locked_at, locked_by)
+                SELECT data_point_id, :now_ts, :locked_by FROM unnest(:ids) AS data_point_id
                 ON CONFLICT (data_point_id) DO UPDATE
-                  SET locked_at = EXCLUDED.locked_at
+                  SET locked_at = EXCLUDED.locked_at, locked_by = EXCLUDED.locked_by
                   WHERE datapoint_in_review.locked_at < :stale_before
                 RETURNING data_point_id
                 """
-            ),
-            {"id": data_point_id, "now_ts": now_ts, "stale_before": stale_before},
+            ).bindparams(bindparam("ids", type_=ARRAY(String))),
+            {"ids": data_point_ids, "now_ts": now_ts, "stale_before": stale_before, "locked_by": locked_by},
+        )
+        acquired = set(result.scalars().all())
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.exception("Error acquiring datapoint locks", exc_info=e)
+        return set()
+    finally:
+        session.close()
+    return acquired
+
+
+def extend_datapoint_locks(data_point_ids: list[str], locked_by: str) -> set[str] | None:
+    """Renew the locks that are still held by the given owner, in one statement.
+
+    Returns:
+        The IDs of the data points whose lock is still held, or None if the database could not be reached.
+    """
+    if not data_point_ids:
+        return set()
+
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            text(
+                """
+                UPDATE datapoint_in_review SET locked_at = :now_ts
+                WHERE data_point_id = ANY(:ids) AND locked_by = :locked_by
+                RETURNING data_point_id
+                """
+            ).bindparams(bindparam("ids", type_=ARRAY(String))),
+            {"ids": list(data_point_ids), "now_ts": int(time.time()), "locked_by": locked_by},
+        )
+        extended = set(result.scalars().all())
+        session.commit()
+    except SQLAlchemyError as e:
+        session.rollback()
+        logger.exception("Error extending datapoint locks", exc_info=e)
+        return None
+    finally:
+        session.close()
+    return extended
+
+
+def release_datapoint_locks(data_point_ids: list[str], locked_by: str) -> bool:
+    """Release the locks of the data points held by the given owner, in one statement."""
+    if not data_point_ids:
+        return True
+
+    session = SessionLocal()
+    try:
+        session.execute(
+            text(
+                "DELETE FROM datapoint_in_review WHERE data_point_id = ANY(:ids) AND locked_by = :locked_by"
+            ).bindparams(bindparam("ids", type_=ARRAY(String))),
+            {"ids": list(data_point_ids), "locked_by": locked_by},
         )
         session.commit()
     except SQLAlchemyError as e:
         session.rollback()
-        logger.exception("Error acquiring or refreshing datapoint lock", exc_info=e)
+        logger.exception("Error releasing datapoint locks", exc_info=e)
         return False
-    else:
-        return result.first() is not None
     finally:
         session.close()
+    return True
+
+
+def get_advisory_lock_key(name: str) -> int:
+    """Return the signed 64-bit key of the advisory lock with the given name."""
+    return int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+def try_advisory_lock(name: str) -> Connection | None:
+    """Try once to take the session-level advisory lock with the given name, without waiting.
+
+    At most advisory_lock_max_held locks are held by the process at once. Beyond that, the lock is not taken, as if
+    another session held it.
+
+    Returns:
+        The connection holding the lock, which must be passed to release_advisory_lock, or None if another
+        session holds the lock or too many locks are held already.
+
+    Raises:
+        SQLAlchemyError: If the lock cannot be requested.
+    """
+    if not _held_advisory_locks.acquire(blocking=False):
+        return None
+    acquired = False
+    try:
+        connection = lock_engine.connect()
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": get_advisory_lock_key(name)}
+            ).scalar()
+            connection.commit()
+        finally:
+            if not acquired:
+                connection.close()
+    finally:
+        if not acquired:
+            _held_advisory_locks.release()
+    return connection if acquired else None
+
+
+def release_advisory_lock(connection: Connection, name: str) -> None:
+    """Release the advisory lock held by the connection and return the connection to the pool."""
+    try:
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": get_advisory_lock_key(name)})
+        connection.commit()
+    except SQLAlchemyError as e:
+        logger.exception("Error releasing advisory lock %s, discarding its connection", name, exc_info=e)
+        # Ending the database session releases all of its advisory locks.
+        connection.invalidate()
+    finally:
+        connection.close()
+        _held_advisory_locks.release()
+
+
+@contextmanager
+def advisory_lock(name: str, timeout: float, poll_interval: float = 0.5) -> Iterator[bool]:
+    """Hold the advisory lock with the given name while the block runs, so that only one replica runs it at a time.
+
+    The lock is polled until the timeout expires. If it cannot be taken in time or the database fails, the
+    block runs without the lock, as duplicate work is preferable to no work.
+
+    Yields:
+        Whether the lock was acquired.
+    """
+    deadline = time.monotonic() + timeout
+    connection = None
+    try:
+        while (connection := try_advisory_lock(name)) is None and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+    except SQLAlchemyError as e:
+        logger.exception("Error acquiring advisory lock %s", name, exc_info=e)
+
+    if connection is None:
+        logger.warning("Proceeding without advisory lock %s.", name)
+    try:
+        yield connection is not None
+    finally:
+        if connection is not None:
+            release_advisory_lock(connection, name)
+
+
+async def add_entity_async(entity: Any) -> bool:  # noqa: ANN401
+    """Generic method to add an entity to the database, without blocking the event loop."""
+    async with get_async_session() as session:
+        try:
+            session.add(entity)
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error while adding entity to database", exc_info=e)
+            await session.rollback()
+            return False
+
+    return True
+
+
+async def get_entity_async(entity_class: Any, **filters) -> Any:  # noqa: ANN003, ANN401
+    """Generic method to get the first entity matching the filters, without blocking the event loop."""
+    async with get_async_session() as session:
+        try:
+            result = await session.execute(select(entity_class).filter_by(**filters).limit(1))
+            return result.scalars().first()
+        except SQLAlchemyError:
+            return None
+
+
+async def get_entities_async(entity_class: type[Any], column: str, values: list[Any]) -> list[Any]:
+    """Generic method to get all entities whose column has one of the values, in one query."""
+    if not values:
+        return []
+
+    async with get_async_session() as session:
+        try:
+            result = await session.execute(select(entity_class).where(getattr(entity_class, column).in_(values)))
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error while getting entities from database", exc_info=e)
+            return []
+
+
+async def list_entities_async(
+    entity_class: type[Any], order_by: str, limit: int, *where: ColumnElement[bool]
+) -> list[Any]:
+    """Generic method to get the first matching entities in the order of the column, without blocking the event loop."""
+    async with get_async_session() as session:
+        try:
+            result = await session.execute(
+                select(entity_class).where(*where).order_by(getattr(entity_class, order_by)).limit(limit)
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error while listing entities from database", exc_info=e)
+            return []
+
+
+async def update_entity_async(entity: Any) -> bool:  # noqa: ANN401
+    """Generic method to update an entity in the database, without blocking the event loop."""
+    async with get_async_session() as session:
+        try:
+            await session.merge(entity)
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error updating entity", exc_info=e)
+            await session.rollback()
+            return False
+
+    return True
+
+
+async def delete_entity_async(entity_id: str, entity_class: type[Any]) -> bool:
+    """Generic method to delete an entity from the database by its ID, without blocking the event loop."""
+    async with get_async_session() as session:
+        try:
+            entity = await session.get(entity_class, entity_id)
+            if entity is None:
+                logger.error(msg="Entity not found")
+                return False
+            await session.delete(entity)
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error deleting entity", exc_info=e)
+            await session.rollback()
+            return False
+
+    return True
+
+
+async def delete_entities_async(entity_class: type[Any], column: str, values: list[Any]) -> bool:
+    """Generic method to delete all entities whose column has one of the values, in one statement."""
+    if not values:
+        return True
+
+    async with get_async_session() as session:
+        try:
+            await session.execute(delete(entity_class).where(getattr(entity_class, column).in_(values)))
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error deleting entities", exc_info=e)
+            await session.rollback()
+            return False
+
+    return True
+
+
+async def upsert_entities_async(
+    entity_class: type[Any], rows: list[dict[str, Any]], conflict_columns: list[str]
+) -> bool:
+    """Like upsert_entities, but without blocking the event loop."""
+    if not rows:
+        return True
+
+    async with get_async_session() as session:
+        try:
+            await session.execute(build_upsert(entity_class, rows, conflict_columns))
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.exception(msg="Error while upserting entities to database", exc_info=e)
+            await session.rollback()
+            return False
+
+    return True
@@ -1,7 +1,7 @@
 import time
 from datetime import datetime
 
-from sqlalchemy import ARRAY, Boolean, Column, DateTime, Float, Integer, String
+from sqlalchemy import ARRAY, BigInteger, Boolean, Column, DateTime, Float, Index, Integer, String
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -35,6 +35,8 @@ class CachedDocument(Base):
     """Database entity for cached documents."""
 
     __tablename__ = "cached_documents"
+    # OCR output is looked up by page, and each page is stored only once.
+    __table_args__ = (Index("ux_cached_documents_file_reference_page", "file_reference", "page", unique=True),)
     id = Column("id", Integer, primary_key=True, autoincrement=True)
     file_name = Column("file_name", String, nullable=False)
     file_reference = Column("file_reference", String, nullable=False)
@@ -72,3 +74,49 @@ class DatapointInReview(Base):
     __tablename__ = "datapoint_in_review"
     data_point_id = Column("data_point_id", String, primary_key=True)
     locked_at = Column("locked_at", Integer, default=lambda: int(time.time()), nullable=False)
+    locked_by = Column("locked_by", String, nullable=True)
+
+
+class QaReportOutbox(Base):
+    """Database entity for QA reports whose posting to Dataland failed and is retried."""
+
+    __tablename__ = "qa_report_outbox"
+    __table_args__ = (Index("ix_qa_report_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+    data_point_id = Column("data_point_id", String, primary_key=True)
+    report_data = Column("report_data", String, nullable=False)
+    attempts = Column("attempts", Integer, default=0, nullable=False)
+    last_error = Column("last_error", String, nullable=True)
+    created_at = Column("created_at", Integer, default=lambda: int(time.time()), nullable=False)
+    status = Column("status", String, default="pending", server_default="pending", nullable=False)
+    next_attempt_at = Column(
+        "next_attempt_at", Integer, default=lambda: int(time.time()), server_default="0", nullable=False
+    )
+
+
+class WorkItem(Base):
+    """Database entity for the queue of datasets and data points waiting to be reviewed."""
+
+    __tablename__ = "work_queue"
+    __table_args__ = (
+        Index("ux_work_queue_kind_item_id", "kind", "item_id", unique=True),
+        Index("ix_work_queue_kind_status_available_at", "kind", "status", "available_at"),
+    )
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    kind = Column("kind", String, nullable=False)
+    item_id = Column("item_id", String, nullable=False)
+    status = Column("status", String, default="pending", nullable=False)
+    attempts = Column("attempts", Integer, default=0, nullable=False)
+    available_at = Column("available_at", Integer, default=lambda: int(time.time()), nullable=False)
+    last_error = Column("last_error", String, nullable=True)
+    created_at = Column("created_at", Integer, default=lambda: int(time.time()), nullable=False)
+    lease_token = Column("lease_token", String, nullable=True)
+
+
+class DiscoveryCursor(Base):
+    """Database entity for the newest pending dataset seen by a discovery, to read only newer datasets next time."""
+
+    __tablename__ = "discovery_cursor"
+    name = Column("name", String, primary_key=True)
+    high_water_mark = Column("high_water_mark", BigInteger, nullable=True)
+    last_full_scan_at = Column("last_full_scan_at", Integer, nullable=False)
+    updated_at = Column("updated_at", Integer, default=lambda: int(time.time()), nullable=False)
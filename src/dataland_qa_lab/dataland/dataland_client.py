@@ -1,101 +1,130 @@
 from __future__ import annotations
 
+import socket
+from functools import cached_property
+from typing import Any
 from urllib.parse import urljoin
 
 import dataland_backend
 import dataland_documents
 import dataland_qa
+from urllib3.connection import HTTPConnection
 
 
 class DatalandClient:
     """Provides an intuitive accessor for authenticated dataland API Instances.
 
+    The API clients and accessors are created once per DatalandClient, so that all calls share the same connection
+    pools instead of opening new connections for every request.
+
     Attributes:
         dataland_url (str): The Dataland URL determined by the is_test_dataland switch.
         api_key (str): The API Key to use for authenticating against dataland.
+        connection_pool_size (int | None): The maximum number of connections kept per API client.
+        keep_alive (bool): Whether TCP keep-alive is enabled on the pooled connections.
     """
 
     dataland_url: str
     api_key: str
+    connection_pool_size: int | None
+    keep_alive: bool
 
-    def __init__(self, dataland_url: str, api_key: str) -> None:
+    def __init__(
+        self, dataland_url: str, api_key: str, connection_pool_size: int | None = None, keep_alive: bool = True
+    ) -> None:
         """Create a new DatalandClient.
 
         Args:
             dataland_url: The URL of the dataland instance to connect to.
             api_key: The API Key to use for authenticating against dataland.
+            connection_pool_size: The maximum number of connections kept per API client. Defaults to the
+                default of the generated clients.
+            keep_alive: Whether to enable TCP keep-alive on the pooled connections.
         """
         self.dataland_url = dataland_url
         self.api_key = api_key
+        self.connection_pool_size = connection_pool_size
+        self.keep_alive = keep_alive
+
+    def _configure_pool(self, config: Any) -> Any:  # noqa: ANN401
+        """Apply the connection pool settings to the configuration of a generated API client."""
+        if self.connection_pool_size is not None:
+            config.connection_pool_maxsize = self.connection_pool_size
+        if self.keep_alive:
+            config.socket_options = [
+                *HTTPConnection.default_socket_options,
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        return config
 
     # --- Backend APIs ---
-    @property
+    @cached_property
     def backend_client(self) -> dataland_backend.ApiClient:
         """Retrieves the client for accessing the backend API."""
         config = dataland_backend.Configuration(access_token=self.api_key, host=urljoin(self.dataland_url, "api"))
-        return dataland_backend.ApiClient(config)
+        return dataland_backend.ApiClient(self._configure_pool(config))
 
-    @property
+    @cached_property
     def data_points_api(self) -> dataland_backend.DataPointControllerApi:
         """Function to run the company-data-controller API."""
         return dataland_backend.DataPointControllerApi(self.backend_client)
 
-    @property
+    @cached_property
     def company_api(self) -> dataland_backend.CompanyDataControllerApi:
         """Function to run the company-data-controller API."""
         return dataland_backend.CompanyDataControllerApi(self.backend_client)
 
-    @property
+    @cached_property
     def eu_taxonomy_nf_api(self) -> dataland_backend.EutaxonomyNonFinancialsDataControllerApi:
         """Function to run the eu-taxonomy-non-financials-data-controller API."""
         return dataland_backend.EutaxonomyNonFinancialsDataControllerApi(self.backend_client)
 
-    @property
+    @cached_property
     def eu_taxonomy_nuclear_and_gas_api(self) -> dataland_backend.NuclearAndGasDataControllerApi:
         """Function to run the eu-taxonomy-nuclear-and-gas-data-controller API."""
         return dataland_backend.NuclearAndGasDataControllerApi(self.backend_client)
 
-    @property
+    @cached_property
     def documents_client(self) -> dataland_documents.ApiClient:
         """Retrieves the client for accessing the documents API."""
         config = dataland_documents.Configuration(
             access_token=self.api_key, host=urljoin(self.dataland_url, "documents")
         )
-        return dataland_documents.ApiClient(config)
+        return dataland_documents.ApiClient(self._configure_pool(config))
 
-    @property
+    @cached_property
     def documents_api(self) -> dataland_documents.DocumentControllerApi:
         """Function to run the document-controller API."""
         return dataland_documents.DocumentControllerApi(self.documents_client)
 
-    @property
+    @cached_property
     def meta_api(self) -> dataland_backend.MetaDataControllerApi:
         """Function to run the meta-data-controller API."""
         return dataland_backend.MetaDataControllerApi(self.backend_client)
 
     # --- QA APIs ---
-    @property
+    @cached_property
     def qa_client(self) -> dataland_qa.ApiClient:
         """Retrieves the client for accessing the qa API."""
         config = dataland_qa.Configuration(access_token=self.api_key, host=urljoin(self.dataland_url, "qa"))
-        return dataland_qa.ApiClient(config)
+        return dataland_qa.ApiClient(self._configure_pool(config))
 
-    @property
+    @cached_property
     def qa_api(self) -> dataland_qa.QaControllerApi:
         """Function to run the qa-controller API."""
         return dataland_qa.QaControllerApi(self.qa_client)
 
-    @property
+    @cached_property
     def datapoint_qa_controller_api(self) -> dataland_qa.DataPointQaReportControllerApi:
         """Function to run the qa-controller API."""
         return dataland_qa.DataPointQaReportControllerApi(self.qa_client)
 
-    @property
+    @cached_property
     def eu_taxonomy_nf_qa_api(self) -> dataland_qa.EutaxonomyNonFinancialsDataQaReportControllerApi:
         """Function to run the QA report controller for EU Taxonomy non-financials."""
         return dataland_qa.EutaxonomyNonFinancialsDataQaReportControllerApi(self.qa_client)
 
-    @property
+    @cached_property
     def eu_taxonomy_nuclear_gas_qa_api(self) -> dataland_qa.NuclearAndGasDataQaReportControllerApi:
         """Function to run the QA report controller for EU Taxonomy nuclear and gas."""
         return dataland_qa.NuclearAndGasDataQaReportControllerApi(self.qa_client)
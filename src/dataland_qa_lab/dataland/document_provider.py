@@ -0,0 +1,50 @@
+import logging
+from functools import cache
+from pathlib import Path
+
+from dataland_qa_lab.database import database_engine
+from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils.document_store import DocumentStore
+
+logger = logging.getLogger(__name__)
+
+
+@cache
+def get_document_store() -> DocumentStore | None:
+    """Return the local document store, or None if it is disabled in the configuration."""
+    conf = config.get_config()
+    if not conf.document_store_dir:
+        return None
+    return DocumentStore(root=Path(conf.document_store_dir), max_bytes=conf.document_store_max_bytes)
+
+
+def get_document(file_reference: str) -> bytes | memoryview:
+    """Return the full document for the file reference from the local store, downloading it if it is missing."""
+    store = get_document_store()
+    if store is None:
+        return _download(file_reference)
+
+    document = store.get(file_reference)
+    if document is not None:
+        return document
+
+    conf = config.get_config()
+    if not conf.document_store_shared:
+        # Other replicas have stores of their own, so waiting for their downloads would not save one.
+        document = _download(file_reference)
+        store.put(file_reference, document)
+        return document
+
+    # With a store shared between replicas, only one replica downloads the document and the others read it.
+    with database_engine.advisory_lock(f"document:{file_reference}", conf.advisory_lock_timeout_seconds):
+        document = store.get(file_reference)
+        if document is None:
+            document = _download(file_reference)
+            store.put(file_reference, document)
+    return document
+
+
+def _download(file_reference: str) -> bytes:
+    """Download the full document for the file reference from Dataland."""
+    logger.info("Downloading document with reference ID: %s", file_reference)
+    return config.get_config().dataland_client.documents_api.get_document(document_id=file_reference)
@@ -10,8 +10,11 @@ logger = logging.getLogger(__name__)
 SENTRY_MONITOR_SLUG = "dataland-scheduler-heartbeat"
 
 
-def run_scheduled_processing_job(run_impl: collections.abc.Callable[[], None]) -> None:
-    """Single scheduled entry point. Sends Sentry cron check-ins and then runs the given implementation."""
+def run_scheduled_processing_job(run_impl: collections.abc.Callable[[], object]) -> None:
+    """Single scheduled entry point. Sends Sentry cron check-ins and then runs the given implementation.
+
+    The return value of the implementation, e.g. the number of datasets queued, is ignored.
+    """
     check_in_id = None
     try:
         check_in_id = capture_checkin(
@@ -1,4 +1,7 @@
 import logging
+import math
+from collections.abc import Iterator
+from typing import Any
 
 from dataland_backend.models.qa_status import QaStatus
 
@@ -6,6 +9,29 @@ from dataland_qa_lab.utils import config
 
 logger = logging.getLogger(__name__)
 
+PAGE_SIZE = 100
+
+
+def get_pending_dataset_pages(
+    client: Any,  # noqa: ANN401
+    data_types: list[str],
+    number_of_datasets: int,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[list[Any]]:
+    """Yield the pending datasets of the data types page by page, in the order listed by the QA service.
+
+    The QA service lists the newest datasets first. Paging stops at the first short page, or once the given number
+    of pending datasets has been read.
+    """
+    for chunk_index in range(math.ceil(number_of_datasets / page_size)):
+        page = client.qa_api.get_info_on_datasets(
+            data_types=data_types, chunk_size=page_size, chunk_index=chunk_index, qa_status=QaStatus.PENDING
+        )
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+
 
 class UnreviewedDatasets:
     """Class representing the unreviewed datasets from the API."""
@@ -28,9 +54,11 @@ class UnreviewedDatasets:
                 logger.error(msg=msg_p, exc_info=ValueError)
                 raise ValueError(msg_p)  # noqa: TRY301
 
-            self.datasets = client.qa_api.get_info_on_datasets(
-                data_types=["nuclear-and-gas"], chunk_size=number_of_datasets, qa_status=QaStatus.PENDING
-            )
+            self.datasets = [
+                dataset
+                for page in get_pending_dataset_pages(client, ["nuclear-and-gas"], number_of_datasets)
+                for dataset in page
+            ]
 
             self.list_of_data_ids = [dataset.data_id for dataset in self.datasets]
 
@@ -4,8 +4,7 @@ import logging
 import pypdf
 from dataland_backend.models.extended_document_reference import ExtendedDocumentReference
 
-from dataland_qa_lab.dataland import data_provider
-from dataland_qa_lab.utils import config
+from dataland_qa_lab.dataland import data_provider, document_provider
 from dataland_qa_lab.utils.nuclear_and_gas_data_collection import NuclearAndGasDataCollection
 
 logger = logging.getLogger(__name__)
@@ -23,7 +22,6 @@ def get_relevant_page_numbers(dataset: NuclearAndGasDataCollection) -> list[int]
 
 def get_relevant_pages_of_pdf(dataset: NuclearAndGasDataCollection) -> pypdf.PdfReader | None:
     """Get page numbers of relevant data."""
-    dataland_client = config.get_config().dataland_client
     logger.info("Starting to retrieve pages from company report.")
 
     page_numbers = get_relevant_page_numbers(dataset=dataset)
@@ -34,7 +32,7 @@ def get_relevant_pages_of_pdf(dataset: NuclearAndGasDataCollection) -> pypdf.Pdf
         logger.exception("No file reference found.")
         return None
 
-    full_pdf = dataland_client.documents_api.get_document(file_reference)
+    full_pdf = document_provider.get_document(file_reference)
     full_pdf_stream = io.BytesIO(full_pdf)
 
     original_pdf = pypdf.PdfReader(full_pdf_stream)
@@ -1,33 +1,18 @@
 import logging
 
 import pypdf
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import DocumentContentFormat
-from azure.core.credentials import AzureKeyCredential
 
 from dataland_qa_lab.database.database_engine import add_entity, get_entity, update_entity
 from dataland_qa_lab.database.database_tables import ReviewedDatasetMarkdowns
-from dataland_qa_lab.utils import config
+from dataland_qa_lab.utils import document_intelligence
 from dataland_qa_lab.utils.datetime_helper import get_german_time_as_string
 
 logger = logging.getLogger(__name__)
-config = config.get_config()
 
 
 def old_extract_text_of_pdf(pdf: pypdf.PdfReader) -> str:
     """Use Azure Document Intelligence to make text readable for azure open ai."""
-    docintel_cred = AzureKeyCredential(config.azure_docintel_api_key)
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=config.azure_docintel_endpoint, credential=docintel_cred
-    )
-
-    poller = document_intelligence_client.begin_analyze_document(
-        "prebuilt-layout",
-        body=pdf,
-        content_type="application/octet-stream",
-        output_content_format=DocumentContentFormat.MARKDOWN,
-    )
-    return poller.result().content
+    return document_intelligence.extract_markdown(pdf)
 
 
 def old_get_markdown_from_dataset(
@@ -78,14 +63,4 @@ def old_get_markdown_from_dataset(
 
 def extract_pdf(pdf) -> str:  # noqa: ANN001
     """Use Azure Document Intelligence to make text readable for azure open ai."""
-    docintel_cred = AzureKeyCredential(config.azure_docintel_api_key)
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=config.azure_docintel_endpoint, credential=docintel_cred
-    )
-    poller = document_intelligence_client.begin_analyze_document(
-        "prebuilt-layout",
-        body=pdf,
-        content_type="application/octet-stream",
-        output_content_format=DocumentContentFormat.MARKDOWN,
-    )
-    return poller.result().content
+    return document_intelligence.extract_markdown(pdf)
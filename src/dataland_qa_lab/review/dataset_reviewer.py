@@ -261,13 +261,10 @@ def _get_file_using_ocr(file_name: str, file_reference: str, page: int) -> str:
     document = _get_document(reference_id=file_reference, page_numbers=[page])
     markdown = text_to_doc_intelligence.extract_pdf(document)
 
-    database_engine.add_entity(
-        database_tables.CachedDocument(
-            file_name=file_name,
-            file_reference=file_reference,
-            ocr_output=markdown,
-            page=page,
-        )
+    database_engine.upsert_entities(
+        database_tables.CachedDocument,
+        [{"file_name": file_name, "file_reference": file_reference, "ocr_output": markdown, "page": page}],
+        conflict_columns=["file_reference", "page"],
     )
     return markdown
 
@@ -1,6 +1,8 @@
 import logging
-from functools import cache
+import tempfile
+from functools import cache, cached_property
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -47,11 +49,60 @@ class DatalandQaLabSettings(BaseSettings):
     use_ocr: bool = True
 
     enable_data_point_scheduler: bool = False
-
-    @property
+    scheduler_max_concurrent_datasets: int = 2
+    scheduler_max_concurrent_data_points: int = 10
+    document_cache_max_bytes: int = 512 * 1024 * 1024
+    document_store_dir: str | None = str(Path(tempfile.gettempdir()) / "dataland_qa_lab" / "documents")
+    document_store_max_bytes: int = 2 * 1024 * 1024 * 1024
+    document_store_shared: bool = False
+    ocr_max_workers: int = 8
+    ocr_max_concurrent_jobs: int = 8
+    dataland_connection_pool_size: int = 20
+    dataland_keep_alive: bool = True
+    ai_max_concurrent_requests: int = 16
+    ai_max_in_flight_tokens: int = 200_000
+    ai_requests_per_minute: int = 300
+    ai_tokens_per_minute: int = 300_000
+    scheduler_max_ai_saturation: float = 0.8
+    vision_image_format: Literal["jpeg", "webp"] = "jpeg"
+    vision_image_quality: int = 85
+    vision_max_long_side: int = 2048
+    vision_max_short_side: int = 768
+    vision_dpi: int = 300
+    page_image_cache_max_bytes: int = 128 * 1024 * 1024
+    page_image_cache_dir: str | None = None
+    page_image_cache_max_disk_bytes: int = 1024 * 1024 * 1024
+    vision_render_backend: Literal["thread", "process"] = "thread"
+    vision_render_workers: int | None = None
+    advisory_lock_timeout_seconds: float = 10 * 60
+    advisory_lock_max_held: int = 10
+    database_pool_size: int = 10
+    database_max_overflow: int = 10
+    database_pool_timeout_seconds: float = 30
+    qa_report_max_concurrent_posts: int = 8
+    qa_report_retry_batch_size: int = 100
+    qa_report_max_attempts: int = 10
+    qa_report_retry_delay_seconds: float = 5 * 60
+    qa_report_retry_interval_seconds: float = 5 * 60
+    work_queue_visibility_timeout_seconds: float = 60 * 60
+    work_queue_max_attempts: int = 5
+    work_queue_retry_delay_seconds: float = 5 * 60
+    work_queue_poll_interval_seconds: float = 10
+    discovery_page_size: int = 100
+    discovery_full_scan_interval_seconds: float = 24 * 60 * 60
+    datapoint_lock_ttl_seconds: int = 60
+    datapoint_lock_heartbeat_seconds: float = 15
+    prompt_reload_interval_seconds: float = 30
+
+    @cached_property
     def dataland_client(self) -> DatalandClient:
-        """Get the Dataland client."""
-        return DatalandClient(self.dataland_url, self.dataland_api_key)
+        """Get the Dataland client, which is shared by all callers of these settings."""
+        return DatalandClient(
+            self.dataland_url,
+            self.dataland_api_key,
+            connection_pool_size=self.dataland_connection_pool_size,
+            keep_alive=self.dataland_keep_alive,
+        )
 
     @property
     def frameworks_list(self) -> list[str]:
@@ -0,0 +1,47 @@
+import logging
+import threading
+from functools import cache
+
+import requests
+from azure.ai.documentintelligence import DocumentIntelligenceClient
+from azure.ai.documentintelligence.models import DocumentContentFormat
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+from requests.adapters import HTTPAdapter
+
+from dataland_qa_lab.utils import config
+
+logger = logging.getLogger(__name__)
+conf = config.get_config()
+
+_analyze_jobs = threading.BoundedSemaphore(conf.ocr_max_concurrent_jobs)
+
+
+@cache
+def get_client() -> DocumentIntelligenceClient:
+    """Return the shared Document Intelligence client, whose connections are kept alive and reused."""
+    logger.info("Creating Document Intelligence client for %s", conf.azure_docintel_endpoint)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=conf.ocr_max_concurrent_jobs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return DocumentIntelligenceClient(
+        endpoint=conf.azure_docintel_endpoint,
+        credential=AzureKeyCredential(conf.azure_docintel_api_key),
+        transport=RequestsTransport(session=session, session_owner=False),
+    )
+
+
+def extract_markdown(pdf) -> str:  # noqa: ANN001
+    """Analyze the document with the prebuilt layout model and return its content as markdown.
+
+    At most ``ocr_max_concurrent_jobs`` analyze jobs run at the same time, further callers wait for a free slot.
+    """
+    with _analyze_jobs:
+        poller = get_client().begin_analyze_document(
+            "prebuilt-layout",
+            body=pdf,
+            content_type="application/octet-stream",
+            output_content_format=DocumentContentFormat.MARKDOWN,
+        )
+        return poller.result().content
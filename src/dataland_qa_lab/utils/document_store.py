@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """Content-addressed on-disk store for immutable documents, capped in size with LRU eviction.
+
+    Documents are saved once under the SHA-256 hash of their content in ``objects/``. Each file reference
+    points to the hash of its content through a small file in ``refs/``. Reads are memory-mapped and mark
+    the document as recently used. The least recently used documents are removed when the store grows
+    beyond its maximum size.
+
+    Attributes:
+        root (Path): The directory holding the store.
+        max_bytes (int): The maximum total size of all stored documents.
+    """
+
+    root: Path
+    max_bytes: int
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        """Create a new document store.
+
+        Args:
+            root: The directory holding the store. It is created on the first write.
+            max_bytes: The maximum total size of all stored documents.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def get(self, reference: str) -> memoryview | None:
+        """Return a memory-mapped view of the document for the reference, or None if it is not stored."""
+        ref_path = self._ref_path(reference)
+        try:
+            object_path = self._object_path(ref_path.read_text(encoding="utf-8").strip())
+            with object_path.open("rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(object_path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        logger.debug("Found document with reference ID: %s in the document store.", reference)
+        return memoryview(mapped)
+
+    def put(self, reference: str, content: bytes | memoryview) -> None:
+        """Store the document for the reference and evict old documents if the store is too large."""
+        if len(content) > self.max_bytes:
+            logger.info("Not storing document with reference ID: %s, it exceeds the store size.", reference)
+            return
+
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(digest)
+        try:
+            if object_path.exists():
+                os.utime(object_path)
+            else:
+                self._write_atomically(object_path, content)
+            self._write_atomically(self._ref_path(reference), digest.encode("utf-8"))
+            self._evict(keep=object_path)
+        except OSError:
+            logger.exception("Failed to store document with reference ID: %s.", reference)
+
+    def _ref_path(self, reference: str) -> Path:
+        """Return the path of the file pointing from the reference to its content hash."""
+        return self.root / "refs" / hashlib.sha256(reference.encode("utf-8")).hexdigest()
+
+    def _object_path(self, digest: str) -> Path:
+        """Return the path of the document with the given content hash."""
+        return self.root / "objects" / digest[:2] / digest
+
+    @staticmethod
+    def _write_atomically(path: Path, content: bytes | memoryview) -> None:
+        """Write the file via a temporary file, so that readers never see partial content."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            Path(tmp_name).replace(path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _evict(self, keep: Path) -> None:
+        """Remove the least recently used documents until the store fits its maximum size."""
+        objects = [(path, path.stat()) for path in (self.root / "objects").glob("*/*") if path.is_file()]
+        total_size = sum(stat.st_size for _, stat in objects)
+
+        for path, stat in sorted(objects, key=lambda item: item[1].st_mtime):
+            if total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total_size -= stat.st_size
+            logger.debug("Evicted document %s from the document store.", path.name)
@@ -0,0 +1,68 @@
+import asyncio
+from collections.abc import Callable, Coroutine, Hashable
+from typing import Any
+
+
+class _Call[T]:
+    """A call in flight and the number of callers awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task[T]) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight[T]:
+    """De-duplicates concurrent calls for the same key, so that only the first caller does the work.
+
+    Callers that arrive while a call for their key is in flight await the same result. The entry is dropped
+    as soon as the call finishes, so later callers start a fresh call and no state is kept between calls.
+    A call is cancelled once every caller awaiting it has been cancelled.
+    """
+
+    def __init__(self) -> None:
+        """Create a new, empty single-flight group."""
+        self._calls: dict[tuple[int, Hashable], _Call[T]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of calls currently in flight."""
+        return len(self._calls)
+
+    def waiters(self, key: Hashable) -> int:
+        """Return the number of callers awaiting the call in flight for the key on the running event loop."""
+        call = self._calls.get((id(asyncio.get_running_loop()), key))
+        return call.waiters if call else 0
+
+    async def run(
+        self,
+        key: Hashable,
+        func: Callable[..., Coroutine[Any, Any, T]],
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> T:
+        """Await func(*args, **kwargs), or join the call already in flight for the given key."""
+        loop = asyncio.get_running_loop()
+        # Tasks can only be awaited on the loop running them, so calls are grouped per event loop.
+        call_key = (id(loop), key)
+
+        call = self._calls.get(call_key)
+        if call is None:
+            call = _Call(loop.create_task(func(*args, **kwargs)))
+            self._calls[call_key] = call
+            call.task.add_done_callback(lambda _: self._drop(call_key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # The last caller was cancelled, so nobody is interested in the result anymore.
+                self._drop(call_key, call)
+                call.task.cancel()
+
+    def _drop(self, call_key: tuple[int, Hashable], call: _Call[T]) -> None:
+        """Remove the call from the calls in flight, unless a newer call for the key has replaced it."""
+        if self._calls.get(call_key) is call:
+            del self._calls[call_key]
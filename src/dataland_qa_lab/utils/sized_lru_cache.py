@@ -0,0 +1,72 @@
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Sized
+
+logger = logging.getLogger(__name__)
+
+
+class SizedLRUCache[K: Hashable, V: Sized]:
+    """Thread-safe LRU cache that evicts by the total size of its values instead of the number of entries.
+
+    Attributes:
+        max_size (int): The maximum total size of all cached values, e.g. in bytes.
+    """
+
+    max_size: int
+
+    def __init__(self, max_size: int, size_of: Callable[[V], int] = len) -> None:
+        """Create a new cache.
+
+        Args:
+            max_size: The maximum total size of all cached values. Values larger than this are never cached.
+            size_of: Function returning the size of a value. Defaults to len().
+        """
+        self.max_size = max_size
+        self._size_of = size_of
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """The total size of all cached values."""
+        return self._size
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value for the key and mark it as recently used, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: K, value: V) -> None:
+        """Cache the value and evict the least recently used entries until the cache fits its maximum size."""
+        value_size = self._size_of(value)
+        if value_size > self.max_size:
+            logger.debug("Not caching %s: size %d exceeds the cache limit of %d.", key, value_size, self.max_size)
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+
+            self._entries[key] = (value, value_size)
+            self._size += value_size
+
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
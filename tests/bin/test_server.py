@@ -89,3 +89,25 @@ def test_init_sentry_handles_bad_dsn() -> None:
     with patch.object(server.sentry_sdk, "init", side_effect=server.BadDsn("bad dsn")) as sentry_init:
         server.init_sentry()
         sentry_init.assert_called_once()
+
+
+@patch("dataland_qa_lab.bin.server.admission.controller")
+def test_admission_stats(mock_controller: MagicMock) -> None:
+    """Test that the admission endpoint reports the load per model."""
+    mock_controller.stats.return_value = [
+        dp_models.AdmissionStats(
+            model="gpt-4o",
+            in_flight_requests=2,
+            in_flight_tokens=3000,
+            queued_requests=5,
+            queued_tokens=7000,
+            max_requests=2,
+            max_tokens=200000,
+        )
+    ]
+
+    response = client.get("/data-point-flow/admission")
+
+    assert response.status_code == 200
+    assert response.json()[0]["queued_requests"] == 5
+    assert response.json()[0]["model"] == "gpt-4o"
@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import threading
+
+import pytest
+
+from dataland_qa_lab.data_point_flow.admission import AdmissionController
+
+
+def get_stats(controller: AdmissionController, model: str) -> tuple[int, int, int]:
+    stats = next(stats for stats in controller.stats() if stats.model == model)
+    return stats.in_flight_requests, stats.in_flight_tokens, stats.queued_requests
+
+
+@pytest.mark.asyncio
+async def test_admit_limits_concurrent_requests() -> None:
+    controller = AdmissionController(max_requests=2, max_tokens=1000)
+    running = 0
+    max_running = 0
+
+    async def request() -> None:
+        nonlocal running, max_running
+        async with controller.admit("gpt-test", 10):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[request() for _ in range(6)])
+
+    assert max_running == 2
+    assert get_stats(controller, "gpt-test") == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_admit_queues_requests_over_token_budget() -> None:
+    controller = AdmissionController(max_requests=10, max_tokens=100)
+    release = asyncio.Event()
+
+    async def hold(tokens: int) -> None:
+        async with controller.admit("gpt-test", tokens):
+            await release.wait()
+
+    first = asyncio.create_task(hold(80))
+    second = asyncio.create_task(hold(30))
+    await asyncio.sleep(0.01)
+
+    assert get_stats(controller, "gpt-test") == (1, 80, 1)
+
+    release.set()
+    await asyncio.gather(first, second)
+    assert get_stats(controller, "gpt-test") == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_budgets_are_per_model() -> None:
+    controller = AdmissionController(max_requests=1, max_tokens=100)
+
+    async with controller.admit("model-a", 10), controller.admit("model-b", 10):
+        assert get_stats(controller, "model-a") == (1, 10, 0)
+        assert get_stats(controller, "model-b") == (1, 10, 0)
+
+
+@pytest.mark.asyncio
+async def test_oversized_request_is_admitted_alone() -> None:
+    controller = AdmissionController(max_requests=5, max_tokens=100)
+
+    async with controller.admit("gpt-test", 500):
+        assert get_stats(controller, "gpt-test") == (1, 100, 0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue() -> None:
+    controller = AdmissionController(max_requests=1, max_tokens=100)
+
+    async def wait_for_admission() -> None:
+        async with controller.admit("gpt-test", 10):
+            pytest.fail("The cancelled request must not be admitted.")
+
+    async with controller.admit("gpt-test", 10):
+        waiting = asyncio.create_task(wait_for_admission())
+        await asyncio.sleep(0.01)
+        assert get_stats(controller, "gpt-test") == (1, 10, 1)
+
+        waiting.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await waiting
+        assert get_stats(controller, "gpt-test") == (1, 10, 0)
+
+    assert get_stats(controller, "gpt-test") == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_waiter_on_other_event_loop_is_woken_up() -> None:
+    controller = AdmissionController(max_requests=1, max_tokens=100)
+    admitted = threading.Event()
+
+    async def wait_for_admission() -> None:
+        async with controller.admit("gpt-test", 10):
+            admitted.set()
+
+    async with controller.admit("gpt-test", 10):
+        thread = threading.Thread(target=asyncio.run, args=(wait_for_admission(),))
+        thread.start()
+        for _ in range(100):
+            if get_stats(controller, "gpt-test")[2]:
+                break
+            await asyncio.sleep(0.01)
+        assert get_stats(controller, "gpt-test") == (1, 10, 1)
+        assert not admitted.is_set()
+
+    await asyncio.to_thread(thread.join, 5)
+    assert admitted.is_set()
+    assert get_stats(controller, "gpt-test") == (0, 0, 0)
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -93,3 +94,60 @@ async def test_execute_prompt_exception_retry_exhaustion(mock_client: MagicMock)
     assert result.predicted_answer is None
     assert result.qa_status == "QaInconclusive"
     assert "API Down" in result.reasoning
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.ai.asyncio.sleep", new_callable=AsyncMock)
+@patch("dataland_qa_lab.data_point_flow.ai.rate_limiter.limiter")
+@patch("dataland_qa_lab.data_point_flow.ai.client")
+async def test_execute_prompt_honors_retry_after(
+    mock_client: MagicMock, mock_limiter: MagicMock, mock_sleep: AsyncMock
+) -> None:
+    """Test that a rate limited request is retried after the time requested by the service."""
+    rate_limit_error = Exception("429 Too Many Requests")
+    rate_limit_error.response = MagicMock(headers={"retry-after": "12"})
+    valid_response = MagicMock()
+    valid_response.choices = [
+        MagicMock(
+            message=MagicMock(
+                content=json.dumps(
+                    {"predicted_answer": "OK", "confidence": 0.9, "reasoning": "ok", "qa_status": "QaAccepted"}
+                )
+            )
+        )
+    ]
+    mock_client.chat.completions.create = AsyncMock(side_effect=[rate_limit_error, valid_response])
+    mock_limiter.acquire = AsyncMock()
+
+    result = await execute_prompt("test?", previous_answer="test?", ai_model="gpt-4o", retries=2)
+
+    assert result.predicted_answer == "OK"
+    mock_limiter.pause.assert_called_once_with("gpt-4o", 12.0)
+    mock_sleep.assert_awaited_once_with(12.0)
+    assert mock_limiter.acquire.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.ai.client")
+async def test_execute_prompt_shares_identical_concurrent_calls(mock_client: MagicMock) -> None:
+    """Test that identical concurrent prompts send one request, while different prompts send their own."""
+    mock_response = MagicMock()
+    mock_response.choices = [
+        MagicMock(
+            message=MagicMock(
+                content=json.dumps(
+                    {"predicted_answer": "OK", "confidence": 0.9, "reasoning": "ok", "qa_status": "QaAccepted"}
+                )
+            )
+        )
+    ]
+    mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+    results = await asyncio.gather(
+        execute_prompt("same?", previous_answer="a", ai_model="gpt-4o", images=["img"]),
+        execute_prompt("same?", previous_answer="a", ai_model="gpt-4o", images=["img"]),
+        execute_prompt("same?", previous_answer="b", ai_model="gpt-4o", images=["img"]),
+    )
+
+    assert [result.predicted_answer for result in results] == ["OK"] * 3
+    assert mock_client.chat.completions.create.await_count == 2
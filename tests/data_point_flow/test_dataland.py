@@ -1,3 +1,4 @@
+import asyncio
 import io
 import json
 from unittest.mock import MagicMock, patch
@@ -49,8 +50,8 @@ async def test_get_data_point_missing_data_source(mock_config: MagicMock) -> Non
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.dataland.config")
-async def test_get_document_single_page(mock_config: MagicMock) -> None:
+@patch("dataland_qa_lab.data_point_flow.dataland.document_provider")
+async def test_get_document_single_page(mock_document_provider: MagicMock) -> None:
     """Test get_document extracts the correct page from a PDF."""
     writer = PdfWriter()
     writer.add_blank_page(width=100, height=100)
@@ -61,7 +62,7 @@ async def test_get_document_single_page(mock_config: MagicMock) -> None:
     pdf_bytes.seek(0)
     pdf_data = pdf_bytes.read()
 
-    mock_config.dataland_client.documents_api.get_document.return_value = pdf_data
+    mock_document_provider.get_document.return_value = pdf_data
 
     result_stream = await dataland.get_document("ref123", 2)
 
@@ -73,21 +74,48 @@ async def test_get_document_single_page(mock_config: MagicMock) -> None:
     assert page.mediabox.height == 200
 
 
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.dataland.document_provider")
+async def test_get_document_downloads_each_reference_once(mock_document_provider: MagicMock) -> None:
+    """Test that pages of the same document are split from a single cached download."""
+    writer = PdfWriter()
+    writer.add_blank_page(width=100, height=100)
+    writer.add_blank_page(width=200, height=200)
+
+    pdf_bytes = io.BytesIO()
+    writer.write(pdf_bytes)
+
+    mock_document_provider.get_document.return_value = pdf_bytes.getvalue()
+    dataland.document_cache.clear()
+
+    first_page, second_page, _ = await asyncio.gather(
+        dataland.get_document("ref_cached", 1),
+        dataland.get_document("ref_cached", 2),
+        dataland.get_document("ref_cached", 2),
+    )
+
+    mock_document_provider.get_document.assert_called_once_with("ref_cached")
+    assert PdfReader(first_page).pages[0].mediabox.width == 100
+    assert PdfReader(second_page).pages[0].mediabox.width == 200
+
+
 @pytest.mark.asyncio
 @patch("dataland_qa_lab.data_point_flow.dataland.config")
-async def test_override_dataland_qa_calls_api(mock_config: MagicMock) -> None:
-    """Test that override_dataland_qa calls the QA API correctly."""
-    await dataland.override_dataland_qa(
-        data_point_id="dp123", comment="Reasoning text", qa_status="QaAccepted", predicted_answer="Yes", data_source={}
+async def test_post_qa_report_calls_api(mock_config: MagicMock) -> None:
+    """Test that the QA report overriding the Dataland QA status is posted through the QA API."""
+    report_data = dataland.build_qa_report_data(
+        comment="Reasoning text", qa_status="QaAccepted", predicted_answer="Yes", data_source={}
     )
 
-    mock_config.dataland_client.qa_api.datapoint_qa_controller_api.post_qa_report(
+    await dataland.post_qa_report("dp123", report_data)
+
+    mock_config.dataland_client.datapoint_qa_controller_api.post_qa_report.assert_called_once_with(
         data_point_id="dp123",
         qa_report_data_point_string={
             "comment": "Reasoning text",
             "verdict": "QaAccepted",
             "correctedData": json.dumps(
-                {"value": "Yes", "quaility": "Incomplete", "comment": "program neural circuit", "dataSource": {}}
+                {"value": "Yes", "quality": "Incomplete", "comment": "program neural circuit", "dataSource": {}}
             ),
         },
     )
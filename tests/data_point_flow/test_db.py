@@ -1,7 +1,8 @@
 import time
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy.exc import SQLAlchemyError
 
 from dataland_qa_lab.data_point_flow import db as db_module
 from dataland_qa_lab.data_point_flow import models
@@ -9,8 +10,8 @@ from dataland_qa_lab.database import database_tables
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.db.database_engine")
-async def test_store_data_point_in_db_validated(mock_db_engine: MagicMock) -> None:
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_store_data_point_in_db_validated(mock_db_engine: AsyncMock) -> None:
     """Test storing a ValidatedDatapoint in the database."""
     data = models.ValidatedDatapoint(
         data_point_id="dp123",
@@ -33,18 +34,21 @@ async def test_store_data_point_in_db_validated(mock_db_engine: MagicMock) -> No
 
     await db_module.store_data_point_in_db(data)
 
-    mock_db_engine.add_entity.assert_called_once()
-    added_entity = (
-        mock_db_engine.add_entity.call_args.kwargs.get("entity") or mock_db_engine.add_entity.call_args.args[0]
-    )
-    assert added_entity.data_point_id == "dp123"
-    assert added_entity.predicted_answer == 12
-    assert added_entity.qa_status == "QaAccepted"
+    mock_db_engine.upsert_entities_async.assert_awaited_once()
+    entity_class, rows = mock_db_engine.upsert_entities_async.call_args.args
+    assert entity_class is database_tables.ValidatedDataPoint
+    assert mock_db_engine.upsert_entities_async.call_args.kwargs == {"conflict_columns": ["data_point_id"]}
+    assert rows[0]["data_point_id"] == "dp123"
+    assert rows[0]["predicted_answer"] == 12
+    assert rows[0]["qa_status"] == "QaAccepted"
+    assert rows[0]["qa_report_id"] == "report_id"
+    mock_db_engine.get_entity_async.assert_not_awaited()
+    mock_db_engine.delete_entity_async.assert_not_awaited()
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.db.database_engine")
-async def test_store_data_point_in_db_cannot_validate(mock_db_engine: MagicMock) -> None:
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_store_data_point_in_db_cannot_validate(mock_db_engine: AsyncMock) -> None:
     """Test storing a CannotValidateDatapoint in the database."""
     data = models.CannotValidateDatapoint(
         data_point_id="dp456",
@@ -60,28 +64,26 @@ async def test_store_data_point_in_db_cannot_validate(mock_db_engine: MagicMock)
 
     await db_module.store_data_point_in_db(data)
 
-    added_entity = (
-        mock_db_engine.add_entity.call_args.kwargs.get("entity") or mock_db_engine.add_entity.call_args.args[0]
-    )
-    assert added_entity.data_point_id == "dp456"
-    assert added_entity.predicted_answer is None
-    assert added_entity.confidence == 0.0
-    assert added_entity.qa_status == "QaNotAttempted"
+    row = mock_db_engine.upsert_entities_async.call_args.args[1][0]
+    assert row["data_point_id"] == "dp456"
+    assert row["predicted_answer"] is None
+    assert row["confidence"] == 0.0
+    assert row["qa_status"] == "QaNotAttempted"
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.db.database_engine")
-async def test_check_if_already_validated_none(mock_db_engine: MagicMock) -> None:
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_check_if_already_validated_none(mock_db_engine: AsyncMock) -> None:
     """Test when no existing validation is found."""
-    mock_db_engine.get_entity.return_value = None
+    mock_db_engine.get_entity_async.return_value = None
 
     result = await db_module.check_if_already_validated("dp123")
     assert result is None
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.db.database_engine")
-async def test_check_if_already_validated_validated(mock_db_engine: MagicMock) -> None:
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_check_if_already_validated_validated(mock_db_engine: AsyncMock) -> None:
     """Test returning a ValidatedDatapoint if already validated."""
     mock_entity = MagicMock()
     mock_entity.data_point_id = "dp123"
@@ -98,7 +100,7 @@ async def test_check_if_already_validated_validated(mock_db_engine: MagicMock) -
     mock_entity.file_reference = "ref123"
     mock_entity.page = 1
 
-    mock_db_engine.get_entity.return_value = mock_entity
+    mock_db_engine.get_entity_async.return_value = mock_entity
 
     result = await db_module.check_if_already_validated("dp123")
     assert isinstance(result, models.ValidatedDatapoint)
@@ -107,8 +109,8 @@ async def test_check_if_already_validated_validated(mock_db_engine: MagicMock) -
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.db.database_engine")
-async def test_check_if_already_validated_cannot_validate(mock_db_engine: MagicMock) -> None:
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_check_if_already_validated_cannot_validate(mock_db_engine: AsyncMock) -> None:
     """Test returning a CannotValidateDatapoint if predicted_answer is None."""
     mock_entity = MagicMock()
     mock_entity.data_point_id = "dp123"
@@ -119,7 +121,7 @@ async def test_check_if_already_validated_cannot_validate(mock_db_engine: MagicM
     mock_entity.use_ocr = False
     mock_entity.timestamp = int(time.time())
 
-    mock_db_engine.get_entity.return_value = mock_entity
+    mock_db_engine.get_entity_async.return_value = mock_entity
 
     result = await db_module.check_if_already_validated("dp123")
     assert isinstance(result, models.CannotValidateDatapoint)
@@ -128,10 +130,74 @@ async def test_check_if_already_validated_cannot_validate(mock_db_engine: MagicM
 
 
 @pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.db.asyncio.sleep", new_callable=AsyncMock)
 @patch("dataland_qa_lab.data_point_flow.db.database_engine")
-async def test_delete_existing_entry_calls_delete(mock_db_engine: MagicMock) -> None:
-    """Test that delete_existing_entry calls delete_entity."""
-    await db_module.delete_existing_entry("dp123")
-    mock_db_engine.delete_entity.assert_called_once_with(
-        entity_id="dp123", entity_class=database_tables.ValidatedDataPoint
+async def test_advisory_lock_polls_without_blocking(mock_db_engine: MagicMock, mock_sleep: AsyncMock) -> None:
+    """Test that the lock is polled asynchronously and released after the block."""
+    connection = MagicMock()
+    mock_db_engine.try_advisory_lock.side_effect = [None, connection]
+
+    async with db_module.advisory_lock("ocr:ref:1") as acquired:
+        assert acquired is True
+        mock_db_engine.release_advisory_lock.assert_not_called()
+
+    mock_sleep.assert_awaited_once()
+    mock_db_engine.release_advisory_lock.assert_called_once_with(connection, "ocr:ref:1")
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.db.database_engine")
+async def test_advisory_lock_proceeds_on_database_error(mock_db_engine: MagicMock) -> None:
+    """Test that the block still runs if the database cannot provide the lock."""
+    mock_db_engine.try_advisory_lock.side_effect = SQLAlchemyError("DB Error")
+
+    async with db_module.advisory_lock("ocr:ref:1") as acquired:
+        assert acquired is False
+
+    mock_db_engine.release_advisory_lock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_batched_writes_store_results_together(mock_db_engine: AsyncMock) -> None:
+    """Test that results stored within a batch are visible in it and written in one upsert at its end."""
+    results = [
+        models.CannotValidateDatapoint(
+            data_point_id=data_point_id,
+            data_point_type="number",
+            reasoning="Cannot validate",
+            ai_model="gpt-4",
+            use_ocr=True,
+            override=None,
+            qa_status="QaNotAttempted",
+            timestamp=int(time.time()),
+            _prompt=None,
+        )
+        for data_point_id in ("dp1", "dp2")
+    ]
+
+    async with db_module.batched_writes():
+        for result in results:
+            await db_module.store_data_point_in_db(result)
+        mock_db_engine.upsert_entities_async.assert_not_awaited()
+        assert await db_module.check_if_already_validated("dp2") is results[1]
+
+    mock_db_engine.upsert_entities_async.assert_awaited_once()
+    rows = mock_db_engine.upsert_entities_async.call_args.args[1]
+    assert [row["data_point_id"] for row in rows] == ["dp1", "dp2"]
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.db.database_engine", new_callable=AsyncMock)
+async def test_get_validated_data_points_looks_up_all_in_one_query(mock_db_engine: AsyncMock) -> None:
+    """Test that the existing results of many data points are fetched with one lookup."""
+    row = MagicMock(data_point_id="dp1", predicted_answer="12")
+    mock_db_engine.get_entities_async.return_value = [row]
+
+    results = await db_module.get_validated_data_points(["dp1", "dp2"])
+
+    mock_db_engine.get_entities_async.assert_awaited_once_with(
+        database_tables.ValidatedDataPoint, "data_point_id", ["dp1", "dp2"]
     )
+    assert list(results) == ["dp1"]
+    assert isinstance(results["dp1"], models.ValidatedDatapoint)
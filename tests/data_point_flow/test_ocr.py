@@ -1,17 +1,28 @@
+import asyncio
 import io
-from unittest.mock import MagicMock, patch
+import threading
+import time
+from collections.abc import Iterator
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from dataland_qa_lab.data_point_flow import ocr
 
 
+@pytest.fixture(autouse=True)
+def mock_advisory_lock() -> Iterator[MagicMock]:
+    """Take the cluster-wide OCR lock without a database."""
+    with patch("dataland_qa_lab.data_point_flow.ocr.db.database_engine") as mock_db_engine:
+        yield mock_db_engine
+
+
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.ocr.database_engine")
+@patch("dataland_qa_lab.data_point_flow.ocr.database_engine", new_callable=AsyncMock)
 @patch("dataland_qa_lab.data_point_flow.ocr.extract_pdf")
-async def test_run_ocr_on_document_new_document(mock_extract_pdf: MagicMock, mock_db_engine: MagicMock) -> None:
+async def test_run_ocr_on_document_new_document(mock_extract_pdf: MagicMock, mock_db_engine: AsyncMock) -> None:
     """Test OCR on a new document (not cached)."""
-    mock_db_engine.get_entity.return_value = None
+    mock_db_engine.get_entity_async.return_value = None
     mock_extract_pdf.return_value = "mocked OCR output"
 
     fake_pdf = io.BytesIO(b"%PDF-1.4 fake content")
@@ -19,26 +30,96 @@ async def test_run_ocr_on_document_new_document(mock_extract_pdf: MagicMock, moc
 
     assert result == "mocked OCR output"
     mock_extract_pdf.assert_called_once_with(fake_pdf)
-    mock_db_engine.add_entity.assert_called_once()
-    added_entity = mock_db_engine.add_entity.call_args[0][0]
-    assert added_entity.file_name == "file.pdf"
-    assert added_entity.file_reference == "ref123"
-    assert added_entity.ocr_output == "mocked OCR output"
-    assert added_entity.page == 1
+    mock_db_engine.upsert_entities_async.assert_awaited_once_with(
+        ocr.database_tables.CachedDocument,
+        [{"file_name": "file.pdf", "file_reference": "ref123", "ocr_output": "mocked OCR output", "page": 1}],
+        conflict_columns=["file_reference", "page"],
+    )
 
 
 @pytest.mark.asyncio
-@patch("dataland_qa_lab.data_point_flow.ocr.database_engine")
+@patch("dataland_qa_lab.data_point_flow.ocr.database_engine", new_callable=AsyncMock)
 @patch("dataland_qa_lab.data_point_flow.ocr.extract_pdf")
-async def test_run_ocr_on_document_cached_document(mock_extract_pdf: MagicMock, mock_db_engine: MagicMock) -> None:
-    """Test OCR on a cached document."""
+async def test_run_ocr_on_document_cached_document(
+    mock_extract_pdf: MagicMock, mock_db_engine: AsyncMock, mock_advisory_lock: MagicMock
+) -> None:
+    """Test OCR on a cached document, which is returned without taking the cluster-wide lock."""
     cached_entity = MagicMock()
     cached_entity.ocr_output = "cached OCR text"
-    mock_db_engine.get_entity.return_value = cached_entity
+    mock_db_engine.get_entity_async.return_value = cached_entity
 
     fake_pdf = io.BytesIO(b"%PDF-1.4 fake content")
     result = await ocr.run_ocr_on_document("file.pdf", "ref123", 1, fake_pdf)
 
     assert result == "cached OCR text"
     mock_extract_pdf.assert_not_called()
-    mock_db_engine.add_entity.assert_not_called()
+    mock_db_engine.upsert_entities_async.assert_not_called()
+    mock_advisory_lock.try_advisory_lock.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.ocr.database_engine", new_callable=AsyncMock)
+@patch("dataland_qa_lab.data_point_flow.ocr.extract_pdf")
+async def test_run_ocr_on_document_cached_by_another_replica_while_waiting(
+    mock_extract_pdf: MagicMock, mock_db_engine: AsyncMock, mock_advisory_lock: MagicMock
+) -> None:
+    """Test that the cache is checked again under the lock, after another replica OCRed the page."""
+    cached_entity = MagicMock()
+    cached_entity.ocr_output = "OCR text of another replica"
+    mock_db_engine.get_entity_async.side_effect = [None, cached_entity]
+
+    result = await ocr.run_ocr_on_document("file.pdf", "ref_other", 1, io.BytesIO(b"%PDF-1.4 fake content"))
+
+    assert result == "OCR text of another replica"
+    mock_extract_pdf.assert_not_called()
+    mock_advisory_lock.try_advisory_lock.assert_called_once_with("ocr:ref_other:1")
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.ocr.database_engine", new_callable=AsyncMock)
+@patch("dataland_qa_lab.data_point_flow.ocr.extract_pdf")
+async def test_run_ocr_on_document_does_not_block_event_loop(
+    mock_extract_pdf: MagicMock, mock_db_engine: AsyncMock
+) -> None:
+    """Test that a slow OCR job leaves the event loop free for other coroutines."""
+    ocr_finished = threading.Event()
+
+    def slow_extract(_: io.BytesIO) -> str:
+        time.sleep(0.2)
+        ocr_finished.set()
+        return "slow OCR output"
+
+    mock_db_engine.get_entity_async.return_value = None
+    mock_extract_pdf.side_effect = slow_extract
+
+    async def tick_during_ocr() -> bool:
+        await asyncio.sleep(0.05)
+        return not ocr_finished.is_set()
+
+    result, ticked_during_ocr = await asyncio.gather(
+        ocr.run_ocr_on_document("file.pdf", "ref_slow", 1, io.BytesIO(b"%PDF-1.4 fake content")),
+        tick_during_ocr(),
+    )
+
+    assert result == "slow OCR output"
+    assert ticked_during_ocr
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.ocr.database_engine", new_callable=AsyncMock)
+@patch("dataland_qa_lab.data_point_flow.ocr.extract_pdf")
+async def test_run_ocr_on_document_shares_concurrent_jobs(
+    mock_extract_pdf: MagicMock, mock_db_engine: AsyncMock
+) -> None:
+    """Test that concurrent OCR of the same page runs once and keeps no state once finished."""
+    mock_db_engine.get_entity_async.return_value = None
+    mock_extract_pdf.return_value = "shared OCR output"
+
+    results = await asyncio.gather(
+        *[ocr.run_ocr_on_document("file.pdf", "ref_shared", 2, io.BytesIO(b"%PDF-1.4")) for _ in range(5)]
+    )
+
+    assert results == ["shared OCR output"] * 5
+    mock_extract_pdf.assert_called_once()
+    mock_db_engine.upsert_entities_async.assert_awaited_once()
+    assert len(ocr._ocr_jobs) == 0
@@ -0,0 +1,67 @@
+import asyncio
+import io
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dataland_qa_lab.data_point_flow import models, page_images
+from dataland_qa_lab.utils.document_store import DocumentStore
+
+
+@pytest.fixture(autouse=True)
+def clear_page_image_cache() -> None:
+    """Start every test with an empty memory cache and no disk cache."""
+    page_images.page_image_cache.clear()
+    with patch("dataland_qa_lab.data_point_flow.page_images.page_image_store", None):
+        yield
+    page_images.page_image_cache.clear()
+
+
+def rendered_images() -> list[models.EncodedImage]:
+    """Return a single rendered page image."""
+    return [models.EncodedImage(data=b"image", image_format="jpeg", width=1, height=1)]
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.rasterizer.pdf_handler")
+async def test_page_is_rendered_once(mock_pdf_handler: MagicMock) -> None:
+    """Test that concurrent and later requests for the same page share one render."""
+    mock_pdf_handler.render_pdf_to_encoded_images.return_value = rendered_images()
+
+    results = await asyncio.gather(*[page_images.get_page_images("ref", 3, io.BytesIO(b"pdf")) for _ in range(5)])
+    later = await page_images.get_page_images("ref", 3, io.BytesIO(b"pdf"))
+
+    assert results == [["aW1hZ2U="]] * 5
+    assert later == ["aW1hZ2U="]
+    mock_pdf_handler.render_pdf_to_encoded_images.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.rasterizer.pdf_handler")
+async def test_render_settings_are_part_of_the_key(mock_pdf_handler: MagicMock) -> None:
+    """Test that changing a render setting renders the page again."""
+    mock_pdf_handler.render_pdf_to_encoded_images.return_value = rendered_images()
+
+    await page_images.get_page_images("ref", 3, io.BytesIO(b"pdf"))
+    with patch.object(page_images.conf, "vision_image_quality", 50):
+        await page_images.get_page_images("ref", 3, io.BytesIO(b"pdf"))
+    await page_images.get_page_images("ref", 4, io.BytesIO(b"pdf"))
+
+    assert mock_pdf_handler.render_pdf_to_encoded_images.call_count == 3
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.rasterizer.pdf_handler")
+async def test_disk_cache_survives_memory_cache(mock_pdf_handler: MagicMock, tmp_path: Path) -> None:
+    """Test that page images are read back from the disk cache once they left the memory cache."""
+    mock_pdf_handler.render_pdf_to_encoded_images.return_value = rendered_images() * 2
+    store = DocumentStore(root=tmp_path, max_bytes=1024)
+
+    with patch("dataland_qa_lab.data_point_flow.page_images.page_image_store", store):
+        first = await page_images.get_page_images("ref", 1, io.BytesIO(b"pdf"))
+        page_images.page_image_cache.clear()
+        second = await page_images.get_page_images("ref", 1, io.BytesIO(b"pdf"))
+
+    assert first == second == ["aW1hZ2U=", "aW1hZ2U="]
+    mock_pdf_handler.render_pdf_to_encoded_images.assert_called_once()
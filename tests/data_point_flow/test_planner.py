@@ -0,0 +1,123 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from dataland_qa_lab.data_point_flow import models, planner
+
+
+def make_prompts(dependencies: dict[str, list[str]]) -> MagicMock:
+    mock_prompts = MagicMock()
+    mock_prompts.registry.get.side_effect = lambda data_point_type: (
+        models.DataPointPrompt(prompt="{context}", depends_on=dependencies[data_point_type])
+        if data_point_type in dependencies
+        else None
+    )
+    return mock_prompts
+
+
+def test_plan_waves_orders_dependencies_first() -> None:
+    graph = {"a": {"b", "c"}, "b": {"c"}, "c": set(), "d": set()}
+
+    waves = planner.plan_waves(graph)
+
+    assert [sorted(wave) for wave in waves] == [["c", "d"], ["b"], ["a"]]
+
+
+def test_plan_waves_detects_cycles() -> None:
+    graph = {"a": {"b"}, "b": {"c"}, "c": {"a"}, "d": set()}
+
+    with pytest.raises(planner.DependencyCycleError, match=r"\['a', 'b', 'c'\]"):
+        planner.plan_waves(graph)
+
+
+def test_build_dependency_graph_ignores_types_outside_the_dataset() -> None:
+    mock_prompts = make_prompts({"a": ["b", "missing"], "b": []})
+
+    with patch("dataland_qa_lab.data_point_flow.planner.prompts", mock_prompts):
+        graph = planner.build_dependency_graph(["a", "b", "no_prompt"])
+
+    assert graph == {"a": {"b"}, "b": set(), "no_prompt": set()}
+
+
+@pytest.mark.asyncio
+async def test_validate_dataset_validates_each_data_point_once_after_its_dependencies() -> None:
+    mock_prompts = make_prompts({"a": ["b"], "b": ["c"], "c": [], "d": ["c"]})
+    data_points = {"a": "dp_a", "b": "dp_b", "c": "dp_c", "d": "dp_d"}
+    validated = []
+
+    async def fake_validate(data_point_id: str, **kwargs: object) -> str:
+        await asyncio.sleep(0)
+        dependency_results = kwargs["dependency_results"]
+        assert all(result in validated for result in dependency_results.values())
+        validated.append(f"result_{data_point_id}")
+        return f"result_{data_point_id}"
+
+    with (
+        patch("dataland_qa_lab.data_point_flow.planner.prompts", mock_prompts),
+        patch("dataland_qa_lab.data_point_flow.planner.review.validate_datapoint", side_effect=fake_validate) as mock,
+        patch("dataland_qa_lab.data_point_flow.planner.db.get_validated_data_points", AsyncMock(return_value={})),
+    ):
+        results = await planner.validate_dataset(
+            "dataset_1", data_points, use_ocr=False, ai_model="gpt-test", override=False
+        )
+
+    assert list(results) == ["a", "b", "c", "d"]
+    assert results["a"] == "result_dp_a"
+    assert mock.call_count == 4
+    mock.assert_any_call(
+        "dp_a",
+        use_ocr=False,
+        ai_model="gpt-test",
+        override=False,
+        dataset_id="dataset_1",
+        dependency_results={"b": "result_dp_b"},
+        skip_existing_check=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_validate_dataset_raises_on_cycle() -> None:
+    mock_prompts = make_prompts({"a": ["b"], "b": ["a"]})
+
+    with (
+        patch("dataland_qa_lab.data_point_flow.planner.prompts", mock_prompts),
+        patch("dataland_qa_lab.data_point_flow.planner.review.validate_datapoint", new_callable=AsyncMock) as mock,
+        pytest.raises(planner.DependencyCycleError),
+    ):
+        await planner.validate_dataset(
+            "dataset_1", {"a": "dp_a", "b": "dp_b"}, use_ocr=False, ai_model="gpt-test", override=False
+        )
+
+    mock.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_validate_dataset_skips_already_validated_data_points() -> None:
+    mock_prompts = make_prompts({"a": ["b"], "b": []})
+    existing_b = MagicMock(name="existing_b")
+
+    with (
+        patch("dataland_qa_lab.data_point_flow.planner.prompts", mock_prompts),
+        patch("dataland_qa_lab.data_point_flow.planner.review.validate_datapoint", new_callable=AsyncMock) as mock,
+        patch(
+            "dataland_qa_lab.data_point_flow.planner.db.get_validated_data_points",
+            AsyncMock(return_value={"dp_b": existing_b}),
+        ) as mock_lookup,
+    ):
+        mock.return_value = "result_dp_a"
+        results = await planner.validate_dataset(
+            "dataset_1", {"a": "dp_a", "b": "dp_b"}, use_ocr=False, ai_model="gpt-test", override=False
+        )
+
+    assert results == {"a": "result_dp_a", "b": existing_b}
+    mock_lookup.assert_awaited_once_with(["dp_a", "dp_b"])
+    mock.assert_awaited_once_with(
+        "dp_a",
+        use_ocr=False,
+        ai_model="gpt-test",
+        override=False,
+        dataset_id="dataset_1",
+        dependency_results={"b": existing_b},
+        skip_existing_check=True,
+    )
@@ -1,7 +1,9 @@
 import json
+import os
 from pathlib import Path
+from unittest.mock import patch
 
-from dataland_qa_lab.data_point_flow import prompts
+from dataland_qa_lab.data_point_flow import models, prompts
 
 
 def test_get_prompts_success(tmp_path: Path) -> None:
@@ -23,3 +25,106 @@ def test_get_prompts_empty_directory(tmp_path: Path) -> None:
 
     result = prompts.get_prompts(prompts_dir=prompts_dir)
     assert result == {}
+
+
+def test_prompt_registry_indexes_valid_prompts(tmp_path: Path) -> None:
+    """Test that the registry skips entries without a usable prompt template."""
+    (tmp_path / "a.json").write_text(
+        json.dumps(
+            {
+                "_comment": "not a prompt",
+                "typeA": {"prompt": "Check {value} in {context}", "depends_on": ["typeB"]},
+                "typeB": {"   prompt": "misspelled key"},
+                "typeC": {"prompt": "Unknown {field}"},
+                "typeD": {"prompt": "Malformed {context"},
+            }
+        )
+    )
+
+    registry = prompts.PromptRegistry(prompts_dir=tmp_path)
+
+    assert registry.get("typeA") == models.DataPointPrompt(prompt="Check {value} in {context}", depends_on=["typeB"])
+    assert registry.get("typeB") is None
+    assert registry.get("typeC") is None
+    assert registry.get("typeD") is None
+    assert registry.get("_comment") is None
+
+
+def test_prompt_registry_parses_files_once(tmp_path: Path) -> None:
+    """Test that unchanged prompt files are not parsed again."""
+    (tmp_path / "a.json").write_text(json.dumps({"typeA": {"prompt": "{context}"}}))
+    registry = prompts.PromptRegistry(prompts_dir=tmp_path)
+
+    with patch("dataland_qa_lab.data_point_flow.prompts.get_prompts", wraps=prompts.get_prompts) as mock_get_prompts:
+        registry.get("typeA")
+        registry.get("typeA")
+        registry.get("other")
+
+    mock_get_prompts.assert_called_once_with(tmp_path)
+
+
+def test_prompt_registry_reloads_changed_files(tmp_path: Path) -> None:
+    """Test that the registry picks up modified and added prompt files."""
+    prompt_file = tmp_path / "a.json"
+    prompt_file.write_text(json.dumps({"typeA": {"prompt": "old {context}"}}))
+    registry = prompts.PromptRegistry(prompts_dir=tmp_path)
+    assert registry.get("typeA").prompt == "old {context}"
+
+    prompt_file.write_text(json.dumps({"typeA": {"prompt": "new {context}"}}))
+    os.utime(prompt_file, ns=(0, 0))
+    (tmp_path / "b.json").write_text(json.dumps({"typeB": {"prompt": "{context}"}}))
+
+    assert registry.get("typeA").prompt == "old {context}"
+    registry.reload()
+    assert registry.get("typeA").prompt == "new {context}"
+    assert registry.get("typeB") is not None
+
+
+def test_prompt_registry_checks_files_once_per_interval(tmp_path: Path) -> None:
+    """Test that the prompt files are not checked again within the reload interval."""
+    (tmp_path / "a.json").write_text(json.dumps({"typeA": {"prompt": "{context}"}}))
+    registry = prompts.PromptRegistry(prompts_dir=tmp_path, reload_interval_seconds=30)
+
+    with (
+        patch.object(registry, "_get_file_state", wraps=registry._get_file_state) as mock_get_file_state,
+        patch("dataland_qa_lab.data_point_flow.prompts.time.monotonic", side_effect=[100, 110, 131, 131]),
+    ):
+        registry.get("typeA")
+        registry.get("typeA")
+        registry.get("typeA")
+
+    assert mock_get_file_state.call_count == 2
+
+
+def test_format_template_matches_str_format() -> None:
+    """Test that compiled templates render like str.format."""
+    template = "{{literal}} {value!r:>8} in {context[0]} on page {page:03d}{comment}"
+    fields = {"value": "12", "context": ["ctx"], "page": 7, "comment": ""}
+
+    assert prompts.format_template(template, **fields) == template.format(**fields)
+
+
+def test_default_prompts_are_valid() -> None:
+    """Test that all shipped prompt templates load into the registry."""
+    registry = prompts.PromptRegistry()
+
+    assert registry.get("extendedDecimalEstimatedScope1GhgEmissionsInTonnes") is not None
+
+
+def test_prompt_registry_transitive_dependencies(tmp_path: Path) -> None:
+    """Test that dependencies of dependencies are resolved and cycles terminate."""
+    (tmp_path / "a.json").write_text(
+        json.dumps(
+            {
+                "typeA": {"prompt": "{context}", "depends_on": ["typeB"]},
+                "typeB": {"prompt": "{context}", "depends_on": ["typeC"]},
+                "typeC": {"prompt": "{context}", "depends_on": ["typeA"]},
+                "typeD": {"prompt": "{context}", "depends_on": ["typeB"]},
+            }
+        )
+    )
+    registry = prompts.PromptRegistry(prompts_dir=tmp_path)
+
+    assert registry.get_transitive_dependencies("typeD") == {"typeA", "typeB", "typeC"}
+    assert "typeA" in registry.get_transitive_dependencies("typeA")
+    assert "typeD" not in registry.get_transitive_dependencies("typeA")
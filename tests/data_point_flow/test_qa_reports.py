@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from dataland_qa_lab.data_point_flow import models, qa_reports
+from dataland_qa_lab.database import database_tables
+
+
+def make_result(data_point_id: str) -> models.ValidatedDatapoint:
+    return models.ValidatedDatapoint(
+        data_point_id=data_point_id,
+        data_point_type="number",
+        previous_answer="10",
+        predicted_answer="12",
+        confidence=0.9,
+        reasoning="Reasoning text",
+        qa_status="QaAccepted",
+        timestamp=int(time.time()),
+        ai_model="gpt-4",
+        use_ocr=False,
+        file_name="file.pdf",
+        file_reference="ref123",
+        page=1,
+        override=None,
+        qa_report_id=None,
+        _prompt="prompt text",
+    )
+
+
+@pytest.fixture
+def mock_engine():  # noqa: ANN201
+    with patch("dataland_qa_lab.data_point_flow.qa_reports.database_engine") as mock_engine:
+        mock_engine.delete_entities_async = AsyncMock(return_value=True)
+        mock_engine.upsert_entities_async = AsyncMock(return_value=True)
+        yield mock_engine
+
+
+@pytest.mark.asyncio
+async def test_submit_outside_a_batch_posts_right_away(mock_engine: MagicMock) -> None:
+    result = make_result("dp1")
+
+    with patch(
+        "dataland_qa_lab.data_point_flow.qa_reports.dataland.post_qa_report",
+        AsyncMock(return_value=MagicMock(qa_report_id="report1")),
+    ) as mock_post:
+        await qa_reports.submit(result, {"verdict": "QaAccepted"})
+
+    mock_post.assert_awaited_once_with("dp1", {"verdict": "QaAccepted"})
+    assert result.qa_report_id == "report1"
+    mock_engine.upsert_entities_async.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_batched_reports_posts_with_bounded_concurrency_and_keeps_failures(mock_engine: MagicMock) -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_post(data_point_id: str, report_data: dict) -> MagicMock:  # noqa: ARG001
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if data_point_id == "dp_fail":
+            msg = "Dataland unavailable"
+            raise RuntimeError(msg)
+        return MagicMock(qa_report_id=f"report_{data_point_id}")
+
+    results = [make_result(f"dp{i}") for i in range(5)] + [make_result("dp_fail")]
+    with (
+        patch("dataland_qa_lab.data_point_flow.qa_reports.conf.qa_report_max_concurrent_posts", 2),
+        patch("dataland_qa_lab.data_point_flow.qa_reports.dataland.post_qa_report", side_effect=fake_post) as post,
+        patch("dataland_qa_lab.data_point_flow.qa_reports.db.store_data_points_in_db", new_callable=AsyncMock) as store,
+    ):
+        async with qa_reports.batched_reports():
+            for result in results:
+                await qa_reports.submit(result, {"verdict": "QaAccepted"})
+            post.assert_not_awaited()
+
+    assert post.await_count == 6
+    assert max_in_flight == 2
+    assert [result.qa_report_id for result in results[:5]] == [f"report_dp{i}" for i in range(5)]
+    assert results[5].qa_report_id is None
+    store.assert_awaited_once_with(results[:5])
+
+    entity_class, rows = mock_engine.upsert_entities_async.call_args.args
+    assert entity_class is database_tables.QaReportOutbox
+    assert [row["data_point_id"] for row in rows] == ["dp_fail"]
+    assert rows[0]["attempts"] == 1
+    assert rows[0]["last_error"] == "Dataland unavailable"
+    assert json.loads(rows[0]["report_data"]) == {"verdict": "QaAccepted"}
+
+
+@pytest.mark.asyncio
+async def test_retry_failed_reports_stores_report_ids_and_counts_attempts(mock_engine: MagicMock) -> None:
+    entries = [
+        MagicMock(data_point_id="dp1", report_data=json.dumps({"verdict": "QaAccepted"}), attempts=1, created_at=1),
+        MagicMock(data_point_id="dp2", report_data=json.dumps({"verdict": "QaRejected"}), attempts=3, created_at=2),
+    ]
+    mock_engine.list_entities_async = AsyncMock(return_value=entries)
+    mock_engine.get_entities_async = AsyncMock(return_value=[MagicMock(data_point_id="dp1", predicted_answer="12")])
+
+    def fake_post(data_point_id: str, report_data: dict) -> MagicMock:  # noqa: ARG001
+        if data_point_id == "dp2":
+            msg = "Still unavailable"
+            raise RuntimeError(msg)
+        return MagicMock(qa_report_id="report1")
+
+    with (
+        patch("dataland_qa_lab.data_point_flow.qa_reports.dataland.post_qa_report", side_effect=fake_post),
+        patch("dataland_qa_lab.data_point_flow.qa_reports.db.store_data_points_in_db", new_callable=AsyncMock) as store,
+    ):
+        assert await qa_reports.retry_failed_reports(limit=10) == 1
+
+    entity_class, order_by, limit, *conditions = mock_engine.list_entities_async.call_args.args
+    assert (entity_class, order_by, limit) == (database_tables.QaReportOutbox, "next_attempt_at", 10)
+    assert len(conditions) == 2
+    [stored] = store.call_args.args[0]
+    assert stored.data_point_id == "dp1"
+    assert stored.qa_report_id == "report1"
+    mock_engine.delete_entities_async.assert_awaited_once_with(database_tables.QaReportOutbox, "data_point_id", ["dp1"])
+    [row] = mock_engine.upsert_entities_async.call_args.args[1]
+    assert row["data_point_id"] == "dp2"
+    assert row["attempts"] == 4
+    assert row["created_at"] == 2
+    assert row["status"] == "pending"
+    assert row["next_attempt_at"] >= int(time.time()) + 4 * qa_reports.conf.qa_report_retry_delay_seconds
+    mock_engine.release_advisory_lock.assert_called_once_with(
+        mock_engine.try_advisory_lock.return_value, qa_reports.OUTBOX_LOCK
+    )
+
+
+@pytest.mark.asyncio
+async def test_retry_failed_reports_skips_when_another_replica_retries(mock_engine: MagicMock) -> None:
+    mock_engine.try_advisory_lock.return_value = None
+    mock_engine.list_entities_async = AsyncMock()
+
+    assert await qa_reports.retry_failed_reports() == 0
+
+    mock_engine.list_entities_async.assert_not_awaited()
+
+
+def test_to_outbox_row_gives_up_after_the_last_attempt() -> None:
+    entry = MagicMock(attempts=qa_reports.conf.qa_report_max_attempts - 1, created_at=1)
+
+    row = qa_reports.to_outbox_row("dp1", {"verdict": "QaAccepted"}, RuntimeError("Still unavailable"), entry)
+
+    assert row["attempts"] == qa_reports.conf.qa_report_max_attempts
+    assert row["status"] == "dead"
@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import io
+from collections.abc import Iterator
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from unittest.mock import MagicMock, patch
+
+import fitz
+import pytest
+
+from dataland_qa_lab.data_point_flow import rasterizer
+
+
+@pytest.fixture
+def sample_pdf() -> io.BytesIO:
+    """Returns a PDF with two pages."""
+    doc = fitz.open()
+    doc.new_page()
+    doc.new_page()
+    return io.BytesIO(doc.tobytes())
+
+
+@pytest.fixture
+def process_backend() -> Iterator[None]:
+    """Render in a single worker process, shut down after the test."""
+    with (
+        patch.object(rasterizer.conf, "vision_render_backend", "process"),
+        patch.object(rasterizer.conf, "vision_render_workers", 1),
+    ):
+        rasterizer.shutdown_process_pool()
+        yield
+        rasterizer.shutdown_process_pool()
+
+
+@pytest.mark.asyncio
+async def test_thread_backend(sample_pdf: io.BytesIO) -> None:
+    """Test rendering to base64-encoded JPEG images on the thread backend."""
+    images = await rasterizer.render_page_images(sample_pdf, dpi=72)
+    assert len(images) == 2
+    assert base64.b64decode(images[0]).startswith(b"\xff\xd8")
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("process_backend")
+async def test_process_backend_matches_thread_backend(sample_pdf: io.BytesIO) -> None:
+    """Test that the process backend returns the same images through shared memory."""
+    images = await rasterizer.render_page_images(sample_pdf, dpi=72)
+    with patch.object(rasterizer.conf, "vision_render_backend", "thread"):
+        expected = await rasterizer.render_page_images(sample_pdf, dpi=72)
+    assert images == expected
+
+
+def make_blocks(*contents: bytes) -> list[tuple[str, int]]:
+    """Write the contents to new shared memory blocks, as the worker processes do."""
+    blocks = []
+    for content in contents:
+        block = shared_memory.SharedMemory(create=True, size=len(content))
+        block.buf[: len(content)] = content
+        blocks.append((block.name, len(content)))
+        block.close()
+    return blocks
+
+
+def is_freed(name: str) -> bool:
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return True
+    return False
+
+
+@pytest.mark.asyncio
+async def test_shared_memory_of_cancelled_render_is_freed(sample_pdf: io.BytesIO) -> None:
+    """Test that a render whose caller was cancelled frees its shared memory once it finishes."""
+    render: Future[list[tuple[str, int]]] = Future()
+    render.set_running_or_notify_cancel()
+    pool = MagicMock()
+    pool.submit.return_value = render
+
+    with (
+        patch.object(rasterizer.conf, "vision_render_backend", "process"),
+        patch.object(rasterizer, "get_process_pool", return_value=pool),
+    ):
+        task = asyncio.create_task(rasterizer.render_page_images(sample_pdf, dpi=72))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    blocks = make_blocks(b"page 1", b"page 2")
+    render.set_result(blocks)
+
+    assert all(is_freed(name) for name, _ in blocks)
+
+
+def test_remaining_shared_memory_is_freed_if_reading_fails() -> None:
+    """Test that the blocks after one that cannot be read are freed as well."""
+    blocks = make_blocks(b"page 1", b"page 2")
+    blocks.insert(1, ("missing_block", 6))
+
+    with pytest.raises(FileNotFoundError):
+        rasterizer._read_all_shared_memory(blocks)
+
+    assert is_freed(blocks[0][0])
+    assert is_freed(blocks[2][0])
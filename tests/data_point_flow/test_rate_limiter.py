@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dataland_qa_lab.data_point_flow import rate_limiter
+from dataland_qa_lab.data_point_flow.rate_limiter import RateLimiter, TokenBucket
+
+
+def test_token_bucket_reserve_returns_wait_for_overdrawn_amount() -> None:
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+
+    assert bucket.reserve(10, now=bucket._updated_at) == 0
+    assert bucket.reserve(4, now=bucket._updated_at) == pytest.approx(2.0)
+    assert bucket.saturation(now=bucket._updated_at) == 1.0
+    assert bucket.saturation(now=bucket._updated_at + 4) == pytest.approx(0.6)
+
+
+def test_token_bucket_caps_reservations_at_capacity() -> None:
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+
+    assert bucket.reserve(50, now=bucket._updated_at) == 0
+    assert bucket.level == 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_when_budget_is_exhausted() -> None:
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+
+    with patch("dataland_qa_lab.data_point_flow.rate_limiter.asyncio.sleep") as mock_sleep:
+        await limiter.acquire("gpt-test", 6000)
+        mock_sleep.assert_not_called()
+
+        await limiter.acquire("gpt-test", 100)
+
+    assert mock_sleep.call_args.args[0] == pytest.approx(1.0, abs=0.05)
+    assert limiter.saturation("gpt-test") == 1.0
+    assert limiter.saturation("other-deployment") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_pause_holds_back_requests() -> None:
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    limiter.pause("gpt-test", 5)
+
+    with patch("dataland_qa_lab.data_point_flow.rate_limiter.asyncio.sleep") as mock_sleep:
+        await limiter.acquire("gpt-test", 1)
+
+    assert mock_sleep.call_args.args[0] == pytest.approx(5, abs=0.05)
+    assert limiter.saturation("gpt-test") == 1.0
+
+
+def test_get_retry_after_reads_headers() -> None:
+    assert rate_limiter.get_retry_after(MagicMock(response=MagicMock(headers={"retry-after": "7"}))) == 7.0
+    assert rate_limiter.get_retry_after(MagicMock(response=MagicMock(headers={"retry-after-ms": "1500"}))) == 1.5
+    assert rate_limiter.get_retry_after(MagicMock(response=MagicMock(headers={"retry-after": "soon"}))) is None
+    assert rate_limiter.get_retry_after(ValueError("no response")) is None
+
+
+def test_backoff_delay_grows_and_is_capped() -> None:
+    with patch("dataland_qa_lab.data_point_flow.rate_limiter.random.uniform", side_effect=lambda _, b: b):
+        assert rate_limiter.backoff_delay(0) == 1.0
+        assert rate_limiter.backoff_delay(3) == 8.0
+        assert rate_limiter.backoff_delay(10, cap=30.0) == 30.0
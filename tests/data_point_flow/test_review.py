@@ -1,3 +1,4 @@
+import asyncio
 import contextlib
 import io
 import json
@@ -40,6 +41,23 @@ async def test_already_validated_no_override(mock_db: MagicMock) -> None:
     mock_db.delete_existing_entry.assert_not_called()
 
 
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.review.db")
+async def test_existing_validation_is_not_looked_up_again_when_skipped(mock_db: MagicMock) -> None:
+    """Does not look up the existing validation if the caller has done so already."""
+    mock_db.check_if_already_validated = AsyncMock()
+    mock_db.store_data_point_in_db = AsyncMock()
+
+    with patch(
+        "dataland_qa_lab.data_point_flow.review.dataland.get_data_point", side_effect=ValueError("Stop")
+    ) as mock_get_data_point:
+        await validate.validate_datapoint(
+            "dp_skip", use_ocr=True, ai_model="gpt-4", override=False, skip_existing_check=True
+        )
+    mock_db.check_if_already_validated.assert_not_awaited()
+    mock_get_data_point.assert_awaited_once_with("dp_skip")
+
+
 @pytest.mark.asyncio
 @patch("dataland_qa_lab.data_point_flow.review.db")
 @patch("dataland_qa_lab.data_point_flow.review.dataland")
@@ -87,8 +105,14 @@ async def test_no_prompt_configured(mock_prompts: MagicMock, mock_dataland: Magi
 @patch("dataland_qa_lab.data_point_flow.review.prompts")
 @patch("dataland_qa_lab.data_point_flow.review.ocr")
 @patch("dataland_qa_lab.data_point_flow.review.ai")
-async def test_full_validation_workflow(
-    mock_ai: MagicMock, mock_ocr: MagicMock, mock_prompts: MagicMock, mock_dataland: MagicMock, mock_db: MagicMock
+@patch("dataland_qa_lab.data_point_flow.review.qa_reports")
+async def test_full_validation_workflow(  # noqa: PLR0913, PLR0917
+    mock_qa_reports: MagicMock,
+    mock_ai: MagicMock,
+    mock_ocr: MagicMock,
+    mock_prompts: MagicMock,
+    mock_dataland: MagicMock,
+    mock_db: MagicMock,
 ) -> None:
     """Tests full validation workflow with OCR and AI."""
     mock_db.check_if_already_validated = AsyncMock(return_value=None)
@@ -104,7 +128,7 @@ async def test_full_validation_workflow(
         )
     )
     mock_dataland.get_document = AsyncMock(return_value=io.BytesIO(b"pdf content"))
-    mock_dataland.override_dataland_qa = AsyncMock()
+    mock_qa_reports.submit = AsyncMock()
     mock_prompts.get_prompt_config.return_value = MagicMock(prompt="Answer: {context}")
     mock_ocr.run_ocr_on_document = AsyncMock(return_value="extracted text")
     mock_ai.execute_prompt = AsyncMock(
@@ -114,37 +138,39 @@ async def test_full_validation_workflow(
     result = await validate.validate_datapoint("dp123", use_ocr=True, ai_model="gpt-4", override=False)
     assert isinstance(result, models.ValidatedDatapoint)
     mock_db.store_data_point_in_db.assert_called_once()
-    mock_dataland.override_dataland_qa.assert_called_once()
+    mock_qa_reports.submit.assert_awaited_once_with(result, mock_dataland.build_qa_report_data.return_value)
+    assert mock_dataland.build_qa_report_data.call_args.kwargs["comment"] == "Reviewed by QaLab: Matches"
 
 
 @pytest.mark.asyncio
 @patch("dataland_qa_lab.data_point_flow.review.db")
 async def test_override_existing_entry(mock_db: MagicMock) -> None:
-    """Deletes existing entry if override=True and re-validates."""
+    """Re-validates if override=True, keeping the existing entry until the upsert of the new result replaces it."""
     mock_db.check_if_already_validated = AsyncMock(return_value=MagicMock())
-    mock_db.delete_existing_entry = AsyncMock()
-
     mock_db.store_data_point_in_db = AsyncMock()
 
     with (
-        patch("dataland_qa_lab.data_point_flow.review.dataland.get_data_point", side_effect=ValueError("Stop")),
+        patch(
+            "dataland_qa_lab.data_point_flow.review.dataland.get_data_point", side_effect=ValueError("Stop")
+        ) as mock_get_data_point,
         contextlib.suppress(ValueError),
     ):
         await validate.validate_datapoint("dp123", use_ocr=True, ai_model="gpt-4", override=True)
-    mock_db.delete_existing_entry.assert_awaited_once_with("dp123")
+    mock_get_data_point.assert_awaited_once_with("dp123")
+    mock_db.delete_existing_entry.assert_not_called()
 
 
 @pytest.mark.asyncio
 @patch("dataland_qa_lab.data_point_flow.review.db")
 @patch("dataland_qa_lab.data_point_flow.review.dataland")
 @patch("dataland_qa_lab.data_point_flow.review.prompts")
-@patch("dataland_qa_lab.data_point_flow.review.pdf_handler")
-@patch("dataland_qa_lab.data_point_flow.review.image_helper")
+@patch("dataland_qa_lab.data_point_flow.review.page_images")
 @patch("dataland_qa_lab.data_point_flow.review.ai")
+@patch("dataland_qa_lab.data_point_flow.review.qa_reports")
 async def test_vision_flow(  # noqa: PLR0913, PLR0917
+    mock_qa_reports: MagicMock,
     mock_ai: MagicMock,
-    mock_img_helper: MagicMock,
-    mock_pdf_handler: MagicMock,
+    mock_page_images: MagicMock,
     mock_prompts: MagicMock,
     mock_dataland: MagicMock,
     mock_db: MagicMock,
@@ -154,18 +180,19 @@ async def test_vision_flow(  # noqa: PLR0913, PLR0917
     mock_db.store_data_point_in_db = AsyncMock()
     mock_dataland.get_data_point = AsyncMock(return_value=MagicMock(value="A", file_reference="ref", page=1))
     mock_dataland.get_document = AsyncMock(return_value=io.BytesIO(b"pdf content"))
-    mock_dataland.override_dataland_qa = AsyncMock()
+    mock_qa_reports.submit = AsyncMock()
     mock_prompts.get_prompt_config.return_value = MagicMock(prompt="What is shown? {context}")
 
-    mock_pdf_handler.render_pdf_to_image.return_value = ["image"]
-    mock_img_helper.encode_image_to_base64.return_value = "base64image"
+    mock_page_images.get_page_images = AsyncMock(return_value=["aW1hZ2U="])
 
     mock_ai.execute_prompt = AsyncMock(
         return_value=MagicMock(predicted_answer="A", confidence=0.95, reasoning="Correct")
     )
 
     await validate.validate_datapoint("dp_vision", use_ocr=False, ai_model="gpt-vision", override=False)
-    mock_pdf_handler.render_pdf_to_image.assert_called()
+    mock_page_images.get_page_images.assert_awaited_once_with("ref", 1, mock_dataland.get_document.return_value)
+    assert mock_ai.execute_prompt.call_args.kwargs["images"] == ["aW1hZ2U="]
+    assert mock_ai.execute_prompt.call_args.kwargs["image_format"] == "jpeg"
 
 
 @pytest.mark.asyncio
@@ -193,11 +220,11 @@ async def test_vision_flow_vision_disabled(
 @patch("dataland_qa_lab.data_point_flow.review.db")
 @patch("dataland_qa_lab.data_point_flow.review.dataland")
 @patch("dataland_qa_lab.data_point_flow.review.prompts")
-@patch("dataland_qa_lab.data_point_flow.review.pdf_handler")
+@patch("dataland_qa_lab.data_point_flow.review.page_images")
 @patch("dataland_qa_lab.data_point_flow.review.ai")
 async def test_vision_flow_no_images_rendered(
     mock_ai: MagicMock,
-    mock_pdf_handler: MagicMock,
+    mock_page_images: MagicMock,
     mock_prompts: MagicMock,
     mock_dataland: MagicMock,
     mock_db: MagicMock,
@@ -210,9 +237,8 @@ async def test_vision_flow_no_images_rendered(
     )
     mock_prompts.get_prompt_config.return_value = MagicMock(prompt="What is shown? {context}")
     mock_dataland.get_document = AsyncMock(return_value=io.BytesIO(b"pdf content"))
-    mock_dataland.override_dataland_qa = AsyncMock()
 
-    mock_pdf_handler.render_pdf_to_image.return_value = []
+    mock_page_images.get_page_images = AsyncMock(return_value=[])
     mock_ai.execute_prompt.side_effect = Exception("No images rendered from PDF")
     result = await validate.validate_datapoint("dp_no_images", use_ocr=False, ai_model="gpt-vision", override=False)
     assert isinstance(result, models.CannotValidateDatapoint)
@@ -322,3 +348,143 @@ async def test_fetch_dependency_datapoints_skips_missing_datapoints() -> None:
             override=False,
             dataset_id=dataset_id,
         )
+
+
+@pytest.mark.asyncio
+async def test_fetch_dependency_datapoints_validates_dependencies_concurrently() -> None:
+    """Test that all dependencies are validated at the same time."""
+    running = 0
+    max_running = 0
+
+    async def fake_validate(data_point_id: str, **_: object) -> dict:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"id": data_point_id}
+
+    with (
+        patch(
+            "dataland_qa_lab.data_point_flow.review.dataland.get_contained_data_points", new_callable=AsyncMock
+        ) as mock_get,
+        patch("dataland_qa_lab.data_point_flow.review.validate_datapoint", side_effect=fake_validate),
+        patch("dataland_qa_lab.data_point_flow.review.asdict", side_effect=lambda x: x),
+    ):
+        mock_get.return_value = {"type_a": "dp_a", "type_b": "dp_b", "type_c": "dp_c"}
+
+        result = await validate.fetch_dependency_datapoints(
+            dataset_id="dataset_1", depends_on=["type_c", "type_a", "type_b"], use_ocr=True, ai_model="gpt-test"
+        )
+
+    assert max_running == 3
+    assert result.index('"dp_c"') < result.index('"dp_a"') < result.index('"dp_b"')
+
+
+@pytest.mark.asyncio
+async def test_validate_datapoint_joins_in_flight_validation() -> None:
+    """Test that concurrent validations of the same data point run only once."""
+    validated = models.CannotValidateDatapoint(
+        data_point_id="dp_shared",
+        data_point_type="number",
+        reasoning="done",
+        ai_model="gpt-test",
+        use_ocr=True,
+        override=False,
+        qa_status="QaNotAttempted",
+        timestamp=int(time.time()),
+        _prompt=None,
+    )
+
+    async def slow_validate(**_: object) -> models.CannotValidateDatapoint:
+        await asyncio.sleep(0.01)
+        return validated
+
+    with patch(
+        "dataland_qa_lab.data_point_flow.review._validate_datapoint", side_effect=slow_validate
+    ) as mock_validate:
+        results = await asyncio.gather(
+            validate.validate_datapoint("dp_shared", use_ocr=True, ai_model="gpt-test", override=False),
+            validate.validate_datapoint("dp_shared", use_ocr=True, ai_model="gpt-test", override=False),
+        )
+
+    assert results == [validated, validated]
+    mock_validate.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.review.fetch_dependency_datapoints", new_callable=AsyncMock)
+@patch("dataland_qa_lab.data_point_flow.review.prompts")
+@patch("dataland_qa_lab.data_point_flow.review.dataland")
+@patch("dataland_qa_lab.data_point_flow.review.db")
+async def test_validate_datapoint_skips_circular_dependencies(
+    mock_db: MagicMock, mock_dataland: MagicMock, mock_prompts: MagicMock, mock_fetch: AsyncMock
+) -> None:
+    """Test that dependencies depending back on the data point are not awaited."""
+    mock_db.check_if_already_validated = AsyncMock(return_value=None)
+    mock_db.store_data_point_in_db = AsyncMock()
+    mock_dataland.get_data_point = AsyncMock(return_value=MagicMock(data_point_type="type_a"))
+    mock_dataland.get_document = AsyncMock(side_effect=RuntimeError("stop after dependencies"))
+    mock_prompts.get_prompt_config.return_value = models.DataPointPrompt(
+        prompt="{context}", depends_on=["type_b", "type_c"]
+    )
+    mock_prompts.is_circular_dependency.side_effect = lambda _, dependency: dependency == "type_b"
+    mock_fetch.return_value = ""
+
+    with contextlib.suppress(RuntimeError):
+        await validate.validate_datapoint(
+            "dp_cycle", use_ocr=True, ai_model="gpt-test", override=False, dataset_id="dataset_1"
+        )
+
+    mock_fetch.assert_awaited_once_with("dataset_1", ["type_c"], True, "gpt-test")
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.data_point_flow.review.fetch_dependency_datapoints", new_callable=AsyncMock)
+@patch("dataland_qa_lab.data_point_flow.review.build_prompt_text")
+@patch("dataland_qa_lab.data_point_flow.review.prompts")
+@patch("dataland_qa_lab.data_point_flow.review.dataland")
+@patch("dataland_qa_lab.data_point_flow.review.db")
+async def test_validate_datapoint_uses_given_dependency_results(
+    mock_db: MagicMock,
+    mock_dataland: MagicMock,
+    mock_prompts: MagicMock,
+    mock_build_prompt_text: MagicMock,
+    mock_fetch: AsyncMock,
+) -> None:
+    """Test that results passed in by the planner are used instead of validating the dependencies again."""
+    mock_db.check_if_already_validated = AsyncMock(return_value=None)
+    mock_db.store_data_point_in_db = AsyncMock()
+    mock_dataland.get_data_point = AsyncMock(return_value=MagicMock(data_point_type="type_a"))
+    mock_dataland.get_document = AsyncMock(side_effect=RuntimeError("stop after dependencies"))
+    mock_prompts.get_prompt_config.return_value = models.DataPointPrompt(
+        prompt="{context}", depends_on=["type_b", "type_c"]
+    )
+    dependency_result = models.CannotValidateDatapoint(
+        data_point_id="dp_b",
+        data_point_type="type_b",
+        reasoning="no prompt",
+        ai_model="gpt-test",
+        use_ocr=True,
+        override=False,
+        qa_status="QaNotAttempted",
+        timestamp=0,
+        _prompt=None,
+    )
+
+    with (
+        patch("dataland_qa_lab.data_point_flow.review.build_dependency_context", return_value="ctx") as mock_context,
+        contextlib.suppress(RuntimeError),
+    ):
+        await validate.validate_datapoint(
+            "dp_planned",
+            use_ocr=True,
+            ai_model="gpt-test",
+            override=False,
+            dataset_id="dataset_1",
+            dependency_results={"type_b": dependency_result},
+        )
+
+    mock_fetch.assert_not_awaited()
+    mock_context.assert_called_once_with([("type_b", dependency_result)])
+    mock_build_prompt_text.assert_not_called()
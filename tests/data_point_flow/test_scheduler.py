@@ -1,20 +1,27 @@
 from __future__ import annotations
 
+import asyncio
+import threading
 import time
 from dataclasses import dataclass
 from types import SimpleNamespace
 from typing import TYPE_CHECKING, Any
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
 from dataland_qa_lab.bin.server import dataland_qa_lab
 from dataland_qa_lab.data_point_flow.scheduler import (
+    acquire_locks,
+    enqueue_pending_datasets,
+    extend_locks_periodically,
     lock_ttl_seconds,
+    process_work_queue,
     run_scheduled_processing,
-    try_acquire_lock,
+    worker_id,
 )
+from dataland_qa_lab.data_point_flow.work_queue import Lease
 
 if TYPE_CHECKING:
     from collections.abc import Iterator
@@ -30,8 +37,27 @@ def mocks():  # noqa: ANN201
         patch("dataland_qa_lab.data_point_flow.scheduler.database_tables") as db_tables,
         patch("dataland_qa_lab.data_point_flow.scheduler.review") as review,
         patch("dataland_qa_lab.data_point_flow.scheduler.slack") as slack,
-        patch("asyncio.run") as asyncio_run,
+        patch("dataland_qa_lab.data_point_flow.scheduler.db") as db,
+        patch("dataland_qa_lab.data_point_flow.scheduler.qa_reports") as qa_reports,
+        patch("dataland_qa_lab.data_point_flow.scheduler.work_queue") as work_queue,
     ):
+        queued: list[str] = []
+        work_queue.enqueue.side_effect = lambda _, item_ids: queued.extend(item_ids) or len(item_ids)
+        work_queue.get_discovery_cursor.return_value = None
+        work_queue.lease.side_effect = lambda _: [Lease(queued.pop(0), "token")] if queued else []
+        db.get_validated_data_points = AsyncMock(return_value={})
+        qa_reports.retry_failed_reports = AsyncMock(return_value=0)
+        config.scheduler_max_concurrent_datasets = 2
+        config.scheduler_max_concurrent_data_points = 2
+        config.scheduler_max_ai_saturation = 1.0
+        config.discovery_page_size = 100
+        config.datapoint_lock_heartbeat_seconds = 15
+        config.work_queue_poll_interval_seconds = 0
+        config.qa_report_retry_interval_seconds = 60
+        config.discovery_full_scan_interval_seconds = 24 * 60 * 60
+        review.validate_datapoint = AsyncMock()
+        db_engine.dispose_async_engine = AsyncMock()
+        db_engine.acquire_datapoint_locks.side_effect = lambda data_point_ids, **_: set(data_point_ids)
         yield {
             "logger": logger,
             "config": config,
@@ -39,7 +65,9 @@ def mocks():  # noqa: ANN201
             "db_tables": db_tables,
             "review": review,
             "slack": slack,
-            "asyncio_run": asyncio_run,
+            "db": db,
+            "qa_reports": qa_reports,
+            "work_queue": work_queue,
         }
 
 
@@ -72,7 +100,7 @@ def test_skip_already_processed_dataset(mocks: MagicMock) -> None:
 
     run_scheduled_processing()
 
-    mocks["asyncio_run"].assert_not_called()
+    mocks["review"].validate_datapoint.assert_not_called()
     db_engine.add_entity.assert_not_called()
 
 
@@ -83,7 +111,6 @@ def test_process_dataset_and_classify_results(mocks: MagicMock) -> None:
     slack = mocks["slack"]
     db_engine = mocks["db_engine"]
     db_tables = mocks["db_tables"]
-    asyncio_run = mocks["asyncio_run"]
 
     class ValidatedDatapoint:
         def __init__(self, data_point_id: str, qa_status: str) -> None:
@@ -129,7 +156,6 @@ def test_process_dataset_and_classify_results(mocks: MagicMock) -> None:
     config.dataland_client.qa_api.get_info_on_datasets.return_value = [dataset]
 
     db_engine.get_entity.return_value = False
-    db_engine.acquire_or_refresh_datapoint_lock.return_value = True
 
     config.dataland_client.meta_api.get_contained_data_points.return_value = {
         "k1": "dp1",
@@ -141,14 +167,20 @@ def test_process_dataset_and_classify_results(mocks: MagicMock) -> None:
     rejected_dp = ValidatedDatapoint("dp2", "QaRejected")
     cannot_dp = CannotValidateDatapoint("dp3")
 
-    asyncio_run.side_effect = [accepted_dp, rejected_dp, cannot_dp]
+    results = {"dp1": accepted_dp, "dp2": rejected_dp, "dp3": cannot_dp}
+    review.validate_datapoint.side_effect = lambda data_point_id, **_: results[data_point_id]
 
     run_scheduled_processing()
 
-    assert db_engine.get_entity.call_count == 4
-    assert db_engine.acquire_or_refresh_datapoint_lock.call_count == 3
+    assert db_engine.get_entity.call_count == 1
+    db_engine.acquire_datapoint_locks.assert_called_once_with(
+        ["dp1", "dp2", "dp3"], lock_ttl_seconds=lock_ttl_seconds, locked_by=worker_id
+    )
     assert db_engine.add_entity.call_count == 1
-    assert db_engine.delete_entity.call_count == 3
+    db_engine.release_datapoint_locks.assert_called_once_with(["dp1", "dp2", "dp3"], locked_by=worker_id)
+    # The results are stored together with the IDs of their QA reports.
+    mocks["db"].batched_writes.assert_called_once_with()
+    mocks["qa_reports"].batched_reports.assert_called_once_with()
 
     inserted_entities = [c.args[0] for c in db_engine.add_entity.call_args_list]
     inserted_reviewed = next(e for e in inserted_entities if isinstance(e, ReviewedDataset))
@@ -199,69 +231,73 @@ def test_scheduler_registers_wrapper_job(server_mocks: dict[str, Any]) -> None:
     assert passed_function == mocks["job_func"]
 
 
-def test_try_acquire_no_existing(mocks: MagicMock) -> None:
-    """Test acquiring lock when no existing lock."""
+def test_acquire_locks_returns_acquired_datapoints(mocks: MagicMock) -> None:
+    """Test that the locks of all datapoints are acquired with one call."""
     db_engine = mocks["db_engine"]
+    db_engine.acquire_datapoint_locks.side_effect = None
+    db_engine.acquire_datapoint_locks.return_value = {"dp1"}
 
-    db_engine.get_entity.return_value = None
-    db_engine.acquire_or_refresh_datapoint_lock.return_value = True
-
-    assert try_acquire_lock("dp1") is True
-    db_engine.acquire_or_refresh_datapoint_lock.assert_called_once_with(
-        data_point_id="dp1",
-        lock_ttl_seconds=lock_ttl_seconds,
+    assert acquire_locks(["dp1", "dp2"]) == {"dp1"}
+    db_engine.acquire_datapoint_locks.assert_called_once_with(
+        ["dp1", "dp2"], lock_ttl_seconds=lock_ttl_seconds, locked_by=worker_id
     )
-    db_engine.add_entity.assert_not_called()
-    db_engine.delete_entity.assert_not_called()
+    assert mocks["logger"].info.called
 
 
-def test_try_acquire_lock_existing_not_stale(mocks: MagicMock) -> None:
-    """Test acquiring lock when existing lock."""
+def test_datapoints_locked_elsewhere_are_skipped(mocks: MagicMock) -> None:
+    """Test that only datapoints whose lock was acquired are validated, and only their locks are released."""
+    config = mocks["config"]
+    review = mocks["review"]
     db_engine = mocks["db_engine"]
 
-    lock = MagicMock()
-    lock.locked_at = int(time.time())
-    db_engine.get_entity.return_value = lock
-
-    assert try_acquire_lock("dp1") is False
-    db_engine.acquire_or_refresh_datapoint_lock.assert_not_called()
-    db_engine.add_entity.assert_not_called()
-    db_engine.delete_entity.assert_not_called()
+    @dataclass
+    class ValidatedDatapoint:
+        data_point_id: str
+        qa_status: str
 
+    review.models.ValidatedDatapoint = ValidatedDatapoint
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 1
+    config.dataland_client.qa_api.get_info_on_datasets.return_value = [SimpleNamespace(data_id="D123", timestamp=1)]
+    config.dataland_client.meta_api.get_contained_data_points.return_value = {"k1": "dp1", "k2": "dp2"}
+    db_engine.get_entity.return_value = False
+    db_engine.acquire_datapoint_locks.side_effect = None
+    db_engine.acquire_datapoint_locks.return_value = {"dp2"}
+    review.validate_datapoint.side_effect = lambda data_point_id, **_: ValidatedDatapoint(data_point_id, "QaAccepted")
 
-def test_try_acquire_lock_existing_stale(mocks: MagicMock) -> None:
-    """Test acquiring lock when existing stale lock."""
-    db_engine = mocks["db_engine"]
+    run_scheduled_processing()
 
-    lock = MagicMock()
-    lock.locked_at = int(time.time()) - (lock_ttl_seconds + 1)
-    db_engine.get_entity.return_value = lock
+    review.validate_datapoint.assert_awaited_once()
+    assert review.validate_datapoint.await_args.kwargs["data_point_id"] == "dp2"
+    db_engine.release_datapoint_locks.assert_called_once_with(["dp2"], locked_by=worker_id)
+    assert "Accepted: 1" in mocks["slack"].send_slack_message.call_args[0][0]
 
-    db_engine.acquire_or_refresh_datapoint_lock.return_value = True
 
-    assert try_acquire_lock("dp1") is True
-    db_engine.acquire_or_refresh_datapoint_lock.assert_called_once_with(
-        data_point_id="dp1",
-        lock_ttl_seconds=lock_ttl_seconds,
-    )
-    db_engine.delete_entity.assert_not_called()
-    db_engine.add_entity.assert_not_called()
+def test_datapoints_validated_before_their_lock_was_taken_are_not_validated_again(mocks: MagicMock) -> None:
+    """Existing validations are looked up once per dataset, and again for the locked datapoints only."""
+    config = mocks["config"]
+    review = mocks["review"]
+    db = mocks["db"]
 
+    @dataclass
+    class ValidatedDatapoint:
+        data_point_id: str
+        qa_status: str
 
-def test_try_acquire_lock_not_acquired(mocks: MagicMock) -> None:
-    """Test that lock acquisition returns False when lock cannot be acquired."""
-    db_engine = mocks["db_engine"]
+    review.models.ValidatedDatapoint = ValidatedDatapoint
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 1
+    config.dataland_client.qa_api.get_info_on_datasets.return_value = [SimpleNamespace(data_id="D123", timestamp=1)]
+    config.dataland_client.meta_api.get_contained_data_points.return_value = {"k1": "dp1", "k2": "dp2"}
+    mocks["db_engine"].get_entity.return_value = False
+    db.get_validated_data_points.side_effect = [{}, {"dp1": ValidatedDatapoint("dp1", "QaRejected")}]
+    review.validate_datapoint.side_effect = lambda data_point_id, **_: ValidatedDatapoint(data_point_id, "QaAccepted")
 
-    db_engine.get_entity.return_value = None
-    db_engine.acquire_or_refresh_datapoint_lock.return_value = False
+    run_scheduled_processing()
 
-    assert try_acquire_lock("dp1") is False
-    db_engine.acquire_or_refresh_datapoint_lock.assert_called_once_with(
-        data_point_id="dp1",
-        lock_ttl_seconds=lock_ttl_seconds,
-    )
-    db_engine.add_entity.assert_not_called()
-    db_engine.delete_entity.assert_not_called()
+    assert [c.args[0] for c in db.get_validated_data_points.await_args_list] == [["dp1", "dp2"], ["dp1", "dp2"]]
+    review.validate_datapoint.assert_awaited_once()
+    assert review.validate_datapoint.await_args.kwargs["data_point_id"] == "dp2"
+    assert review.validate_datapoint.await_args.kwargs["skip_existing_check"] is True
+    assert "Accepted: 1, ❌ Rejected: 1" in mocks["slack"].send_slack_message.call_args[0][0]
 
 
 def test_process_dataset_continues_on_datapoint_exception(mocks: MagicMock) -> None:
@@ -269,7 +305,6 @@ def test_process_dataset_continues_on_datapoint_exception(mocks: MagicMock) -> N
     review = mocks["review"]
     slack = mocks["slack"]
     db_engine = mocks["db_engine"]
-    asyncio_run = mocks["asyncio_run"]
     logger = mocks["logger"]
 
     @dataclass
@@ -290,25 +325,27 @@ def test_process_dataset_continues_on_datapoint_exception(mocks: MagicMock) -> N
     config.dataland_client.qa_api.get_info_on_datasets.return_value = [dataset]
 
     db_engine.get_entity.return_value = False
-    db_engine.acquire_or_refresh_datapoint_lock.return_value = True
 
     config.dataland_client.meta_api.get_contained_data_points.return_value = {
         "k1": "dp1",
         "k2": "dp2",
     }
 
-    asyncio_run.side_effect = [
-        Exception("boom"),
-        ValidatedDatapoint("dp2", "QaAccepted"),
-    ]
+    def validate(data_point_id: str, **_: object) -> ValidatedDatapoint:
+        if data_point_id == "dp1":
+            msg = "boom"
+            raise RuntimeError(msg)
+        return ValidatedDatapoint("dp2", "QaAccepted")
+
+    review.validate_datapoint.side_effect = validate
 
     run_scheduled_processing()
 
-    assert asyncio_run.call_count == 2
+    assert review.validate_datapoint.await_count == 2
 
     assert logger.exception.called
 
-    assert db_engine.delete_entity.call_count == 2
+    db_engine.release_datapoint_locks.assert_called_once_with(["dp1", "dp2"], locked_by=worker_id)
 
     msg = slack.send_slack_message.call_args[0][0]
     assert "Accepted: 1" in msg
@@ -320,7 +357,6 @@ def test_process_dataset_continues_on_datapoint_timeout(mocks: MagicMock) -> Non
     review = mocks["review"]
     slack = mocks["slack"]
     db_engine = mocks["db_engine"]
-    asyncio_run = mocks["asyncio_run"]
     logger = mocks["logger"]
 
     @dataclass
@@ -336,25 +372,210 @@ def test_process_dataset_continues_on_datapoint_timeout(mocks: MagicMock) -> Non
     config.dataland_client.qa_api.get_info_on_datasets.return_value = [dataset]
 
     db_engine.get_entity.return_value = False
-    db_engine.acquire_or_refresh_datapoint_lock.return_value = True
 
     config.dataland_client.meta_api.get_contained_data_points.return_value = {
         "k1": "dp1",
         "k2": "dp2",
     }
 
-    asyncio_run.side_effect = [
-        TimeoutError(),
-        ValidatedDatapoint("dp2", "QaAccepted"),
-    ]
+    def validate(data_point_id: str, **_: object) -> ValidatedDatapoint:
+        if data_point_id == "dp1":
+            raise TimeoutError
+        return ValidatedDatapoint("dp2", "QaAccepted")
+
+    review.validate_datapoint.side_effect = validate
 
     run_scheduled_processing()
 
-    assert asyncio_run.call_count == 2
-    assert db_engine.delete_entity.call_count == 2
+    assert review.validate_datapoint.await_count == 2
+    db_engine.release_datapoint_locks.assert_called_once_with(["dp1", "dp2"], locked_by=worker_id)
 
     assert logger.warning.called
 
     msg = slack.send_slack_message.call_args[0][0]
     assert "Accepted: 1" in msg
     assert "Not validated: 1" in msg
+
+
+def test_process_dataset_respects_data_point_concurrency_limit(mocks: MagicMock) -> None:
+    """Datapoints should overlap, but never exceed the configured number of workers."""
+    config = mocks["config"]
+    review = mocks["review"]
+    db_engine = mocks["db_engine"]
+
+    @dataclass
+    class ValidatedDatapoint:
+        data_point_id: str
+        qa_status: str
+
+    review.models.ValidatedDatapoint = ValidatedDatapoint
+
+    dataset = MagicMock()
+    dataset.data_id = "D123"
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 1
+    config.dataland_client.qa_api.get_info_on_datasets.return_value = [dataset]
+    config.dataland_client.meta_api.get_contained_data_points.return_value = {f"k{i}": f"dp{i}" for i in range(6)}
+
+    db_engine.get_entity.return_value = False
+
+    running = 0
+    max_running = 0
+
+    async def validate(data_point_id: str, **_: object) -> ValidatedDatapoint:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return ValidatedDatapoint(data_point_id, "QaAccepted")
+
+    review.validate_datapoint.side_effect = validate
+
+    run_scheduled_processing()
+
+    assert review.validate_datapoint.await_count == 6
+    assert max_running == 2
+    assert "Accepted: 6" in mocks["slack"].send_slack_message.call_args[0][0]
+
+
+def test_failed_dataset_is_released_for_retry(mocks: MagicMock) -> None:
+    """A dataset that fails goes back to the work queue, while the others are completed."""
+    config = mocks["config"]
+    db_engine = mocks["db_engine"]
+    work_queue = mocks["work_queue"]
+
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 2
+    config.dataland_client.qa_api.get_info_on_datasets.return_value = [
+        SimpleNamespace(data_id="D_ok", timestamp=2),
+        SimpleNamespace(data_id="D_fail", timestamp=1),
+    ]
+    db_engine.get_entity.return_value = False
+    config.dataland_client.meta_api.get_contained_data_points.side_effect = lambda dataset_id: (
+        {} if dataset_id == "D_ok" else (_ for _ in ()).throw(RuntimeError("meta api down"))
+    )
+
+    with pytest.raises(RuntimeError, match="meta api down"):
+        run_scheduled_processing()
+
+    work_queue.enqueue.assert_called_once_with(work_queue.DATASET, ["D_fail", "D_ok"])
+    work_queue.complete.assert_called_once_with(work_queue.DATASET, Lease("D_ok", "token"))
+    work_queue.fail.assert_called_once_with(work_queue.DATASET, Lease("D_fail", "token"), "meta api down")
+
+
+@pytest.mark.asyncio
+async def test_queue_workers_keep_running_on_errors_until_stopped(mocks: MagicMock) -> None:
+    """Long-running workers log unexpected errors and failed datasets instead of stopping or collecting them."""
+    config = mocks["config"]
+    work_queue = mocks["work_queue"]
+    config.scheduler_max_concurrent_datasets = 1
+    config.dataland_client.meta_api.get_contained_data_points.side_effect = RuntimeError("meta api down")
+    mocks["db_engine"].get_entity.return_value = False
+    stop = threading.Event()
+    leases = [RuntimeError("database down"), [Lease("D_fail", "token")]]
+
+    def lease(_: str) -> list[str]:
+        if not leases:
+            stop.set()
+            return []
+        outcome = leases.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    work_queue.lease.side_effect = lease
+
+    await process_work_queue(stop)
+
+    work_queue.fail.assert_called_once_with(work_queue.DATASET, Lease("D_fail", "token"), "meta api down")
+    assert mocks["logger"].exception.call_count == 2
+    mocks["qa_reports"].retry_failed_reports.assert_awaited_once_with()
+
+
+def test_enqueue_pending_datasets_stops_at_the_high_water_mark(mocks: MagicMock) -> None:
+    """Only datasets newer than the last run are read and queued, page by page."""
+    config = mocks["config"]
+    work_queue = mocks["work_queue"]
+    config.discovery_page_size = 2
+    work_queue.get_discovery_cursor.return_value = SimpleNamespace(high_water_mark=5, last_full_scan_at=time.time())
+
+    pages = [
+        [SimpleNamespace(data_id="D9", timestamp=9), SimpleNamespace(data_id="D8", timestamp=8)],
+        [SimpleNamespace(data_id="D6", timestamp=6), SimpleNamespace(data_id="D4", timestamp=4)],
+        [SimpleNamespace(data_id="D3", timestamp=3), SimpleNamespace(data_id="D2", timestamp=2)],
+    ]
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 6
+    config.dataland_client.qa_api.get_info_on_datasets.side_effect = lambda chunk_index, **_: pages[chunk_index]
+
+    assert enqueue_pending_datasets() == 3
+
+    assert [c.args[1] for c in work_queue.enqueue.call_args_list] == [["D8", "D9"], ["D6"]]
+    assert config.dataland_client.qa_api.get_info_on_datasets.call_count == 2
+    work_queue.save_discovery_cursor.assert_called_once_with(
+        "pending_datasets:sfdr", 9, work_queue.get_discovery_cursor.return_value.last_full_scan_at
+    )
+
+
+def test_enqueue_pending_datasets_reads_everything_once_the_full_scan_is_due(mocks: MagicMock) -> None:
+    """Older datasets missing from the listing when the high-water mark was set are found by the full scan."""
+    config = mocks["config"]
+    work_queue = mocks["work_queue"]
+    work_queue.get_discovery_cursor.return_value = SimpleNamespace(high_water_mark=5, last_full_scan_at=0)
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 1
+    config.dataland_client.qa_api.get_info_on_datasets.return_value = [SimpleNamespace(data_id="D1", timestamp=1)]
+
+    assert enqueue_pending_datasets() == 1
+
+    work_queue.enqueue.assert_called_once_with(work_queue.DATASET, ["D1"])
+    _, high_water_mark, last_full_scan_at = work_queue.save_discovery_cursor.call_args.args
+    assert high_water_mark == 5
+    assert last_full_scan_at > 0
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_extends_held_locks_and_drops_lost_ones(mocks: MagicMock) -> None:
+    """The heartbeat extends all held locks in one call and stops extending the ones taken over elsewhere."""
+    config = mocks["config"]
+    db_engine = mocks["db_engine"]
+    config.datapoint_lock_heartbeat_seconds = 0
+    db_engine.extend_datapoint_locks.return_value = {"dp1"}
+
+    heartbeat = asyncio.create_task(extend_locks_periodically(["dp1", "dp2"]))
+    while db_engine.extend_datapoint_locks.call_count < 2:  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+    heartbeat.cancel()
+
+    first, second = db_engine.extend_datapoint_locks.call_args_list[:2]
+    assert first.args == (["dp1", "dp2"], worker_id)
+    assert second.args == (["dp1"], worker_id)
+    assert mocks["logger"].warning.call_count == 1
+
+
+def test_enqueue_pending_datasets_keeps_the_high_water_mark_if_a_page_cannot_be_queued(mocks: MagicMock) -> None:
+    """A page that cannot be queued is read again in the next run, instead of being skipped until the full scan."""
+    config = mocks["config"]
+    work_queue = mocks["work_queue"]
+    config.discovery_page_size = 1
+    work_queue.get_discovery_cursor.return_value = SimpleNamespace(high_water_mark=5, last_full_scan_at=time.time())
+    pages = [[SimpleNamespace(data_id="D9", timestamp=9)], [SimpleNamespace(data_id="D8", timestamp=8)]]
+    config.dataland_client.qa_api.get_number_of_pending_datasets.return_value = 2
+    config.dataland_client.qa_api.get_info_on_datasets.side_effect = lambda chunk_index, **_: pages[chunk_index]
+    work_queue.enqueue.side_effect = [1, None]
+
+    assert enqueue_pending_datasets() == 1
+
+    work_queue.save_discovery_cursor.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_extends_the_lease_of_the_dataset(mocks: MagicMock) -> None:
+    """The lease of the dataset is extended on the heartbeat of the datapoint locks, until it is lost."""
+    mocks["config"].datapoint_lock_heartbeat_seconds = 0
+    work_queue = mocks["work_queue"]
+    work_queue.extend_lease.side_effect = [True, False]
+    lease = Lease("D1", "token")
+
+    await asyncio.wait_for(extend_locks_periodically([], lease), timeout=1)
+
+    assert work_queue.extend_lease.call_args_list == [((work_queue.DATASET, lease),)] * 2
+    mocks["db_engine"].extend_datapoint_locks.assert_not_called()
+    mocks["logger"].warning.assert_called_once()
@@ -0,0 +1,97 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+
+from dataland_qa_lab.data_point_flow import work_queue
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_enqueue_skips_items_queued_before(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+    session.execute.return_value.all.return_value = [(1,)]
+
+    assert work_queue.enqueue(work_queue.DATASET, ["D1", "D2", "D1"]) == 1
+
+    statement = session.execute.call_args.args[0]
+    compiled = statement.compile(dialect=postgresql.dialect())
+    assert "ON CONFLICT (kind, item_id) DO NOTHING" in str(compiled)
+    assert [value for key, value in compiled.params.items() if key.startswith("item_id")] == ["D1", "D2"]
+    session.commit.assert_called_once()
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_enqueue_tells_database_errors_from_items_queued_before(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+    session.execute.side_effect = SQLAlchemyError("down")
+
+    assert work_queue.enqueue(work_queue.DATASET, ["D1"]) is None
+    session.rollback.assert_called_once()
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_lease_skips_items_locked_by_other_workers(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+    session.execute.return_value.scalars.return_value.all.return_value = ["D1"]
+
+    [leased] = work_queue.lease(work_queue.DATASET, limit=3)
+
+    assert leased.item_id == "D1"
+    expire, take = session.execute.call_args_list
+    assert "SET status = 'failed'" in str(expire.args[0])
+    assert "attempts >= :max_attempts" in str(expire.args[0])
+    statement, params = take.args
+    assert "FOR UPDATE SKIP LOCKED" in str(statement)
+    assert params["kind"] == work_queue.DATASET
+    assert params["limit"] == 3
+    assert params["token"] == leased.token
+    assert params["leased_until"] - params["now"] == int(work_queue.conf.work_queue_visibility_timeout_seconds)
+    session.commit.assert_called_once()
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_lease_returns_nothing_on_database_error(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+    session.execute.side_effect = SQLAlchemyError("down")
+
+    assert work_queue.lease(work_queue.DATASET) == []
+    session.rollback.assert_called_once()
+    session.close.assert_called_once()
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_fail_retries_until_the_attempts_run_out(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+
+    assert work_queue.fail(work_queue.DATASET, work_queue.Lease("D1", "token"), "boom") is True
+
+    statement, params = session.execute.call_args.args
+    assert "WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending'" in str(statement)
+    assert "status = 'leased' AND lease_token = :token" in str(statement)
+    assert params["token"] == "token"
+    assert params["error"] == "boom"
+    assert params["max_attempts"] == work_queue.conf.work_queue_max_attempts
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_complete_leaves_items_leased_again_by_another_worker(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+    session.execute.return_value.rowcount = 0
+
+    assert work_queue.complete(work_queue.DATASET, work_queue.Lease("D1", "expired")) is False
+
+    statement, params = session.execute.call_args.args
+    assert "status = 'leased' AND lease_token = :token" in str(statement)
+    assert params["token"] == "expired"
+
+
+@patch("dataland_qa_lab.data_point_flow.work_queue.database_engine")
+def test_extend_lease_moves_the_visibility_timeout(mock_engine: MagicMock) -> None:
+    session = mock_engine.SessionLocal.return_value
+    session.execute.return_value.rowcount = 1
+
+    assert work_queue.extend_lease(work_queue.DATASET, work_queue.Lease("D1", "token")) is True
+
+    _, params = session.execute.call_args.args
+    assert params["leased_until"] >= time.time() + work_queue.conf.work_queue_visibility_timeout_seconds - 1
@@ -1,10 +1,13 @@
-from unittest.mock import MagicMock, patch
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from dataland_qa_lab.database import database_engine
+from dataland_qa_lab.database.database_tables import Base, CachedDocument
 
 
 @pytest.fixture
@@ -26,6 +29,36 @@ def test_create_tables(mock_create_all: MagicMock) -> None:
     mock_create_all.assert_called_once_with(bind=database_engine.engine)
 
 
+@patch("dataland_qa_lab.database.database_engine.inspect")
+@patch("dataland_qa_lab.database.database_engine.engine")
+@patch("dataland_qa_lab.database.database_engine.Base.metadata.create_all")
+def test_create_tables_adds_missing_indexes(
+    mock_create_all: MagicMock, mock_engine: MagicMock, mock_inspect: MagicMock
+) -> None:
+    """Test that indexes are added to existing tables after removing the duplicates they would reject."""
+    connection = mock_engine.begin.return_value.__enter__.return_value
+    mock_inspect.return_value.get_indexes.return_value = []
+
+    with patch("sqlalchemy.Index.create") as mock_index_create:
+        assert database_engine.create_tables() is True
+
+    mock_create_all.assert_called_once_with(bind=mock_engine)
+    assert "DELETE FROM cached_documents" in str(connection.execute.call_args.args[0])
+    mock_index_create.assert_any_call(bind=connection, checkfirst=True)
+
+
+@patch("dataland_qa_lab.database.database_engine.inspect")
+def test_remove_duplicate_cached_documents_once_the_unique_index_exists(mock_inspect: MagicMock) -> None:
+    """Test that the duplicates are only removed as long as the unique index is missing."""
+    connection = MagicMock()
+    mock_inspect.return_value.get_indexes.return_value = [{"name": "ux_cached_documents_file_reference_page"}]
+
+    database_engine.remove_duplicate_cached_documents(connection)
+
+    mock_inspect.return_value.get_indexes.assert_called_once_with("cached_documents")
+    connection.execute.assert_not_called()
+
+
 @patch("dataland_qa_lab.database.database_engine.SessionLocal")
 def test_add_entity(mock_session_local: MagicMock) -> None:
     """Test to ensure adding an entity works as intended."""
@@ -198,49 +231,267 @@ def test_delete_entity_database_error(mock_inspect: MagicMock, mock_session_loca
 
 
 @patch("dataland_qa_lab.database.database_engine.SessionLocal")
-def test_acquire_or_refresh_datapoint_lock_acquired(mock_session_local: MagicMock) -> None:
+def test_acquire_datapoint_locks_acquires_in_one_statement(mock_session_local: MagicMock) -> None:
     mock_session = MagicMock()
     mock_session_local.return_value = mock_session
+    mock_session.execute.return_value.scalars.return_value.all.return_value = ["dp-1"]
 
-    mock_result = MagicMock()
-    mock_result.first.return_value = ("some-id",)  # anything non-None
-    mock_session.execute.return_value = mock_result
-
-    result = database_engine.acquire_or_refresh_datapoint_lock("dp-1", lock_ttl_seconds=60)
+    result = database_engine.acquire_datapoint_locks(["dp-1", "dp-2", "dp-1"], lock_ttl_seconds=60, locked_by="w1")
 
-    assert result is True
+    assert result == {"dp-1"}
     mock_session.execute.assert_called_once()
+    statement, params = mock_session.execute.call_args.args
+    assert "unnest(:ids)" in str(statement)
+    assert params["ids"] == ["dp-1", "dp-2"]
+    assert params["now_ts"] - params["stale_before"] == 60
+    assert params["locked_by"] == "w1"
     mock_session.commit.assert_called_once()
     mock_session.close.assert_called_once()
 
 
 @patch("dataland_qa_lab.database.database_engine.SessionLocal")
-def test_acquire_or_refresh_datapoint_lock_not_acquired(mock_session_local: MagicMock) -> None:
+def test_acquire_datapoint_locks_without_ids_skips_the_query(mock_session_local: MagicMock) -> None:
+    assert database_engine.acquire_datapoint_locks([], lock_ttl_seconds=60, locked_by="w1") == set()
+    mock_session_local.assert_not_called()
+
+
+@patch("dataland_qa_lab.database.database_engine.SessionLocal")
+def test_acquire_datapoint_locks_database_error(mock_session_local: MagicMock) -> None:
     mock_session = MagicMock()
     mock_session_local.return_value = mock_session
 
-    mock_result = MagicMock()
-    mock_result.first.return_value = None
-    mock_session.execute.return_value = mock_result
+    mock_session.execute.side_effect = SQLAlchemyError("DB Error")
 
-    result = database_engine.acquire_or_refresh_datapoint_lock("dp-1", lock_ttl_seconds=60)
+    result = database_engine.acquire_datapoint_locks(["dp-1"], lock_ttl_seconds=60, locked_by="w1")
 
-    assert result is False
-    mock_session.execute.assert_called_once()
-    mock_session.commit.assert_called_once()
+    assert result == set()
+    mock_session.rollback.assert_called_once()
     mock_session.close.assert_called_once()
+    mock_session.commit.assert_not_called()
 
 
 @patch("dataland_qa_lab.database.database_engine.SessionLocal")
-def test_acquire_or_refresh_datapoint_lock_database_error(mock_session_local: MagicMock) -> None:
+def test_release_datapoint_locks_deletes_in_one_statement(mock_session_local: MagicMock) -> None:
     mock_session = MagicMock()
     mock_session_local.return_value = mock_session
 
+    assert database_engine.release_datapoint_locks(["dp-1", "dp-2"], locked_by="w1") is True
+
+    statement, params = mock_session.execute.call_args.args
+    assert "data_point_id = ANY(:ids) AND locked_by = :locked_by" in str(statement)
+    assert params == {"ids": ["dp-1", "dp-2"], "locked_by": "w1"}
+    mock_session.commit.assert_called_once()
+
+
+@patch("dataland_qa_lab.database.database_engine.SessionLocal")
+def test_extend_datapoint_locks_renews_only_own_locks(mock_session_local: MagicMock) -> None:
+    mock_session = MagicMock()
+    mock_session_local.return_value = mock_session
+    mock_session.execute.return_value.scalars.return_value.all.return_value = ["dp-1"]
+
+    assert database_engine.extend_datapoint_locks(["dp-1", "dp-2"], locked_by="w1") == {"dp-1"}
+
+    statement, params = mock_session.execute.call_args.args
+    assert "locked_by = :locked_by" in str(statement)
+    assert params["ids"] == ["dp-1", "dp-2"]
+    mock_session.commit.assert_called_once()
+
+
+@patch("dataland_qa_lab.database.database_engine.SessionLocal")
+def test_extend_datapoint_locks_database_error(mock_session_local: MagicMock) -> None:
+    mock_session = MagicMock()
+    mock_session_local.return_value = mock_session
     mock_session.execute.side_effect = SQLAlchemyError("DB Error")
 
-    result = database_engine.acquire_or_refresh_datapoint_lock("dp-1", lock_ttl_seconds=60)
+    assert database_engine.extend_datapoint_locks(["dp-1"], locked_by="w1") is None
+    mock_session.rollback.assert_called_once()
+
+
+@patch("dataland_qa_lab.database.database_engine.inspect")
+def test_add_missing_columns_adds_new_nullable_columns(mock_inspect: MagicMock) -> None:
+    connection = MagicMock()
+    connection.dialect = postgresql.dialect()
+    mock_inspect.return_value.get_columns.side_effect = lambda table_name: [
+        {"name": column.name}
+        for column in Base.metadata.tables[table_name].columns
+        if (table_name, column.name) != ("datapoint_in_review", "locked_by")
+    ]
+
+    database_engine.add_missing_columns(connection)
+
+    [statement] = [str(c.args[0]) for c in connection.execute.call_args_list]
+    assert statement == "ALTER TABLE datapoint_in_review ADD COLUMN IF NOT EXISTS locked_by VARCHAR"
+
+
+@patch("dataland_qa_lab.database.database_engine.lock_engine")
+def test_advisory_lock_acquired_and_released(mock_engine: MagicMock) -> None:
+    connection = mock_engine.connect.return_value
+    connection.execute.return_value.scalar.return_value = True
+
+    with database_engine.advisory_lock("ocr:ref:1", timeout=1) as acquired:
+        assert acquired is True
+        connection.close.assert_not_called()
+
+    key = database_engine.get_advisory_lock_key("ocr:ref:1")
+    assert connection.execute.call_args_list[0].args[1] == {"key": key}
+    assert "pg_advisory_unlock" in str(connection.execute.call_args_list[1].args[0])
+    connection.close.assert_called_once()
+
+
+@patch("dataland_qa_lab.database.database_engine.time.sleep")
+@patch("dataland_qa_lab.database.database_engine.lock_engine")
+def test_advisory_lock_waits_for_other_holder(mock_engine: MagicMock, mock_sleep: MagicMock) -> None:
+    connection = mock_engine.connect.return_value
+    connection.execute.return_value.scalar.side_effect = [False, False, True, None]
+
+    with database_engine.advisory_lock("ocr:ref:1", timeout=10, poll_interval=0.1) as acquired:
+        assert acquired is True
+
+    assert mock_sleep.call_count == 2
+    assert mock_engine.connect.call_count == 3
+
+
+@patch("dataland_qa_lab.database.database_engine.lock_engine")
+def test_advisory_lock_runs_without_lock_on_database_error(mock_engine: MagicMock) -> None:
+    mock_engine.connect.return_value.execute.side_effect = SQLAlchemyError("DB Error")
+
+    with database_engine.advisory_lock("ocr:ref:1", timeout=10) as acquired:
+        assert acquired is False
+
+    mock_engine.connect.return_value.close.assert_called_once()
+
+
+@patch("dataland_qa_lab.database.database_engine._held_advisory_locks", threading.BoundedSemaphore(1))
+def test_release_advisory_lock_discards_connection_on_error() -> None:
+    database_engine._held_advisory_locks.acquire()
+    connection = MagicMock()
+    connection.execute.side_effect = SQLAlchemyError("DB Error")
+
+    database_engine.release_advisory_lock(connection, "ocr:ref:1")
+
+    connection.invalidate.assert_called_once()
+    connection.close.assert_called_once()
+    assert database_engine._held_advisory_locks.acquire(blocking=False)
+
+
+@patch("dataland_qa_lab.database.database_engine._held_advisory_locks", threading.BoundedSemaphore(1))
+@patch("dataland_qa_lab.database.database_engine.lock_engine")
+def test_try_advisory_lock_caps_the_locks_held_at_once(mock_engine: MagicMock) -> None:
+    mock_engine.connect.return_value.execute.return_value.scalar.return_value = True
+
+    first = database_engine.try_advisory_lock("ocr:ref:1")
+    assert database_engine.try_advisory_lock("ocr:ref:2") is None
+    mock_engine.connect.assert_called_once()
+
+    database_engine.release_advisory_lock(first, "ocr:ref:1")
+    assert database_engine.try_advisory_lock("ocr:ref:2") is not None
+
+
+@patch("dataland_qa_lab.database.database_engine.SessionLocal")
+def test_upsert_entities_updates_on_conflict(mock_session_local: MagicMock) -> None:
+    mock_session = mock_session_local.return_value
+
+    result = database_engine.upsert_entities(
+        CachedDocument,
+        [{"file_name": "f.pdf", "file_reference": "ref", "ocr_output": "text", "page": 1}],
+        conflict_columns=["file_reference", "page"],
+    )
+
+    assert result is True
+    statement = str(mock_session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (file_reference, page) DO UPDATE" in statement
+    assert "ocr_output = excluded.ocr_output" in statement
+    mock_session.commit.assert_called_once()
+    mock_session.close.assert_called_once()
+
+
+@patch("dataland_qa_lab.database.database_engine.SessionLocal")
+def test_upsert_entities_database_error(mock_session_local: MagicMock) -> None:
+    mock_session = mock_session_local.return_value
+    mock_session.execute.side_effect = SQLAlchemyError("DB Error")
+
+    result = database_engine.upsert_entities(
+        CachedDocument, [{"file_reference": "ref", "page": 1}], conflict_columns=["file_reference", "page"]
+    )
 
     assert result is False
     mock_session.rollback.assert_called_once()
     mock_session.close.assert_called_once()
-    mock_session.commit.assert_not_called()
+
+
+def test_cached_documents_are_unique_per_page() -> None:
+    indexes = {index.name: index for index in CachedDocument.__table__.indexes}
+    index = indexes["ux_cached_documents_file_reference_page"]
+    assert index.unique
+    assert [column.name for column in index.columns] == ["file_reference", "page"]
+
+
+def test_get_async_database_url() -> None:
+    url = database_engine.get_async_database_url("postgresql+pg8000://user:pw@host:5432/db?sslmode=require")
+
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.host == "host"
+    assert url.database == "db"
+    assert dict(url.query) == {"ssl": "require"}
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.database.database_engine.create_async_engine")
+async def test_get_async_engine_is_created_once_per_event_loop(mock_create_async_engine: MagicMock) -> None:
+    mock_create_async_engine.return_value.dispose = AsyncMock()
+
+    first = database_engine.get_async_engine()
+    second = database_engine.get_async_engine()
+    await database_engine.dispose_async_engine()
+
+    assert first is second
+    mock_create_async_engine.assert_called_once()
+    first.dispose.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.database.database_engine.get_async_session")
+async def test_get_entity_async_does_not_commit(mock_get_async_session: MagicMock) -> None:
+    rows = MagicMock()
+    rows.scalars.return_value.first.return_value = "entity"
+    session = MagicMock(execute=AsyncMock(return_value=rows), commit=AsyncMock())
+    mock_get_async_session.return_value.__aenter__.return_value = session
+
+    result = await database_engine.get_entity_async(CachedDocument, file_reference="ref", page=1)
+
+    assert result == "entity"
+    statement = str(session.execute.call_args.args[0])
+    assert "WHERE cached_documents.file_reference = :file_reference_1 AND cached_documents.page = :page_1" in statement
+    session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.database.database_engine.get_async_session")
+async def test_add_entity_async_rolls_back_on_error(mock_get_async_session: MagicMock) -> None:
+    session = MagicMock(commit=AsyncMock(side_effect=SQLAlchemyError("DB Error")), rollback=AsyncMock())
+    mock_get_async_session.return_value.__aenter__.return_value = session
+
+    result = await database_engine.add_entity_async(MagicMock())
+
+    assert result is False
+    session.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("dataland_qa_lab.database.database_engine.get_async_session")
+async def test_get_entities_async_uses_one_in_query(mock_get_async_session: MagicMock) -> None:
+    rows = MagicMock()
+    rows.scalars.return_value.all.return_value = ["a", "b"]
+    session = MagicMock(execute=AsyncMock(return_value=rows))
+    mock_get_async_session.return_value.__aenter__.return_value = session
+
+    result = await database_engine.get_entities_async(CachedDocument, "file_reference", ["ref1", "ref2"])
+
+    assert result == ["a", "b"]
+    session.execute.assert_awaited_once()
+    assert "cached_documents.file_reference IN" in str(session.execute.call_args.args[0])
+
+
+@pytest.mark.asyncio
+async def test_get_entities_async_without_values_skips_the_query() -> None:
+    assert await database_engine.get_entities_async(CachedDocument, "file_reference", []) == []
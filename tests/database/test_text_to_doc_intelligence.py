@@ -1,8 +1,7 @@
 from types import SimpleNamespace
-from unittest.mock import ANY, MagicMock, patch
+from unittest.mock import MagicMock, patch
 
 import pypdf
-from azure.ai.documentintelligence.models import AnalyzeResult
 
 from dataland_qa_lab.pages.text_to_doc_intelligence import (
     extract_pdf,
@@ -12,33 +11,15 @@ from dataland_qa_lab.pages.text_to_doc_intelligence import (
 
 dummy_pdf = b"%PDF-1.4 dummy content"
 
-mock_config = MagicMock()
-mock_config.azure_docintel_api_key = "fake_key"
-mock_config.azure_docintel_endpoint = "fake_endpoint"
 
-
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.config", new=mock_config)
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.DocumentIntelligenceClient")
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.AzureKeyCredential")
-def test_extract_text_of_pdf(mock_credential: MagicMock, mock_client: MagicMock) -> None:
+@patch("dataland_qa_lab.pages.text_to_doc_intelligence.document_intelligence")
+def test_extract_text_of_pdf(mock_document_intelligence: MagicMock) -> None:
     mock_pdf = MagicMock()
-    mock_result = MagicMock(spec=AnalyzeResult)
-    mock_result.content = "content"
-    mock_poller = MagicMock()
-    mock_poller.result.return_value = mock_result
-    mock_client_instance = mock_client.return_value
-    mock_client_instance.begin_analyze_document.return_value = mock_poller
-    mock_config.return_value = MagicMock(azure_docintel_api_key="fake_key", azure_docintel_endpoint="fake_endpoint")
+    mock_document_intelligence.extract_markdown.return_value = "content"
 
     result = old_extract_text_of_pdf(mock_pdf)
 
-    mock_client.assert_called_once_with(endpoint="fake_endpoint", credential=mock_credential.return_value)
-    mock_client_instance.begin_analyze_document.assert_called_once_with(
-        "prebuilt-layout",
-        body=mock_pdf,
-        content_type="application/octet-stream",
-        output_content_format="markdown",
-    )
+    mock_document_intelligence.extract_markdown.assert_called_once_with(mock_pdf)
     assert result == "content"
 
 
@@ -175,66 +156,12 @@ def test_get_markdown_from_dataset_updates_existing_llm_version(
 
 
 # for the new method
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.DocumentIntelligenceClient")
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.config", new=mock_config)
-def test_extract_pdf_calls_client(mock_docintel_client_class: MagicMock) -> None:
-    """Test that extract_pdf calls DocumentIntelligenceClient with correct parameters."""
-    mock_client = MagicMock()
-    mock_docintel_client_class.return_value = mock_client
-
-    mock_poller = MagicMock()
-    mock_client.begin_analyze_document.return_value = mock_poller
-
-    mock_result = MagicMock()
-    mock_result.content = "Extracted text"
-    mock_poller.result.return_value = mock_result
+@patch("dataland_qa_lab.pages.text_to_doc_intelligence.document_intelligence")
+def test_extract_pdf_uses_shared_client(mock_document_intelligence: MagicMock) -> None:
+    """Test that extract_pdf runs the document through the shared Document Intelligence client."""
+    mock_document_intelligence.extract_markdown.return_value = "Extracted text"
 
     result = extract_pdf(dummy_pdf)
 
-    mock_docintel_client_class.assert_called_once_with(endpoint=mock_config.azure_docintel_endpoint, credential=ANY)
-    mock_client.begin_analyze_document.assert_called_once_with(
-        "prebuilt-layout",
-        body=dummy_pdf,
-        content_type="application/octet-stream",
-        output_content_format=mock_docintel_client_class.return_value.begin_analyze_document.call_args[1][
-            "output_content_format"
-        ],
-    )
+    mock_document_intelligence.extract_markdown.assert_called_once_with(dummy_pdf)
     assert result == "Extracted text"
-
-
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.DocumentIntelligenceClient")
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.config", new=mock_config)
-def test_extract_pdf_returns_content(mock_docintel_client_class: MagicMock) -> None:
-    """Test that extract_pdf returns the correct content from the OCR process."""
-    mock_client = MagicMock()
-    mock_docintel_client_class.return_value = mock_client
-
-    mock_poller = MagicMock()
-    mock_client.begin_analyze_document.return_value = mock_poller
-
-    expected_content = "This is a test document."
-    mock_result = MagicMock()
-    mock_result.content = expected_content
-    mock_poller.result.return_value = mock_result
-
-    result = extract_pdf(dummy_pdf)
-    assert result == expected_content
-
-
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.AzureKeyCredential")
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.DocumentIntelligenceClient")
-@patch("dataland_qa_lab.pages.text_to_doc_intelligence.config", new=mock_config)
-def test_extract_pdf_uses_credential(mock_docintel_client_class: MagicMock, mock_azure_key_cred: MagicMock) -> None:
-    """Test that extract_pdf uses AzureKeyCredential with the correct API key."""
-    mock_client = MagicMock()
-    mock_docintel_client_class.return_value = mock_client
-    mock_poller = MagicMock()
-    mock_client.begin_analyze_document.return_value = mock_poller
-    mock_result = MagicMock()
-    mock_result.content = "text"
-    mock_poller.result.return_value = mock_result
-
-    extract_pdf(dummy_pdf)
-
-    mock_azure_key_cred.assert_called_once_with(mock_config.azure_docintel_api_key)
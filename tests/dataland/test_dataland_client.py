@@ -1,3 +1,4 @@
+import socket
 from unittest.mock import MagicMock, PropertyMock, patch
 
 import pytest
@@ -160,3 +161,39 @@ def test_eu_taxonomy_nuclear_gas_qa_api(mock_api: MagicMock, client: MagicMock)
         result = client.eu_taxonomy_nuclear_gas_qa_api
     assert result == "nuclear_gas_qa_api_instance"
     mock_api.assert_called_once_with("mocked_qa_client")
+
+
+@patch("dataland_qa_lab.dataland.dataland_client.dataland_backend.MetaDataControllerApi")
+@patch("dataland_qa_lab.dataland.dataland_client.dataland_backend.DataPointControllerApi")
+@patch("dataland_qa_lab.dataland.dataland_client.dataland_backend.ApiClient")
+@patch("dataland_qa_lab.dataland.dataland_client.dataland_backend.Configuration")
+def test_api_clients_are_reused(
+    mock_config: MagicMock,
+    mock_api_client: MagicMock,
+    mock_data_points_api: MagicMock,
+    mock_meta_api: MagicMock,
+    client: MagicMock,
+) -> None:
+    """Test that repeated accesses share one API client and accessor."""
+    first = client.data_points_api
+    second = client.data_points_api
+    _ = client.meta_api
+
+    assert first is second
+    mock_config.assert_called_once()
+    mock_api_client.assert_called_once_with(mock_config.return_value)
+    mock_data_points_api.assert_called_once_with(mock_api_client.return_value)
+    mock_meta_api.assert_called_once_with(mock_api_client.return_value)
+
+
+@patch("dataland_qa_lab.dataland.dataland_client.dataland_backend.ApiClient")
+@patch("dataland_qa_lab.dataland.dataland_client.dataland_backend.Configuration")
+def test_backend_client_connection_pool(mock_config: MagicMock, mock_api_client: MagicMock) -> None:  # noqa: ARG001
+    """Test that the pool size and keep-alive are applied to the client configuration."""
+    client = DatalandClient(dataland_url="https://test.dataland.com", api_key="fake_key", connection_pool_size=7)
+
+    _ = client.backend_client
+
+    configuration = mock_config.return_value
+    assert configuration.connection_pool_maxsize == 7
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in configuration.socket_options
@@ -0,0 +1,57 @@
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from dataland_qa_lab.dataland import document_provider
+from dataland_qa_lab.utils.document_store import DocumentStore
+
+
+@patch("dataland_qa_lab.dataland.document_provider.database_engine")
+@patch("dataland_qa_lab.dataland.document_provider.config")
+@patch("dataland_qa_lab.dataland.document_provider.get_document_store")
+def test_get_document_downloads_only_on_store_miss(
+    mock_get_document_store: MagicMock, mock_config: MagicMock, mock_database_engine: MagicMock, tmp_path: Path
+) -> None:
+    mock_get_document_store.return_value = DocumentStore(root=tmp_path, max_bytes=1024)
+    mock_config.get_config.return_value.document_store_shared = False
+    documents_api = mock_config.get_config.return_value.dataland_client.documents_api
+    documents_api.get_document.return_value = b"%PDF-1.7 document"
+
+    first = document_provider.get_document("ref1")
+    second = document_provider.get_document("ref1")
+
+    documents_api.get_document.assert_called_once_with(document_id="ref1")
+    mock_database_engine.advisory_lock.assert_not_called()
+    assert bytes(first) == bytes(second) == b"%PDF-1.7 document"
+
+
+@patch("dataland_qa_lab.dataland.document_provider.database_engine")
+@patch("dataland_qa_lab.dataland.document_provider.config")
+@patch("dataland_qa_lab.dataland.document_provider.get_document_store")
+def test_get_document_locks_downloads_to_a_shared_store(
+    mock_get_document_store: MagicMock, mock_config: MagicMock, mock_database_engine: MagicMock, tmp_path: Path
+) -> None:
+    mock_get_document_store.return_value = DocumentStore(root=tmp_path, max_bytes=1024)
+    mock_config.get_config.return_value.document_store_shared = True
+    documents_api = mock_config.get_config.return_value.dataland_client.documents_api
+    documents_api.get_document.return_value = b"%PDF-1.7 document"
+
+    document_provider.get_document("ref1")
+    document_provider.get_document("ref1")
+
+    documents_api.get_document.assert_called_once_with(document_id="ref1")
+    mock_database_engine.advisory_lock.assert_called_once_with(
+        "document:ref1", mock_config.get_config().advisory_lock_timeout_seconds
+    )
+
+
+@patch("dataland_qa_lab.dataland.document_provider.config")
+@patch("dataland_qa_lab.dataland.document_provider.get_document_store")
+def test_get_document_without_store(mock_get_document_store: MagicMock, mock_config: MagicMock) -> None:
+    mock_get_document_store.return_value = None
+    documents_api = mock_config.get_config.return_value.dataland_client.documents_api
+    documents_api.get_document.return_value = b"%PDF-1.7 document"
+
+    document_provider.get_document("ref1")
+    document_provider.get_document("ref1")
+
+    assert documents_api.get_document.call_count == 2
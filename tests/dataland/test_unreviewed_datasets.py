@@ -3,7 +3,7 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
-from dataland_qa_lab.dataland.unreviewed_datasets import UnreviewedDatasets
+from dataland_qa_lab.dataland.unreviewed_datasets import UnreviewedDatasets, get_pending_dataset_pages
 
 
 @patch("dataland_qa_lab.dataland.unreviewed_datasets.config.get_config")
@@ -81,3 +81,12 @@ class TestUnreviewedDatasets(TestCase):
 
         with pytest.raises(RuntimeError):
             UnreviewedDatasets()
+
+
+def test_get_pending_dataset_pages_stops_at_the_first_short_page() -> None:
+    client = MagicMock()
+    pages = [["d1", "d2"], ["d3"]]
+    client.qa_api.get_info_on_datasets.side_effect = lambda chunk_index, **_: pages[chunk_index]
+
+    assert list(get_pending_dataset_pages(client, ["sfdr"], number_of_datasets=10, page_size=2)) == pages
+    assert client.qa_api.get_info_on_datasets.call_args.kwargs["chunk_size"] == 2
@@ -6,10 +6,9 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from fastapi.testclient import TestClient
 from openai.types.chat.chat_completion import ChatCompletion, ChatCompletionMessage, Choice
-from PIL import Image
 
 from dataland_qa_lab.bin.server import dataland_qa_lab
-from dataland_qa_lab.data_point_flow.models import DataPointPrompt
+from dataland_qa_lab.data_point_flow.models import DataPointPrompt, EncodedImage
 from dataland_qa_lab.database.database_engine import delete_entity
 from dataland_qa_lab.database.database_tables import ReviewedDataset
 from dataland_qa_lab.dataland.provide_test_data import get_company_id, upload_dataset, upload_pdf
@@ -92,7 +91,7 @@ def mock_ai_response() -> ChatCompletion:
 
 @patch("dataland_qa_lab.data_point_flow.prompts.get_prompt_config")
 @patch("dataland_qa_lab.data_point_flow.ocr.ocr.extract_pdf")
-@patch("dataland_qa_lab.data_point_flow.review.pdf_handler.render_pdf_to_image")
+@patch("dataland_qa_lab.data_point_flow.rasterizer.pdf_handler.render_pdf_to_encoded_images")
 @patch("dataland_qa_lab.data_point_flow.review.dataland.get_document", new_callable=AsyncMock)
 @patch("dataland_qa_lab.data_point_flow.ai.client.chat.completions.create", new_callable=AsyncMock)
 def test_review_dataset_true_e2e(  # noqa: PLR0913, PLR0917
@@ -108,7 +107,7 @@ def test_review_dataset_true_e2e(  # noqa: PLR0913, PLR0917
     mock_prompt_config.return_value = DataPointPrompt(prompt="dummy prompt", depends_on=[])
     mock_extract_pdf.return_value = "mock ocr markdown"
     mock_get_document.return_value = BytesIO(b"dummy-pdf")
-    mock_render_pdf.return_value = [Image.new("RGB", (1, 1), color="white")]
+    mock_render_pdf.return_value = [EncodedImage(data=b"jpeg", image_format="jpeg", width=1, height=1)]
     mock_ai_create.return_value = mock_ai_response()
 
     response = test_client.post(
@@ -144,7 +143,7 @@ def test_review_dataset_true_e2e(  # noqa: PLR0913, PLR0917
 @patch("dataland_qa_lab.database.database_engine.get_entity")
 @patch("dataland_qa_lab.data_point_flow.prompts.get_prompt_config")
 @patch("dataland_qa_lab.data_point_flow.ocr.ocr.extract_pdf")
-@patch("dataland_qa_lab.data_point_flow.review.pdf_handler.render_pdf_to_image")
+@patch("dataland_qa_lab.data_point_flow.rasterizer.pdf_handler.render_pdf_to_encoded_images")
 @patch("dataland_qa_lab.data_point_flow.review.dataland.get_document", new_callable=AsyncMock)
 @patch("dataland_qa_lab.data_point_flow.ai.client.chat.completions.create", new_callable=AsyncMock)
 def test_review_dataset_with_ocr_enabled(  # noqa: PLR0913, PLR0917
@@ -161,7 +160,7 @@ def test_review_dataset_with_ocr_enabled(  # noqa: PLR0913, PLR0917
     mock_prompt_config.return_value = DataPointPrompt(prompt="dummy prompt", depends_on=[])
     mock_extract_pdf.return_value = "mock ocr markdown"
     mock_get_document.return_value = BytesIO(b"dummy-pdf")
-    mock_render_pdf.return_value = [Image.new("RGB", (1, 1), color="white")]
+    mock_render_pdf.return_value = [EncodedImage(data=b"jpeg", image_format="jpeg", width=1, height=1)]
     mock_ai_create.return_value = mock_ai_response()
     mock_get_entity.return_value = None
 
@@ -180,7 +179,7 @@ def test_review_dataset_with_ocr_enabled(  # noqa: PLR0913, PLR0917
 
 @patch("dataland_qa_lab.data_point_flow.prompts.get_prompt_config")
 @patch("dataland_qa_lab.data_point_flow.ocr.ocr.extract_pdf")
-@patch("dataland_qa_lab.data_point_flow.review.pdf_handler.render_pdf_to_image")
+@patch("dataland_qa_lab.data_point_flow.rasterizer.pdf_handler.render_pdf_to_encoded_images")
 @patch("dataland_qa_lab.data_point_flow.review.dataland.get_document", new_callable=AsyncMock)
 @patch("dataland_qa_lab.data_point_flow.ai.client.chat.completions.create", new_callable=AsyncMock)
 def test_review_dataset_without_override(  # noqa: PLR0913, PLR0917
@@ -196,7 +195,7 @@ def test_review_dataset_without_override(  # noqa: PLR0913, PLR0917
     mock_prompt_config.return_value = DataPointPrompt(prompt="dummy prompt", depends_on=[])
     mock_extract_pdf.return_value = "mock ocr markdown"
     mock_get_document.return_value = BytesIO(b"dummy-pdf")
-    mock_render_pdf.return_value = [Image.new("RGB", (1, 1), color="white")]
+    mock_render_pdf.return_value = [EncodedImage(data=b"jpeg", image_format="jpeg", width=1, height=1)]
     mock_ai_create.return_value = mock_ai_response()
 
     test_client.post(
@@ -74,6 +74,7 @@ def test_review_dataset_returns_200_with_datapoint_results(
             "dataland_qa_lab.bin.server.dataland.get_contained_data_points", new_callable=AsyncMock
         ) as mock_get_datapoints,
         patch("dataland_qa_lab.bin.server.review.validate_datapoint", new_callable=AsyncMock) as mock_validate,
+        patch("dataland_qa_lab.data_point_flow.planner.db.get_validated_data_points", AsyncMock(return_value={})),
     ):
         mock_get_datapoints.return_value = mock_datapoints
         mock_validate.side_effect = [mock_validated_datapoint, mock_validated_datapoint_2]
@@ -104,8 +105,24 @@ def test_review_dataset_returns_200_with_datapoint_results(
         assert scope2_result["confidence"] == 0.92
 
         assert mock_validate.await_count == 2
-        mock_validate.assert_any_await("dp_1", use_ocr=False, ai_model="gpt-4o", override=False, dataset_id=data_id)
-        mock_validate.assert_any_await("dp_2", use_ocr=False, ai_model="gpt-4o", override=False, dataset_id=data_id)
+        mock_validate.assert_any_await(
+            "dp_1",
+            use_ocr=False,
+            ai_model="gpt-4o",
+            override=False,
+            dataset_id=data_id,
+            dependency_results={},
+            skip_existing_check=True,
+        )
+        mock_validate.assert_any_await(
+            "dp_2",
+            use_ocr=False,
+            ai_model="gpt-4o",
+            override=False,
+            dataset_id=data_id,
+            dependency_results={},
+            skip_existing_check=True,
+        )
 
 
 def test_review_dataset_empty_datapoints(test_client: TestClient) -> None:
@@ -152,6 +169,7 @@ def test_review_dataset_with_validation_error(
             "dataland_qa_lab.bin.server.dataland.get_contained_data_points", new_callable=AsyncMock
         ) as mock_get_datapoints,
         patch("dataland_qa_lab.bin.server.review.validate_datapoint", new_callable=AsyncMock) as mock_validate,
+        patch("dataland_qa_lab.data_point_flow.planner.db.get_validated_data_points", AsyncMock(return_value={})),
     ):
         mock_get_datapoints.return_value = mock_datapoints
         mock_validate.side_effect = [
@@ -186,6 +204,7 @@ def test_review_dataset_passes_custom_ai_model(
             "dataland_qa_lab.bin.server.dataland.get_contained_data_points", new_callable=AsyncMock
         ) as mock_get_datapoints,
         patch("dataland_qa_lab.bin.server.review.validate_datapoint", new_callable=AsyncMock) as mock_validate,
+        patch("dataland_qa_lab.data_point_flow.planner.db.get_validated_data_points", AsyncMock(return_value={})),
     ):
         mock_get_datapoints.return_value = mock_datapoints
         mock_validate.return_value = mock_validated_datapoint
@@ -207,4 +226,6 @@ def test_review_dataset_passes_custom_ai_model(
             ai_model="gpt-3.5-turbo",
             override=True,
             dataset_id=data_id,
+            dependency_results={},
+            skip_existing_check=True,
         )
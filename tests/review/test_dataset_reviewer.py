@@ -285,7 +285,7 @@ def test_validate_datapoint_override(
 
 
 @patch("dataland_qa_lab.review.dataset_reviewer.database_engine.get_entity")
-@patch("dataland_qa_lab.review.dataset_reviewer.database_engine.add_entity")
+@patch("dataland_qa_lab.review.dataset_reviewer.database_engine.upsert_entities")
 @patch("dataland_qa_lab.review.dataset_reviewer.text_to_doc_intelligence.extract_pdf")
 @patch("dataland_qa_lab.review.dataset_reviewer._get_document")
 def test_get_file_using_ocr_uses_cache(
@@ -306,7 +306,7 @@ def test_get_file_using_ocr_uses_cache(
 
 
 @patch("dataland_qa_lab.review.dataset_reviewer.database_engine.get_entity", return_value=None)
-@patch("dataland_qa_lab.review.dataset_reviewer.database_engine.add_entity")
+@patch("dataland_qa_lab.review.dataset_reviewer.database_engine.upsert_entities")
 @patch("dataland_qa_lab.review.dataset_reviewer.text_to_doc_intelligence.extract_pdf", return_value="NEW")
 @patch("dataland_qa_lab.review.dataset_reviewer._get_document", return_value=b"PDF")
 def test_get_file_using_ocr_generates_new_ocr(
@@ -65,8 +65,9 @@ def test_dataland_client_property(mock_client_class: MagicMock, monkeypatch: Mag
 
     client = cfg.dataland_client
 
-    mock_client_class.assert_called_once_with("https://example.com", "key123")
+    mock_client_class.assert_called_once_with("https://example.com", "key123", connection_pool_size=20, keep_alive=True)
     assert client is mock_client_class.return_value
+    assert cfg.dataland_client is client
 
 
 @patch("dataland_qa_lab.utils.config.DatalandQaLabSettings")
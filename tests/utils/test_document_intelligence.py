@@ -0,0 +1,62 @@
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dataland_qa_lab.utils import document_intelligence
+
+dummy_pdf = b"%PDF-1.4 dummy content"
+
+
+@pytest.fixture(autouse=True)
+def clear_client_cache() -> Generator[None]:
+    document_intelligence.get_client.cache_clear()
+    yield
+    document_intelligence.get_client.cache_clear()
+
+
+@patch("dataland_qa_lab.utils.document_intelligence.AzureKeyCredential")
+@patch("dataland_qa_lab.utils.document_intelligence.DocumentIntelligenceClient")
+@patch("dataland_qa_lab.utils.document_intelligence.conf")
+def test_get_client_is_created_once(
+    mock_conf: MagicMock, mock_client_class: MagicMock, mock_credential: MagicMock
+) -> None:
+    mock_conf.azure_docintel_endpoint = "fake_endpoint"
+    mock_conf.azure_docintel_api_key = "fake_key"
+    mock_conf.ocr_max_concurrent_jobs = 4
+
+    first = document_intelligence.get_client()
+    second = document_intelligence.get_client()
+
+    assert first is second
+    mock_credential.assert_called_once_with("fake_key")
+    mock_client_class.assert_called_once()
+    assert mock_client_class.call_args.kwargs["endpoint"] == "fake_endpoint"
+    assert mock_client_class.call_args.kwargs["credential"] is mock_credential.return_value
+
+
+@patch("dataland_qa_lab.utils.document_intelligence.get_client")
+def test_extract_markdown_returns_content(mock_get_client: MagicMock) -> None:
+    mock_poller = mock_get_client.return_value.begin_analyze_document.return_value
+    mock_poller.result.return_value.content = "Extracted text"
+
+    result = document_intelligence.extract_markdown(dummy_pdf)
+
+    mock_get_client.return_value.begin_analyze_document.assert_called_once_with(
+        "prebuilt-layout",
+        body=dummy_pdf,
+        content_type="application/octet-stream",
+        output_content_format="markdown",
+    )
+    assert result == "Extracted text"
+
+
+@patch("dataland_qa_lab.utils.document_intelligence._analyze_jobs")
+@patch("dataland_qa_lab.utils.document_intelligence.get_client")
+def test_extract_markdown_holds_a_job_slot(mock_get_client: MagicMock, mock_analyze_jobs: MagicMock) -> None:
+    mock_get_client.return_value.begin_analyze_document.return_value.result.return_value.content = "text"
+
+    document_intelligence.extract_markdown(dummy_pdf)
+
+    mock_analyze_jobs.__enter__.assert_called_once()
+    mock_analyze_jobs.__exit__.assert_called_once()
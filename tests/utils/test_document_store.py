@@ -0,0 +1,56 @@
+import os
+from pathlib import Path
+
+from dataland_qa_lab.utils.document_store import DocumentStore
+
+
+def test_get_returns_none_for_unknown_reference(tmp_path: Path) -> None:
+    store = DocumentStore(root=tmp_path, max_bytes=100)
+
+    assert store.get("missing") is None
+
+
+def test_put_and_get_round_trip(tmp_path: Path) -> None:
+    store = DocumentStore(root=tmp_path, max_bytes=100)
+
+    store.put("ref1", b"%PDF-content")
+
+    document = store.get("ref1")
+    assert document is not None
+    assert bytes(document) == b"%PDF-content"
+
+
+def test_identical_content_is_stored_once(tmp_path: Path) -> None:
+    store = DocumentStore(root=tmp_path, max_bytes=100)
+
+    store.put("ref1", b"same content")
+    store.put("ref2", b"same content")
+
+    assert len(list((tmp_path / "objects").glob("*/*"))) == 1
+    assert bytes(store.get("ref2")) == b"same content"
+
+
+def test_least_recently_read_document_is_evicted(tmp_path: Path) -> None:
+    store = DocumentStore(root=tmp_path, max_bytes=20)
+
+    store.put("old", b"a" * 10)
+    store.put("recent", b"b" * 10)
+    old_object = next(path for path in (tmp_path / "objects").glob("*/*") if path.read_bytes() == b"a" * 10)
+    os.utime(old_object, (0, 0))
+    assert store.get("old") is not None
+    recent_object = next(path for path in (tmp_path / "objects").glob("*/*") if path.read_bytes() == b"b" * 10)
+    os.utime(recent_object, (0, 0))
+
+    store.put("new", b"c" * 10)
+
+    assert store.get("old") is not None
+    assert store.get("recent") is None
+    assert store.get("new") is not None
+
+
+def test_document_larger_than_store_is_not_stored(tmp_path: Path) -> None:
+    store = DocumentStore(root=tmp_path, max_bytes=5)
+
+    store.put("big", b"too large")
+
+    assert store.get("big") is None
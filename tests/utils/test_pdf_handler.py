@@ -30,31 +30,6 @@ def test_extract_single_page_invalid_page(sample_pdf_bytes: bytes) -> None:
         pdf_handler.extract_single_page(sample_pdf_bytes, page_number=5)
 
 
-def test_render_pdf_to_image(sample_pdf_bytes: bytes) -> None:
-    """Test rendering PDF pages to images."""
-    pdf_stream = io.BytesIO(sample_pdf_bytes)
-    images = pdf_handler.render_pdf_to_image(pdf_stream, dpi=72)
-    assert len(images) == 3
-    assert isinstance(images[0], Image.Image)
-    assert images[0].width > 0
-    assert images[0].height > 0
-
-
-def test_render_pdf_to_image_empty_stream() -> None:
-    """Test rendering with an empty PDF stream."""
-    pdf_stream = io.BytesIO(b"")
-    with pytest.raises(ValueError, match="PDF stream is empty"):
-        pdf_handler.render_pdf_to_image(pdf_stream, dpi=72)
-
-
-def test_render_pdf_to_image_corrupt_pdf() -> None:
-    """Test rendering with a corrupt PDF stream."""
-    pdf_stream = io.BytesIO(b"%PDF-1.4\n%CorruptContent")
-    with pytest.raises(RuntimeError) as excinfo:
-        pdf_handler.render_pdf_to_image(pdf_stream, dpi=72)
-    assert "Failed to render PDF to images" in str(excinfo.value)
-
-
 def test_extract_single_page_zero_or_negative(sample_pdf_bytes: bytes) -> None:
     """Test extracting an invalid lower bound page number (0 or negative)."""
 
@@ -70,3 +45,33 @@ def test_extract_single_page_none_input() -> None:
 
     with pytest.raises((ValueError, AttributeError, TypeError)):
         pdf_handler.extract_single_page(None, page_number=1)
+
+
+def test_render_pdf_to_encoded_images_jpeg(sample_pdf_bytes: bytes) -> None:
+    """Test rendering PDF pages straight to JPEG, capped at the maximum side lengths."""
+    pdf_stream = io.BytesIO(sample_pdf_bytes)
+    images = pdf_handler.render_pdf_to_encoded_images(pdf_stream, max_long_side=400, max_short_side=200)
+    assert len(images) == 3
+    assert images[0].image_format == "jpeg"
+    assert images[0].data.startswith(b"\xff\xd8")
+    assert max(images[0].width, images[0].height) <= 400
+    assert min(images[0].width, images[0].height) <= 200
+    with Image.open(io.BytesIO(images[0].data)) as image:
+        assert image.size == (images[0].width, images[0].height)
+
+
+def test_render_pdf_to_encoded_images_webp(sample_pdf_bytes: bytes) -> None:
+    """Test rendering PDF pages straight to WEBP."""
+    pdf_stream = io.BytesIO(sample_pdf_bytes)
+    images = pdf_handler.render_pdf_to_encoded_images(pdf_stream, dpi=72, image_format="webp")
+    assert len(images) == 3
+    with Image.open(io.BytesIO(images[0].data)) as image:
+        assert image.format == "WEBP"
+
+
+def test_get_render_zoom_caps_at_dpi_and_sides() -> None:
+    """Test that the zoom never exceeds the DPI nor the maximum side lengths."""
+    a4 = fitz.Rect(0, 0, 595, 842)
+    assert pdf_handler.get_render_zoom(a4, dpi=72, max_long_side=2048, max_short_side=768) == pytest.approx(1.0)
+    assert pdf_handler.get_render_zoom(a4, dpi=300, max_long_side=2048, max_short_side=768) == pytest.approx(768 / 595)
+    assert pdf_handler.get_render_zoom(a4, dpi=300, max_long_side=842, max_short_side=2000) == pytest.approx(1.0)
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from dataland_qa_lab.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution() -> None:
+    """Test that concurrent calls for the same key run the function only once."""
+    group = SingleFlight()
+    calls = 0
+
+    async def work(value: str) -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(*(group.run("key", work, "result") for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_independently() -> None:
+    """Test that calls for different keys are not de-duplicated."""
+    group = SingleFlight()
+    calls = []
+
+    async def work(value: str) -> str:
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(group.run("a", work, "a"), group.run("b", work, "b"))
+
+    assert results == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_finished_calls_are_not_cached() -> None:
+    """Test that a new call is started once the previous one has finished."""
+    group = SingleFlight()
+    calls = 0
+
+    async def work() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return calls
+
+    assert await group.run("key", work) == 1
+    assert await group.run("key", work) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_remembered() -> None:
+    """Test that all waiters receive the error and the entry is dropped afterwards."""
+    group = SingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        msg = "boom"
+        raise RuntimeError(msg)
+
+    results = await asyncio.gather(group.run("key", fail), group.run("key", fail), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    await asyncio.sleep(0)
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_with_its_last_waiter() -> None:
+    """Test that the shared call keeps running while any waiter is left and is cancelled with the last one."""
+    group = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work() -> None:
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(group.run("key", work))
+    second = asyncio.create_task(group.run("key", work))
+    await started.wait()
+    assert group.waiters("key") == 2
+
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    assert group.waiters("key") == 1
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert len(group) == 0
@@ -0,0 +1,56 @@
+from dataland_qa_lab.utils.sized_lru_cache import SizedLRUCache
+
+
+def test_get_returns_cached_value() -> None:
+    """Test that a cached value is returned and unknown keys return None."""
+    cache = SizedLRUCache(max_size=10)
+    cache.put("a", b"123")
+
+    assert cache.get("a") == b"123"
+    assert cache.get("b") is None
+    assert cache.size == 3
+
+
+def test_evicts_least_recently_used_by_size() -> None:
+    """Test that entries are evicted by total size, oldest first."""
+    cache = SizedLRUCache(max_size=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.size == 8
+    assert len(cache) == 2
+
+
+def test_replacing_a_key_updates_size() -> None:
+    """Test that putting an existing key replaces its value and size."""
+    cache = SizedLRUCache(max_size=10)
+    cache.put("a", b"1234")
+    cache.put("a", b"12")
+
+    assert cache.get("a") == b"12"
+    assert cache.size == 2
+
+
+def test_values_larger_than_the_cache_are_not_cached() -> None:
+    """Test that an oversized value neither gets cached nor evicts other entries."""
+    cache = SizedLRUCache(max_size=4)
+    cache.put("a", b"12")
+    cache.put("b", b"123456")
+
+    assert cache.get("a") == b"12"
+    assert cache.get("b") is None
+
+
+def test_clear() -> None:
+    """Test that clear removes all entries."""
+    cache = SizedLRUCache(max_size=10)
+    cache.put("a", b"12")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert cache.size == 0